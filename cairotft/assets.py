@@ -0,0 +1,397 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Precompiled image bundles.
+
+Parsing svg files is slow on small boards. A bundle holds images already
+rasterized at the sizes used by the application, in the pixel format of the
+screen, so the application starts without parsing any svg file.
+
+Build a bundle offline (cairosvg is only needed here)::
+
+    python -m cairotft.assets build --output icons.bundle \\
+        --format RGB16_565 icons/ok.svg:70x70,32x32 alert=icons/ko.svg:70x70
+
+Each image is declared as ``[NAME=]PATH:WxH[,WxH...]``: the sizes are boxes,
+the image is rasterized at its size drawn inside each box (as done by
+:meth:`cairotft.image.BaseImage.draw`). The name defaults to the file name
+without extension.
+
+At runtime, the bundle is mapped in memory and its images are drawn like
+svg images::
+
+    bundle = assets.AssetBundle('icons.bundle')
+    bundle['ok'].draw(ctx, 10, 10, 70, 70)
+
+File layout: a header (magic, json index length), the json index, then the
+pixel data of each raster, aligned on :data:`ALIGNMENT` bytes.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+
+import cairocffi as cairo
+
+from cairotft import image
+
+MAGIC = b'CTFTBNDL'
+VERSION = 1
+
+#: header of the bundle file: magic, version, length of the json index.
+HEADER = struct.Struct('<8sII')
+
+#: alignment of the pixel data in the file (in bytes).
+ALIGNMENT = 64
+
+#: pixel formats of the bundles.
+FORMATS = {
+    'ARGB32': cairo.FORMAT_ARGB32,
+    'RGB24': cairo.FORMAT_RGB24,
+    'RGB16_565': cairo.FORMAT_RGB16_565,
+    'A8': cairo.FORMAT_A8,
+}
+
+
+class BundleError(Exception):
+
+    """Invalid bundle file."""
+
+
+def _align(offset):
+    """Round up an offset to the next multiple of :data:`ALIGNMENT`."""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def build_bundle(output, images, format_name='ARGB32'):
+    """Rasterize svg images and write them in a bundle file.
+
+    :param str output: path of the bundle file.
+    :param images: list of (name, svg path, list of (width, height) boxes).
+    :param str format_name: pixel format of the bundle (a key of
+        :data:`FORMATS`).
+    """
+    # cairosvg is only needed to build the bundles.
+    from cairotft import svg_image
+
+    cairo_format = FORMATS[format_name]
+    index = {'version': VERSION,
+             'format': format_name,
+             'byteorder': sys.byteorder,
+             'images': {}}
+    chunks = []
+    offset = 0
+    for name, path, boxes in images:
+        svg = svg_image.SVGImage(path)
+        rasters = []
+        sizes = set()
+        for box_width, box_height in boxes:
+            width, height = svg.target_size(box_width, box_height)
+            if width <= 0 or height <= 0 or (width, height) in sizes:
+                continue
+            sizes.add((width, height))
+            surface = svg.rasterize(width, height, cairo_format)
+            surface.flush()
+            data = bytes(surface.get_data())
+            rasters.append({'width': width,
+                            'height': height,
+                            'stride': surface.get_stride(),
+                            'offset': offset})
+            chunks.append(data)
+            offset = _align(offset + len(data))
+        svg.invalidate_cache()
+        index['images'][name] = {'width': svg.intrinsic_width,
+                                 'height': svg.intrinsic_height,
+                                 'rasters': rasters}
+    index_data = json.dumps(index, sort_keys=True).encode('utf-8')
+    with open(output, 'wb') as bundle_file:
+        bundle_file.write(HEADER.pack(MAGIC, VERSION, len(index_data)))
+        bundle_file.write(index_data)
+        data_start = _align(HEADER.size + len(index_data))
+        for chunk in chunks:
+            bundle_file.write(b'\0' * (data_start - bundle_file.tell()))
+            bundle_file.write(chunk)
+            data_start = _align(bundle_file.tell())
+
+
+class BundleImage(image.BaseImage):
+
+    """An image of a bundle.
+
+    The rasters of the bundle are returned without copy; other sizes (or
+    formats) are scaled from the nearest raster and cached.
+
+    :ivar name: (:py:class:`str`) name of the image in the bundle.
+    :ivar bundle: (:class:`AssetBundle`) the bundle of the image.
+    """
+
+    def __init__(self, bundle, name, entry):
+        """Initialisation of the image.
+
+        :param bundle: the bundle of the image.
+        :type bundle: :class:`AssetBundle`
+        :param str name: name of the image.
+        :param dict entry: the image entry of the bundle index.
+        """
+        self.bundle = bundle
+        self.name = name
+        self.intrinsic_width = entry['width']
+        self.intrinsic_height = entry['height']
+        self.intrinsic_ratio = self.intrinsic_width / self.intrinsic_height
+        self._rasters = {(raster['width'], raster['height']): raster
+                         for raster in entry['rasters']}
+        self._surfaces = {}
+        self._image_id = image.new_image_id()
+
+    @property
+    def sizes(self):
+        """Sizes of the rasters stored in the bundle."""
+        return sorted(self._rasters)
+
+    def _stored_surface(self, width, height):
+        """Return a surface on the bundle memory, or None if not stored."""
+        surface = self._surfaces.get((width, height))
+        if surface is None:
+            raster = self._rasters.get((width, height))
+            if raster is None:
+                return None
+            surface = self.bundle.surface(raster)
+            self._surfaces[(width, height)] = surface
+        return surface
+
+    def _nearest_size(self, width, height):
+        """Return the smallest stored size covering the given size.
+
+        Fallback on the biggest stored size.
+        """
+        sizes = sorted(self._rasters, key=lambda size: size[0] * size[1])
+        for size in sizes:
+            if size[0] >= width and size[1] >= height:
+                return size
+        return sizes[-1]
+
+    def release(self):
+        """Drop the surfaces on the bundle memory."""
+        self._surfaces.clear()
+
+    def invalidate_cache(self):
+        """Drop the rasters scaled from the stored ones."""
+        self.bundle.raster_cache.invalidate(self._image_id)
+
+    def rasterize(self, width, height, cairo_format=None):
+        """Return the image rasterized at the given size.
+
+        Do not draw on the returned surface.
+
+        :param int width: width of the rasterized image.
+        :param int height: height of the rasterized image.
+        :param int cairo_format: pixel format of the rasterized image
+            (default: the format of the bundle).
+
+        :return: a :class:`cairocffi.ImageSurface`
+        """
+        if cairo_format is None:
+            cairo_format = self.bundle.cairo_format
+        if cairo_format == self.bundle.cairo_format:
+            surface = self._stored_surface(width, height)
+            if surface is not None:
+                return surface
+        if not self._rasters:
+            raise KeyError('no raster of image %r in the bundle' % self.name)
+        key = (self._image_id, width, height, cairo_format)
+        surface = self.bundle.raster_cache.get(key)
+        if surface is None:
+            source_width, source_height = self._nearest_size(width, height)
+            source = self._stored_surface(source_width, source_height)
+            surface = cairo.ImageSurface(cairo_format, width, height)
+            context = cairo.Context(surface)
+            context.scale(width / source_width, height / source_height)
+            context.set_source_surface(source, 0, 0)
+            context.paint()
+            surface.flush()
+            self.bundle.raster_cache.put(key, surface)
+        return surface
+
+
+class AssetBundle():
+
+    """A bundle file mapped in memory.
+
+    :ivar path: (:py:class:`str`) path of the bundle file.
+    :ivar format_name: (:py:class:`str`) pixel format name of the bundle.
+    :ivar cairo_format: (:py:class:`int`) cairo pixel format of the bundle.
+    :ivar raster_cache: (:class:`cairotft.image.RasterCache`) cache of the
+        rasters scaled from the stored ones.
+    """
+
+    def __init__(self, path, cache_size=image.DEFAULT_CACHE_SIZE):
+        """Open and map the bundle.
+
+        :param str path: path of the bundle file.
+        :param int cache_size: maximum size in bytes of the rasters scaled
+            from the stored ones.
+        """
+        self.path = path
+        self.raster_cache = image.RasterCache(cache_size)
+        self._images = {}
+        with open(path, 'rb') as bundle_file:
+            # a private copy-on-write mapping: cairo wants writable memory,
+            # and nothing is ever written in the file.
+            self._map = mmap.mmap(bundle_file.fileno(), 0,
+                                  access=mmap.ACCESS_COPY)
+        self._memory = memoryview(self._map)
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise BundleError('%s: truncated bundle' % path)
+        magic, version, index_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise BundleError('%s: not a bundle of version %d' %
+                              (path, VERSION))
+        index_data = bytes(self._memory[HEADER.size:
+                                        HEADER.size + index_size])
+        self._index = json.loads(index_data.decode('utf-8'))
+        if self._index['byteorder'] != sys.byteorder:
+            self.close()
+            raise BundleError('%s: built for a %s endian machine' %
+                              (path, self._index['byteorder']))
+        self.format_name = self._index['format']
+        self.cairo_format = FORMATS[self.format_name]
+        self._data_start = _align(HEADER.size + index_size)
+
+    def __contains__(self, name):
+        """Return True if the bundle contains the named image."""
+        return name in self._index['images']
+
+    def __getitem__(self, name):
+        """Return the named image (a :class:`BundleImage`)."""
+        bundle_image = self._images.get(name)
+        if bundle_image is None:
+            bundle_image = BundleImage(self, name,
+                                       self._index['images'][name])
+            self._images[name] = bundle_image
+        return bundle_image
+
+    def names(self):
+        """Return the sorted names of the images of the bundle."""
+        return sorted(self._index['images'])
+
+    def surface(self, raster):
+        """Return an image surface on the memory of a raster (no copy).
+
+        :param dict raster: a raster entry of the bundle index.
+        """
+        start = self._data_start + raster['offset']
+        end = start + raster['stride'] * raster['height']
+        if end > len(self._map):
+            raise BundleError('%s: truncated bundle' % self.path)
+        return cairo.ImageSurface.create_for_data(
+            self._memory[start:end], self.cairo_format,
+            raster['width'], raster['height'], raster['stride'])
+
+    def close(self):
+        """Release the images and unmap the bundle.
+
+        The images and surfaces of the bundle must not be used anymore.
+        """
+        for bundle_image in self._images.values():
+            bundle_image.release()
+        self._images = {}
+        self.raster_cache.invalidate()
+        self._memory.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # surfaces of the bundle are still referenced somewhere: the
+            # memory is unmapped when they are garbage collected.
+            pass
+
+
+def parse_image_spec(spec):
+    """Parse a ``[NAME=]PATH:WxH[,WxH...]`` image declaration.
+
+    :return: a tuple (name, path, list of (width, height)).
+    """
+    name = None
+    if '=' in spec:
+        name, spec = spec.split('=', 1)
+    path, _, sizes = spec.rpartition(':')
+    if not path or not sizes:
+        raise ValueError('invalid image declaration: %r' % spec)
+    boxes = []
+    for size in sizes.split(','):
+        width, height = size.lower().split('x')
+        boxes.append((int(width), int(height)))
+    if not name:
+        name = os.path.splitext(os.path.basename(path))[0]
+    return name, path, boxes
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        prog='python -m cairotft.assets',
+        description='Build and inspect precompiled image bundles.')
+    subparsers = parser.add_subparsers(dest='command')
+    build_parser = subparsers.add_parser(
+        'build', help='rasterize svg images into a bundle')
+    build_parser.add_argument('images', nargs='+', metavar='IMAGE',
+                              help='[NAME=]PATH:WxH[,WxH...]')
+    build_parser.add_argument('-o', '--output', required=True,
+                              help='path of the bundle file')
+    build_parser.add_argument('-f', '--format', default='ARGB32',
+                              help='pixel format (%s), default: ARGB32' %
+                              ', '.join(sorted(FORMATS)))
+    list_parser = subparsers.add_parser(
+        'list', help='list the images of a bundle')
+    list_parser.add_argument('bundle', help='path of the bundle file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        if args.format not in FORMATS:
+            parser.error('unknown format: %s' % args.format)
+        try:
+            images = [parse_image_spec(spec) for spec in args.images]
+        except ValueError as error:
+            parser.error(str(error))
+        build_bundle(args.output, images, args.format)
+    elif args.command == 'list':
+        bundle = AssetBundle(args.bundle)
+        print('%s (%s)' % (args.bundle, bundle.format_name))
+        for name in bundle.names():
+            sizes = ', '.join('%dx%d' % size for size in bundle[name].sizes)
+            print('  %s: %s' % (name, sizes))
+        bundle.close()
+    else:
+        parser.print_usage()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Sprite atlases: many small images packed in a few big surfaces.
+
+Each small image surface has a cost (cairo surface and pixman image,
+scattered allocations). An atlas rasterizes the images at the sizes used by
+the application and packs them in large surfaces (pages); drawing an image
+paints a sub-rectangle of its page::
+
+    builder = atlas.AtlasBuilder()
+    builder.add('ok', svg_image.get_svg_image('ok.svg'), 32, 32)
+    builder.add_png('logo', 'logo.png')
+    icons = builder.build()
+    icons['ok'].draw(ctx, 10, 10, 32, 32)
+
+The entries of an atlas are :class:`cairotft.image.BaseImage`, so they can
+be given to the widgets instead of svg images.
+
+The images are packed in shelves (rows of images), the tallest images
+first.
+"""
+import cairocffi as cairo
+
+from cairotft import image
+
+#: default maximum size of the pages of an atlas.
+DEFAULT_PAGE_SIZE = 1024
+
+#: default number of transparent pixels between two images of a page.
+DEFAULT_PADDING = 1
+
+
+class AtlasEntry(image.BaseImage):
+
+    """An image of an atlas.
+
+    :ivar atlas: (:class:`Atlas`) the atlas of the image.
+    :ivar name: (:py:class:`str`) name of the image in the atlas.
+    :ivar page: (:py:class:`int`) index of the page of the image.
+    :ivar rect: (:py:class:`tuple`) (x, y, width, height) of the image in
+        its page.
+    """
+
+    def __init__(self, atlas, name, page, rect, intrinsic_size):
+        """Initialisation of the entry.
+
+        :param atlas: the atlas of the image.
+        :type atlas: :class:`Atlas`
+        :param str name: name of the image.
+        :param int page: index of the page of the image.
+        :param tuple rect: (x, y, width, height) of the image in its page.
+        :param tuple intrinsic_size: (width, height) of the original image.
+        """
+        self.atlas = atlas
+        self.name = name
+        self.page = page
+        self.rect = rect
+        self.intrinsic_width, self.intrinsic_height = intrinsic_size
+        self.intrinsic_ratio = self.intrinsic_width / self.intrinsic_height
+        self._image_id = image.new_image_id()
+
+    @property
+    def size(self):
+        """(width, height) of the image in the atlas."""
+        return self.rect[2], self.rect[3]
+
+    def invalidate_cache(self):
+        """Drop the rasters scaled from the packed image."""
+        self.atlas.raster_cache.invalidate(self._image_id)
+
+    def rasterize(self, width, height, cairo_format=None):
+        """Return the image rasterized at the given size.
+
+        Do not draw on the returned surface.
+
+        :param int width: width of the rasterized image.
+        :param int height: height of the rasterized image.
+        :param int cairo_format: pixel format of the rasterized image
+            (default: the format of the atlas).
+
+        :return: a :class:`cairocffi.Surface` (a sub-surface of the page
+            for the packed size).
+        """
+        if cairo_format is None:
+            cairo_format = self.atlas.cairo_format
+        pos_x, pos_y, rect_width, rect_height = self.rect
+        page = self.atlas.pages[self.page]
+        if ((width, height) == (rect_width, rect_height) and
+                cairo_format == self.atlas.cairo_format):
+            return page.create_for_rectangle(pos_x, pos_y, width, height)
+        key = (self._image_id, width, height, cairo_format)
+        surface = self.atlas.raster_cache.get(key)
+        if surface is None:
+            surface = cairo.ImageSurface(cairo_format, width, height)
+            context = cairo.Context(surface)
+            context.scale(width / rect_width, height / rect_height)
+            context.set_source_surface(page, -pos_x, -pos_y)
+            context.rectangle(0, 0, rect_width, rect_height)
+            context.fill()
+            surface.flush()
+            self.atlas.raster_cache.put(key, surface)
+        return surface
+
+    def paint(self, context, pos_x, pos_y, width, height, cairo_format=None):
+        """Paint the image at the given size.
+
+        At the packed size, the sub-rectangle of the page is painted
+        directly.
+        """
+        rect_x, rect_y, rect_width, rect_height = self.rect
+        if ((width, height) != (rect_width, rect_height) or
+                cairo_format not in (None, self.atlas.cairo_format)):
+            super().paint(context, pos_x, pos_y, width, height,
+                          cairo_format)
+            return
+        context.set_source_surface(self.atlas.pages[self.page],
+                                   pos_x - rect_x, pos_y - rect_y)
+        context.rectangle(pos_x, pos_y, width, height)
+        context.fill()
+
+
+class Atlas():
+
+    """Packed images.
+
+    :ivar pages: (:py:class:`list`) the :class:`cairocffi.ImageSurface` of
+        the packed images.
+    :ivar cairo_format: (:py:class:`int`) pixel format of the pages.
+    :ivar raster_cache: (:class:`cairotft.image.RasterCache`) cache of the
+        images drawn at other sizes than the packed ones.
+    """
+
+    def __init__(self, pages, cairo_format,
+                 cache_size=image.DEFAULT_CACHE_SIZE):
+        """Initialisation of the atlas.
+
+        Use :meth:`AtlasBuilder.build` to create atlases.
+
+        :param list pages: the surfaces of the packed images.
+        :param int cairo_format: pixel format of the pages.
+        :param int cache_size: memory cap in bytes of the raster cache.
+        """
+        self.pages = pages
+        self.cairo_format = cairo_format
+        self.raster_cache = image.RasterCache(cache_size)
+        self._entries = {}
+
+    def __contains__(self, name):
+        """Return True if the atlas contains the named image."""
+        return name in self._entries
+
+    def __getitem__(self, name):
+        """Return the named image (an :class:`AtlasEntry`)."""
+        return self._entries[name]
+
+    def __len__(self):
+        """Return the number of images of the atlas."""
+        return len(self._entries)
+
+    def names(self):
+        """Return the sorted names of the images of the atlas."""
+        return sorted(self._entries)
+
+    def add_entry(self, name, page, rect, intrinsic_size):
+        """Register an image already painted in a page.
+
+        :param str name: name of the image.
+        :param int page: index of the page of the image.
+        :param tuple rect: (x, y, width, height) of the image in its page.
+        :param tuple intrinsic_size: (width, height) of the original image.
+
+        :return: the :class:`AtlasEntry`
+        """
+        entry = AtlasEntry(self, name, page, rect, intrinsic_size)
+        self._entries[name] = entry
+        return entry
+
+    @property
+    def memory_size(self):
+        """Memory size of the pages in bytes."""
+        return sum(image.RasterCache.surface_size(page)
+                   for page in self.pages)
+
+
+class AtlasBuilder():
+
+    """Pack images in an atlas.
+
+    :ivar max_width: (:py:class:`int`) maximum width of the pages.
+    :ivar max_height: (:py:class:`int`) maximum height of the pages.
+    :ivar cairo_format: (:py:class:`int`) pixel format of the pages.
+    :ivar padding: (:py:class:`int`) transparent pixels between two images.
+    """
+
+    def __init__(self, max_width=DEFAULT_PAGE_SIZE,
+                 max_height=DEFAULT_PAGE_SIZE,
+                 cairo_format=cairo.FORMAT_ARGB32,
+                 padding=DEFAULT_PADDING):
+        """Initialisation of the builder.
+
+        :param int max_width: maximum width of the pages.
+        :param int max_height: maximum height of the pages.
+        :param int cairo_format: pixel format of the pages.
+        :param int padding: transparent pixels between two images (avoids
+            bleeding when an image is scaled).
+        """
+        self.max_width = max_width
+        self.max_height = max_height
+        self.cairo_format = cairo_format
+        self.padding = padding
+        # name: (surface to pack, intrinsic size)
+        self._images = {}
+
+    def add(self, name, source_image, width, height, enlarge=True):
+        """Add an image, rasterized at its size drawn inside a box.
+
+        :param str name: name of the image in the atlas.
+        :param source_image: the image to pack.
+        :type source_image: :class:`cairotft.image.BaseImage`
+        :param int width: width of the box the image will be drawn inside.
+        :param int height: height of the box the image will be drawn
+            inside.
+        :param bool enlarge: see :meth:`cairotft.image.BaseImage.draw`.
+
+        The rasters of source_image are dropped from its cache: the packed
+        image is kept in a page of the atlas.
+        """
+        size = source_image.target_size(width, height, enlarge)
+        surface = source_image.rasterize(size[0], size[1])
+        source_image.invalidate_cache()
+        self._add(name, surface, (source_image.intrinsic_width,
+                                  source_image.intrinsic_height))
+
+    def add_png(self, name, path, width=None, height=None):
+        """Add a png image.
+
+        :param str name: name of the image in the atlas.
+        :param str path: path of the png file.
+        :param int width: width of the packed image (default: the width
+            of the png image).
+        :param int height: height of the packed image (default: the
+            height of the png image).
+        """
+        surface = cairo.ImageSurface.create_from_png(path)
+        intrinsic_size = (surface.get_width(), surface.get_height())
+        if width is not None or height is not None:
+            width = width or intrinsic_size[0]
+            height = height or intrinsic_size[1]
+            scaled = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+            context = cairo.Context(scaled)
+            context.scale(width / intrinsic_size[0],
+                          height / intrinsic_size[1])
+            context.set_source_surface(surface, 0, 0)
+            context.paint()
+            surface = scaled
+        self._add(name, surface, intrinsic_size)
+
+    def _add(self, name, surface, intrinsic_size):
+        """Register a surface to pack."""
+        width, height = surface.get_width(), surface.get_height()
+        if width > self.max_width or height > self.max_height:
+            raise ValueError('image %r (%dx%d) is bigger than a page' %
+                             (name, width, height))
+        self._images[name] = (surface, intrinsic_size)
+
+    def _find_shelf(self, page, width, height):
+        """Return a shelf of the page with room for the image, or None.
+
+        :param dict page: the shelves and used size of the page.
+        """
+        for shelf in page['shelves']:
+            if height <= shelf[1] and shelf[2] + width <= self.max_width:
+                return shelf
+        shelf_y = page['height'] + self.padding if page['shelves'] else 0
+        if shelf_y + height > self.max_height:
+            return None
+        shelf = [shelf_y, height, 0]  # y, height, used width
+        page['shelves'].append(shelf)
+        page['height'] = shelf_y + height
+        return shelf
+
+    def pack(self):
+        """Place the images in pages.
+
+        :return: a tuple (list of the page sizes (width, height), dict of
+            name: (page index, x, y)).
+        """
+        # tallest first, so the shelves are filled with similar heights
+        order = sorted(
+            self._images,
+            key=lambda name: (self._images[name][0].get_height(),
+                              self._images[name][0].get_width()),
+            reverse=True)
+        pages = []
+        places = {}
+        for name in order:
+            surface = self._images[name][0]
+            width, height = surface.get_width(), surface.get_height()
+            for page_index, page in enumerate(pages):
+                shelf = self._find_shelf(page, width, height)
+                if shelf is not None:
+                    break
+            else:
+                page = {'shelves': [], 'width': 0, 'height': 0}
+                pages.append(page)
+                page_index = len(pages) - 1
+                shelf = self._find_shelf(page, width, height)
+            places[name] = (page_index, shelf[2], shelf[0])
+            page['width'] = max(page['width'], shelf[2] + width)
+            shelf[2] += width + self.padding
+        return [(page['width'], page['height']) for page in pages], places
+
+    def build(self, cache_size=image.DEFAULT_CACHE_SIZE):
+        """Pack the images and return the :class:`Atlas`.
+
+        :param int cache_size: memory cap in bytes of the raster cache of
+            the atlas.
+        """
+        sizes, places = self.pack()
+        pages = [cairo.ImageSurface(self.cairo_format, width, height)
+                 for width, height in sizes]
+        contexts = [cairo.Context(page) for page in pages]
+        new_atlas = Atlas(pages, self.cairo_format, cache_size)
+        for name, (page_index, pos_x, pos_y) in places.items():
+            surface, intrinsic_size = self._images[name]
+            width, height = surface.get_width(), surface.get_height()
+            context = contexts[page_index]
+            context.set_source_surface(surface, pos_x, pos_y)
+            context.rectangle(pos_x, pos_y, width, height)
+            context.fill()
+            new_atlas.add_entry(name, page_index,
+                                (pos_x, pos_y, width, height), intrinsic_size)
+        for page in pages:
+            page.flush()
+        return new_atlas
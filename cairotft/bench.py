@@ -0,0 +1,320 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Benchmarks of cairotft, on a virtual framebuffer.
+
+Run them with::
+
+    python -m cairotft.bench --output results.json
+
+The results are written in JSON, so they can be compared between releases
+and between boards.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+
+import cairocffi as cairo
+
+import cairotft
+from cairotft import damage
+from cairotft import svg_image
+from cairotft import tft
+from cairotft import transitions
+from cairotft import widgets
+
+#: pixel formats benchmarked, with the matching framebuffer bits per pixel.
+FORMATS = {
+    'ARGB32': (cairo.FORMAT_ARGB32, 32),
+    'RGB24': (cairo.FORMAT_RGB24, 32),
+    'RGB16_565': (cairo.FORMAT_RGB16_565, 16),
+}
+
+RESOLUTIONS = ((320, 240), (480, 272), (800, 480))
+
+ICON_SIZES = (16, 32, 64, 128)
+
+TRANSITIONS = (
+    transitions.LinearTransition,
+    transitions.QuadTransition,
+    transitions.CubicTransition,
+    transitions.QuartTransition,
+    transitions.QuintTransition,
+    transitions.PowTransition,
+    transitions.ExpoTransition,
+    transitions.CircTransition,
+    transitions.SineTransition,
+    transitions.BackTransition,
+    transitions.BounceTransition,
+    transitions.ElasticTransition,
+)
+
+SUITES = ('blit', 'svg', 'marquee', 'transitions')
+
+ICON_SVG = b"""<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+  <circle cx="50" cy="50" r="45" fill="#3a7" stroke="#000"
+          stroke-width="4"/>
+  <path d="M30 52 L45 67 L72 35" fill="none" stroke="#fff"
+        stroke-width="9" stroke-linecap="round"/>
+</svg>
+"""
+
+MARQUEE_TEXT = ('cairotft benchmark marquee text, long enough to scroll '
+                'inside the box on every usual screen size. ') * 4
+MARQUEE_LONG_TEXT = ' - '.join([MARQUEE_TEXT] * 5)
+
+
+def time_per_call(func, repeat, *args):
+    """Return the mean time of one call of func(*args) in seconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def virtual_display(width, height, format_name):
+    """Return a TftDisplay on a virtual framebuffer."""
+    cairo_format, bits_per_pixel = FORMATS[format_name]
+    return tft.TftDisplay(
+        interface='virtual:%dx%dx%d' % (width, height, bits_per_pixel),
+        cairo_format=cairo_format)
+
+
+def bench_blit(repeat, resolutions):
+    """Measure full and partial blits for each format and resolution."""
+    results = []
+    for (width, height) in resolutions:
+        for format_name in sorted(FORMATS):
+            display = virtual_display(width, height, format_name)
+            regions = {
+                'full': (0, 0, width, height),
+                'icon_70x70': (10, 10, 70, 70),
+                'text_strip': (0, height // 2, width, 20),
+            }
+            for region_name, rect in sorted(regions.items()):
+                region = damage.DamageRegion(width, height)
+                region.add(*rect)
+                engine = display._blit_engines[0]
+                timings = engine.benchmark(region, repeat)
+                results.append({
+                    'resolution': '%dx%d' % (width, height),
+                    'format': format_name,
+                    'region': region_name,
+                    'bytes': engine.blit(region),
+                    'auto_strategy': engine.choose_strategy(region),
+                    'seconds_per_blit': timings,
+                })
+            display.close()
+    return results
+
+
+def bench_svg(repeat):
+    """Measure SVGImage.draw for each icon size.
+
+    Cold draws render the svg (the raster cache is emptied before each
+    draw), warm draws paint the cached surface.
+    """
+    display = virtual_display(480, 272, 'ARGB32')
+    image = svg_image.SVGImage('', svg_data=ICON_SVG)
+
+    def cold_draw(size):
+        """Draw the image at size, without its cached surfaces."""
+        image.invalidate_cache()
+        image.draw(display.ctx, 10, 10, size, size)
+
+    results = []
+    for size in ICON_SIZES:
+        results.append({
+            'size': size,
+            'seconds_per_cold_draw': time_per_call(cold_draw, repeat, size),
+            'seconds_per_warm_draw': time_per_call(
+                image.draw, repeat, display.ctx, 10, 10, size, size),
+        })
+    display.close()
+    return results
+
+
+def bench_marquee(repeat):
+    """Measure one Marquee.show frame, smooth and not smooth.
+
+    Also with a long ticker text, not smooth (a smooth text buffer cannot
+    be wider than 32767 pixels).
+    """
+    display = virtual_display(480, 272, 'ARGB32')
+    results = []
+    for text, smooth in ((MARQUEE_TEXT, False),
+                         (MARQUEE_TEXT, True),
+                         (MARQUEE_LONG_TEXT, False)):
+        marquee = widgets.Marquee(
+            display_object=display,
+            text=text,
+            font_face=cairo.ToyFontFace('sans'),
+            font_size=18,
+            text_color=(0, 0, 0, 1),
+            pos_x=10, pos_y=100, width=300, height=30,
+            smooth=smooth)
+        marquee.start(display.ctx)
+
+        def frame(marquee=marquee):
+            """Draw a frame, even if the text did not move."""
+            marquee.request_redraw()
+            marquee.show(display.ctx, True)
+
+        results.append({
+            'smooth': smooth,
+            'characters': len(text),
+            'seconds_per_frame': time_per_call(frame, repeat),
+        })
+        marquee.stop()
+    display.close()
+    return results
+
+
+def bench_transitions(repeat):
+    """Measure the evaluation rate of every transition.
+
+    Each transition is also measured through a
+    :class:`cairotft.transitions.LUTTransition`, with its maximum error,
+    and on a numpy array of progress values when numpy is installed.
+    """
+    progresses = [index / 100 for index in range(101)]
+    if transitions.numpy is not None:
+        progress_array = transitions.numpy.array(progresses)
+    results = []
+    for transition in TRANSITIONS:
+        for ease in ('ease_in', 'ease_out', 'ease_in_out'):
+            func = getattr(transition, ease)
+            seconds = time_per_call(
+                lambda func=func: [func(progress) for progress in progresses],
+                max(1, repeat // 10))
+            lut = transitions.LUTTransition(func)
+            lut_seconds = time_per_call(
+                lambda lut=lut: [lut(progress) for progress in progresses],
+                max(1, repeat // 10))
+            result = {
+                'transition': transition.__name__,
+                'ease': ease,
+                'evaluations_per_second': len(progresses) / seconds,
+                'lut_size': lut.size,
+                'lut_evaluations_per_second': len(progresses) / lut_seconds,
+                'lut_max_error': lut.max_error(),
+            }
+            if transitions.numpy is not None:
+                array_seconds = time_per_call(
+                    lambda func=func: func(progress_array),
+                    max(1, repeat // 10))
+                result['array_evaluations_per_second'] = (
+                    len(progresses) / array_seconds)
+            results.append(result)
+    return results
+
+
+def run(suites=SUITES, repeat=100, resolutions=RESOLUTIONS):
+    """Run the benchmark suites.
+
+    :param suites: names of the suites to run (see :data:`SUITES`).
+    :param int repeat: number of measured calls per benchmark.
+    :param resolutions: list of (width, height) for the blit benchmarks.
+
+    :return: a dict ready to be dumped in JSON.
+    """
+    # the displays need an event loop, even if it is not run
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    try:
+        if 'blit' in suites:
+            results['blit'] = bench_blit(repeat, resolutions)
+        if 'svg' in suites:
+            results['svg'] = bench_svg(repeat)
+        if 'marquee' in suites:
+            results['marquee'] = bench_marquee(repeat)
+        if 'transitions' in suites:
+            results['transitions'] = bench_transitions(repeat)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    return {
+        'cairotft_version': _version(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def _version():
+    """Return the version of cairotft as a string."""
+    version = cairotft.__version__
+    if isinstance(version, bytes):
+        # read from the RELEASE-VERSION resource.
+        version = version.decode('ascii')
+    return version
+
+
+def _resolution(value):
+    """Parse a WIDTHxHEIGHT command line value."""
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        prog='python -m cairotft.bench',
+        description='Run the cairotft benchmarks on a virtual framebuffer.')
+    parser.add_argument('suites', nargs='*', metavar='SUITE',
+                        help='suites to run (%s), all by default' %
+                        ', '.join(SUITES))
+    parser.add_argument('-n', '--repeat', type=int, default=100,
+                        help='number of measured calls per benchmark')
+    parser.add_argument('-r', '--resolution', type=_resolution,
+                        action='append', dest='resolutions',
+                        help='WIDTHxHEIGHT of the blit benchmarks '
+                        '(can be repeated)')
+    parser.add_argument('-o', '--output', type=argparse.FileType('w'),
+                        default=sys.stdout,
+                        help='JSON output file (default: stdout)')
+    args = parser.parse_args(argv)
+    for suite in args.suites:
+        if suite not in SUITES:
+            parser.error('unknown suite: %s' % suite)
+    results = run(suites=args.suites or SUITES,
+                  repeat=args.repeat,
+                  resolutions=args.resolutions or RESOLUTIONS)
+    json.dump(results, args.output, indent=2, sort_keys=True)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
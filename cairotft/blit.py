@@ -0,0 +1,222 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Copy of the memory buffer into the framebuffer.
+
+The framebuffer memory is usually uncached: reading it back is very slow, so
+none of the strategies here reads the destination pixels.
+
+* ``cairo``: cairo paint with OPERATOR_SOURCE, works for every pixel format.
+* ``rows``: copy of the damaged rows with memory slices, one slice per row
+  (or one slice for rectangles as wide as the screen).
+* ``full``: copy of the whole buffer with one memory slice.
+"""
+import time
+
+import cairocffi as cairo
+
+#: number of bytes per pixel of the cairo formats that can be copied with
+#: memory slices.
+BYTES_PER_PIXEL = {
+    cairo.FORMAT_ARGB32: 4,
+    cairo.FORMAT_RGB24: 4,
+    cairo.FORMAT_RGB16_565: 2,
+    cairo.FORMAT_A8: 1,
+}
+
+#: when the damaged area is bigger than this ratio of the screen, the whole
+#: buffer is copied in one slice.
+FULL_COPY_RATIO = 0.75
+
+STRATEGIES = ('cairo', 'rows', 'full')
+
+
+class BlitEngine():
+
+    """Copy damaged regions of a memory buffer into a screen buffer.
+
+    Source and destination have the same size, pixel format and stride.
+
+    :ivar source_surf: (:class:`cairocffi.ImageSurface`) surface of the
+        memory buffer.
+    :ivar dest_surf: (:class:`cairocffi.ImageSurface`) surface of the
+        screen buffer.
+    :ivar cairo_format: (:py:class:`int`) cairo pixel format.
+    :ivar stride: (:py:class:`int`) number of bytes per line.
+    :ivar strategy: (:py:class:`str`) forced strategy name, or None to
+        choose automatically.
+    :ivar bytes_copied: (:py:class:`int`) number of bytes copied by the
+        last :meth:`blit` call.
+    """
+
+    def __init__(self, source_surf, source_mem, dest_surf, dest_mem,
+                 cairo_format, stride, strategy=None):
+        """Initialisation of the blit engine.
+
+        :param source_surf: surface of the memory buffer.
+        :type source_surf: :class:`cairocffi.ImageSurface`
+        :param source_mem: memory of the source surface (any object
+            supporting the buffer protocol).
+        :param dest_surf: surface of the screen buffer.
+        :type dest_surf: :class:`cairocffi.ImageSurface`
+        :param dest_mem: memory of the destination surface (any object
+            supporting the buffer protocol).
+        :param int cairo_format: cairo pixel format.
+        :param int stride: number of bytes per line.
+        :param str strategy: one of :data:`STRATEGIES` to force a strategy,
+            or None to choose automatically.
+
+        :raise ValueError: if the strategy is unknown, or copies memory
+            slices of a format not in :data:`BYTES_PER_PIXEL`.
+        """
+        if strategy is not None and strategy not in STRATEGIES:
+            raise ValueError('unknown blit strategy: %s' % strategy)
+        if strategy not in (None, 'cairo') and (cairo_format not in
+                                                BYTES_PER_PIXEL):
+            raise ValueError('the %s blit strategy cannot copy the cairo '
+                             'format %s' % (strategy, cairo_format))
+        self.source_surf = source_surf
+        self.dest_surf = dest_surf
+        self.cairo_format = cairo_format
+        self.stride = stride
+        self.strategy = strategy
+        self.bytes_copied = 0
+        self._width = source_surf.get_width()
+        self._height = source_surf.get_height()
+        self._size = stride * self._height
+        self._bpp = BYTES_PER_PIXEL.get(cairo_format)
+        self._source_mem = memoryview(source_mem).cast('B')
+        self._dest_mem = memoryview(dest_mem).cast('B')
+        self._dest_ctx = cairo.Context(dest_surf)
+        self._dest_ctx.set_operator(cairo.OPERATOR_SOURCE)
+
+    @property
+    def strategies(self):
+        """Return the names of the strategies usable with this format."""
+        if self._bpp is None:
+            return ('cairo',)
+        return STRATEGIES
+
+    def choose_strategy(self, region):
+        """Return the name of the best strategy to copy the region.
+
+        :param region: the damaged region.
+        :type region: :class:`cairotft.damage.DamageRegion`
+        """
+        if self.strategy is not None:
+            return self.strategy
+        if self._bpp is None:
+            return 'cairo'
+        if (region.is_full or region.area >=
+                FULL_COPY_RATIO * self._width * self._height):
+            return 'full'
+        return 'rows'
+
+    def blit(self, region, strategy=None):
+        """Copy the damaged region of the memory buffer to the screen.
+
+        :param region: the damaged region.
+        :type region: :class:`cairotft.damage.DamageRegion`
+        :param str strategy: force a strategy for this copy.
+
+        :return: the number of bytes copied.
+        """
+        strategy = strategy or self.choose_strategy(region)
+        if strategy == 'cairo':
+            self.bytes_copied = self._blit_cairo(region)
+        else:
+            self.source_surf.flush()
+            if strategy == 'rows':
+                self.bytes_copied = self._blit_rows(region)
+            else:
+                self.bytes_copied = self._blit_full()
+            self.dest_surf.mark_dirty()
+        return self.bytes_copied
+
+    def _blit_cairo(self, region):
+        """Copy the region with cairo and OPERATOR_SOURCE."""
+        ctx = self._dest_ctx
+        ctx.set_source_surface(self.source_surf)
+        if region.is_full:
+            ctx.paint()
+        else:
+            for rect in region.rects:
+                ctx.rectangle(*rect)
+            ctx.fill()
+        return region.area * (self._bpp or 1)
+
+    def _blit_rows(self, region):
+        """Copy the region with one memory slice per row."""
+        src = self._source_mem
+        dest = self._dest_mem
+        stride = self.stride
+        copied = 0
+        for (pos_x, pos_y, width, height) in region.rects:
+            if width == self._width:
+                start = pos_y * stride
+                end = start + height * stride
+                dest[start:end] = src[start:end]
+                copied += end - start
+                continue
+            start = pos_y * stride + pos_x * self._bpp
+            length = width * self._bpp
+            for offset in range(start, start + height * stride, stride):
+                dest[offset:offset + length] = src[offset:offset + length]
+            copied += length * height
+        return copied
+
+    def _blit_full(self):
+        """Copy the whole buffer with one memory slice."""
+        self._dest_mem[:self._size] = self._source_mem[:self._size]
+        return self._size
+
+    def benchmark(self, region, repeat=100):
+        """Measure the copy time of the region with each strategy.
+
+        :param region: the damaged region to copy.
+        :type region: :class:`cairotft.damage.DamageRegion`
+        :param int repeat: number of copies per strategy.
+
+        :return: a dict {strategy name: mean time of one copy in seconds}.
+        """
+        results = {}
+        for strategy in self.strategies:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                self.blit(region, strategy)
+            results[strategy] = (time.perf_counter() - start) / repeat
+        return results
+
+    def release(self):
+        """Release the memory views and surfaces.
+
+        Needed before closing the mmap: the engine cannot be used anymore.
+        """
+        self._source_mem.release()
+        self._dest_mem.release()
+        self.source_surf = self.dest_surf = self._dest_ctx = None
@@ -0,0 +1,141 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Damage (dirty rectangles) tracking.
+
+The damage region collects the rectangles of the memory buffer that changed
+since the last blit, so only those parts are copied to the screen.
+"""
+import math
+
+
+def _area(rect):
+    """Return the area of a (x0, y0, x1, y1) rectangle."""
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+def _union(rect_a, rect_b):
+    """Return the bounding box of two (x0, y0, x1, y1) rectangles."""
+    return (min(rect_a[0], rect_b[0]), min(rect_a[1], rect_b[1]),
+            max(rect_a[2], rect_b[2]), max(rect_a[3], rect_b[3]))
+
+
+def _should_merge(rect_a, rect_b):
+    """Return True if the two rectangles are better copied as one.
+
+    Rectangles are merged when they overlap or touch, or when their bounding
+    box is not bigger than the two rectangles copied separately.
+    """
+    if (rect_a[0] <= rect_b[2] and rect_b[0] <= rect_a[2] and
+            rect_a[1] <= rect_b[3] and rect_b[1] <= rect_a[3]):
+        return True
+    return _area(_union(rect_a, rect_b)) <= _area(rect_a) + _area(rect_b)
+
+
+class DamageRegion():
+
+    """A set of non overlapping dirty rectangles inside the screen.
+
+    :ivar width: (:py:class:`int`) width of the tracked area in pixels.
+    :ivar height: (:py:class:`int`) height of the tracked area in pixels.
+    :ivar max_rects: (:py:class:`int`) maximum number of rectangles kept.
+        When more rectangles are needed, they are collapsed into their
+        bounding box.
+    """
+
+    def __init__(self, width, height, max_rects=8):
+        """Initialisation of the damage region.
+
+        :param int width: width of the tracked area in pixels.
+        :param int height: height of the tracked area in pixels.
+        :param int max_rects: maximum number of distinct rectangles.
+        """
+        self.width = width
+        self.height = height
+        self.max_rects = max_rects
+        self._rects = []
+
+    def __bool__(self):
+        """Return True if some area is damaged."""
+        return bool(self._rects)
+
+    @property
+    def is_full(self):
+        """Return True if the whole area is damaged."""
+        return self._rects == [(0, 0, self.width, self.height)]
+
+    @property
+    def rects(self):
+        """Return the damaged rectangles as a list of (x, y, width, height)."""
+        return [(x0, y0, x1 - x0, y1 - y0) for (x0, y0, x1, y1) in self._rects]
+
+    @property
+    def area(self):
+        """Return the number of damaged pixels."""
+        return sum(_area(rect) for rect in self._rects)
+
+    def add(self, pos_x, pos_y, width, height):
+        """Add a damaged rectangle.
+
+        The rectangle is clipped to the tracked area and extended to whole
+        pixels.
+
+        :param pos_x: x coordinates of the rectangle (top left corner)
+        :param pos_y: y coordinates of the rectangle (top left corner)
+        :param width: width of the rectangle
+        :param height: height of the rectangle
+        """
+        rect = (max(0, int(math.floor(pos_x))),
+                max(0, int(math.floor(pos_y))),
+                min(self.width, int(math.ceil(pos_x + width))),
+                min(self.height, int(math.ceil(pos_y + height))))
+        if rect[0] >= rect[2] or rect[1] >= rect[3] or self.is_full:
+            return
+        merged = True
+        while merged:
+            merged = False
+            for index, other in enumerate(self._rects):
+                if _should_merge(rect, other):
+                    rect = _union(rect, other)
+                    del self._rects[index]
+                    merged = True
+                    break
+        self._rects.append(rect)
+        if len(self._rects) > self.max_rects:
+            bounds = self._rects[0]
+            for other in self._rects[1:]:
+                bounds = _union(bounds, other)
+            self._rects = [bounds]
+
+    def add_all(self):
+        """Mark the whole area as damaged."""
+        self._rects = [(0, 0, self.width, self.height)]
+
+    def clear(self):
+        """Forget all damaged rectangles."""
+        self._rects = []
@@ -0,0 +1,305 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Base class of the images drawn in a box.
+
+An image knows its intrinsic size and can give a rasterized surface of any
+size (:meth:`BaseImage.rasterize`); :meth:`BaseImage.draw` fits it inside a
+box keeping its aspect ratio. Widgets accept any of these images
+(ex: :class:`cairotft.svg_image.SVGImage`).
+
+The rasterized surfaces are usually kept in a :class:`RasterCache`.
+
+An image can be drawn in any color (``draw(..., color=(r, g, b, a))``):
+its alpha mask (an A8 raster, cached like the other rasters) is painted
+with the color, so the color variants of an image share one raster.
+"""
+import collections
+import itertools
+import threading
+
+import cairocffi as cairo
+
+from cairotft import trace
+
+#: default memory cap (in bytes) of the raster cache of an image.
+DEFAULT_CACHE_SIZE = 4 * 1024 * 1024
+
+# unique identifiers of the images in the raster caches (ids of python
+# objects may be reused once the object is freed).
+_IMAGE_IDS = itertools.count()
+
+
+def new_image_id():
+    """Return a new unique image identifier, for the raster cache keys."""
+    return next(_IMAGE_IDS)
+
+
+class RasterCache():
+
+    """LRU cache of rasterized images, with a memory cap.
+
+    The cache can be used from several threads (e.g. the event loop and
+    the threads loading the images).
+
+    :ivar max_bytes: (:py:class:`int`) maximum size of the cached surfaces
+        in bytes. The least recently used surfaces are dropped first.
+    :ivar size: (:py:class:`int`) current size of the cached surfaces in
+        bytes.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_SIZE):
+        """Initialisation of the cache.
+
+        :param int max_bytes: maximum size of the cached surfaces in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._surfaces = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of cached surfaces."""
+        return len(self._surfaces)
+
+    @staticmethod
+    def surface_size(surface):
+        """Return the memory size of an image surface in bytes."""
+        return surface.get_stride() * surface.get_height()
+
+    def get(self, key):
+        """Return the surface cached with the key, or None."""
+        with self._lock:
+            surface = self._surfaces.get(key)
+            if surface is not None:
+                self._surfaces.move_to_end(key)
+            return surface
+
+    def put(self, key, surface):
+        """Cache a surface, dropping the least recently used ones if needed.
+
+        Surfaces bigger than the cache are not cached.
+        """
+        size = self.surface_size(surface)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._surfaces[key] = surface
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._surfaces)))
+
+    def _remove(self, key):
+        """Remove a surface from the cache (cache locked)."""
+        surface = self._surfaces.pop(key, None)
+        if surface is not None:
+            self.size -= self.surface_size(surface)
+
+    def invalidate(self, image_id=None):
+        """Drop the cached surfaces.
+
+        :param int image_id: if given, only drop the surfaces of this image
+            (the first item of the keys).
+        """
+        with self._lock:
+            if image_id is None:
+                self._surfaces.clear()
+                self.size = 0
+                return
+            for key in [key for key in self._surfaces
+                        if key[0] == image_id]:
+                self._remove(key)
+
+
+class BaseImage():
+
+    """Base class for all images.
+
+    :ivar intrinsic_width: (:py:class:`float`) width of the original image.
+    :ivar intrinsic_height: (:py:class:`float`) height of the original image.
+    :ivar intrinsic_ratio: (:py:class:`float`) width / height of the original
+        image.
+    """
+
+    intrinsic_width = None
+    intrinsic_height = None
+    intrinsic_ratio = None
+
+    def get_intrinsic_size(self, _image_resolution):
+        """Return a tuple: (intrinsic_width, intrinsic_height)."""
+        # Vector images are affected by the 'image-resolution' property.
+        return self.intrinsic_width, self.intrinsic_height
+
+    @staticmethod
+    def _scale_to_fit(image, frame, enlarge=False):
+        """scale an image always keeping aspect ratio inside the frame.
+
+        :param image: tuple of int (width, eight)
+        :param fram: tuple of int (width, eight)
+        :param bool enlarge: if True, do not only shrink, also enlarge.
+
+        :returns: a (widht, eight) tuple representing the target size of the
+            object.
+
+        (thanks to jon for this method)
+        """
+        image_width, image_height = image
+        frame_width, frame_height = frame
+        image_aspect = float(image_width) / image_height
+        frame_aspect = float(frame_width) / frame_height
+        # Determine maximum width/height (prevent up-scaling).
+        if not enlarge:
+            max_width = min(frame_width, image_width)
+            max_height = min(frame_height, image_height)
+        else:
+            max_width = frame_width
+            max_height = frame_height
+        # Frame is wider than image.
+        if frame_aspect > image_aspect:
+            height = max_height
+            width = int(height * image_aspect)
+        # Frame is taller than image.
+        else:
+            width = max_width
+            height = int(width / image_aspect)
+        return (width, height)
+
+    def target_size(self, width, height, enlarge=True):
+        """Return the size (in whole pixels) of the image drawn in a box.
+
+        :param int width: width of the box the image will fit inside
+        :param int height: height of the box the image will fit inside
+        :param bool enlarge: if True, the image may be bigger than its
+            intrinsic size.
+        """
+        image_width, image_height = self._scale_to_fit(
+            image=(self.intrinsic_width, self.intrinsic_height),
+            frame=(width, height),
+            enlarge=enlarge)
+        return int(image_width), int(image_height)
+
+    def rasterize(self, width, height, cairo_format=None):
+        """Return the image rasterized at the given size.
+
+        Implement this method in your subclasses.
+
+        :param int width: width of the rasterized image.
+        :param int height: height of the rasterized image.
+        :param int cairo_format: pixel format of the rasterized image
+            (None: the natural format of the image).
+
+        :return: a :class:`cairocffi.ImageSurface` (do not draw on it).
+        """
+        raise NotImplementedError
+
+    def invalidate_cache(self):
+        """Drop the cached rasters of this image.
+
+        Implement this method in the subclasses caching their rasters.
+        """
+
+    def paint(self, context, pos_x, pos_y, width, height, cairo_format=None):
+        """Paint the image at the given size (no aspect ratio kept).
+
+        :param context: cairo context
+        :param int pos_x: x position (top left corner)
+        :param int pos_y: y position (top left corner)
+        :param int width: width of the painted image.
+        :param int height: height of the painted image.
+        :param int cairo_format: pixel format of the rasterized image
+            (None: the natural format of the image).
+        """
+        context.set_source_surface(
+            self.rasterize(width, height, cairo_format), pos_x, pos_y)
+        context.paint()
+
+    def mask(self, width, height):
+        """Return the alpha mask of the image at the given size.
+
+        The mask is rasterized once per size: do not draw on it.
+
+        :param int width: width of the mask.
+        :param int height: height of the mask.
+
+        :return: a :class:`cairocffi.ImageSurface` in the A8 format.
+        """
+        return self.rasterize(width, height, cairo.FORMAT_A8)
+
+    def paint_mask(self, context, pos_x, pos_y, width, height, color):
+        """Paint the image in a color at the given size.
+
+        :param context: cairo context
+        :param int pos_x: x position (top left corner)
+        :param int pos_y: y position (top left corner)
+        :param int width: width of the painted image.
+        :param int height: height of the painted image.
+        :param tuple color: rgba color (4 floats).
+        """
+        context.set_source_rgba(*color)
+        context.mask_surface(self.mask(width, height), pos_x, pos_y)
+
+    def draw(self, context, pos_x, pos_y,
+             width, height, enlarge=True, center_y=False,
+             cairo_format=None, color=None):
+        """Draw the image inside a box of size (width, eight).
+
+        This draw methods keeps automatically the aspect ration of the image.
+
+        :param context: cairo context
+        :param int pos_x: x position (top left corner)
+        :param int pos_y: y position (top left corner)
+        :param int width: width of the box the image will fit inside
+        :param int height: height of the box the image will fit inside
+        :param bool enlarge: if true and if the base image is smaller than
+            the box, it will enlarge the image. If False, display the original
+            smaller image.
+        :param bool center_y: if True add an offset to y in order to center
+            the image into the box.
+        :param int cairo_format: pixel format of the rasterized image
+            (None: the natural format of the image).
+        :param tuple color: if given, rgba color (4 floats) of the image:
+            only its alpha channel is used (see :meth:`mask`).
+        """
+        tracer = trace.get_tracer()
+        if tracer is not None:
+            name = '%s.draw' % type(self).__name__
+            tracer.begin(name, 'image', {'width': width, 'height': height})
+        image_width, image_height = self.target_size(width, height, enlarge)
+        if center_y:
+            y_offset = int((height - image_height) / 2)
+        else:
+            y_offset = 0
+        if image_width > 0 and image_height > 0 and color is not None:
+            self.paint_mask(context, pos_x, pos_y + y_offset,
+                            image_width, image_height, color)
+        elif image_width > 0 and image_height > 0:
+            self.paint(context, pos_x, pos_y + y_offset,
+                       image_width, image_height, cairo_format)
+        if tracer is not None:
+            tracer.end(name, 'image')
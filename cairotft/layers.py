@@ -0,0 +1,291 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Offscreen layers composited into the memory buffer.
+
+In layer mode (see :meth:`cairotft.widgets.base.BaseWidget.enable_layer`),
+a widget draws into its own :class:`Layer` surface, only when its content
+changed. The :class:`LayerStack` of the display
+(:attr:`cairotft.tft.TftDisplay.layers`) then paints the changed parts of
+the screen from the layers, in z-order, just before the copy to the screen.
+Under the layers, it restores the base: a copy of what the application
+drew directly in the memory buffer (see :meth:`LayerStack.update_base`).
+
+So when a widget moves, or when a widget over or under it changes, the
+other widgets are not drawn again: their cached layers are painted.
+"""
+import bisect
+import math
+
+import cairocffi as cairo
+
+from cairotft import damage
+
+
+def _intersection(rect_a, rect_b):
+    """Return the intersection of two (x, y, width, height) boxes, or None."""
+    left = max(rect_a[0], rect_b[0])
+    top = max(rect_a[1], rect_b[1])
+    right = min(rect_a[0] + rect_a[2], rect_b[0] + rect_b[2])
+    bottom = min(rect_a[1] + rect_a[3], rect_b[1] + rect_b[3])
+    if right <= left or bottom <= top:
+        return None
+    return left, top, right - left, bottom - top
+
+
+class Layer():
+
+    """Offscreen surface of a widget.
+
+    The layer context draws with screen coordinates: the widget code is the
+    same in layer mode and in direct mode.
+
+    :ivar stack: (:class:`LayerStack`) the stack compositing the layer.
+    :ivar z_order: (:py:class:`int`) layers with a higher z_order are
+        painted over the others (same z_order: in the order of addition).
+    :ivar opaque: (:py:class:`bool`) True if each drawing covers the whole
+        box with opaque pixels: the layers under it are not painted.
+    :ivar surface: (:class:`cairocffi.ImageSurface`) the ARGB32 surface,
+        of the size of the widget.
+    :ivar ctx: (:class:`cairocffi.Context`) context drawing in the surface.
+    :ivar box: (:py:class:`tuple`) (pos_x, pos_y, width, height) where the
+        layer is painted on the screen, or None before the first drawing.
+    :ivar valid: (:py:class:`bool`) False when the content of the widget
+        changed since the last drawing of the layer.
+    """
+
+    def __init__(self, stack, box, z_order=0, opaque=False):
+        """Initialisation of the layer.
+
+        :param stack: the stack compositing the layer.
+        :type stack: :class:`LayerStack`
+        :param tuple box: (pos_x, pos_y, width, height) of the widget.
+        :param int z_order: the z-order of the layer.
+        :param bool opaque: True if the drawings of the widget are opaque.
+        """
+        self.stack = stack
+        self.z_order = z_order
+        self.opaque = opaque
+        self.surface = None
+        self.ctx = None
+        self.box = None
+        self.valid = False
+        self._placed_box = None
+        self.place(box)
+
+    def place(self, box):
+        """Prepare the layer to draw the widget in box.
+
+        The surface is allocated again if the size of the widget changed.
+
+        :param tuple box: (pos_x, pos_y, width, height) of the widget.
+        :return: the layer context.
+        """
+        pos_x, pos_y, width, height = box
+        if (self._placed_box is None or
+                self._placed_box[2:] != (width, height)):
+            self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                              max(int(math.ceil(width)), 1),
+                                              max(int(math.ceil(height)), 1))
+            self.ctx = cairo.Context(self.surface)
+            self.valid = False
+        self.ctx.identity_matrix()
+        self.ctx.translate(-pos_x, -pos_y)
+        self._placed_box = tuple(box)
+        return self.ctx
+
+    def clear(self, box=None):
+        """Make a box of the layer transparent.
+
+        :param tuple box: (pos_x, pos_y, width, height) in screen
+            coordinates (default: the whole layer).
+        """
+        self.ctx.save()
+        self.ctx.set_operator(cairo.OPERATOR_CLEAR)
+        self.ctx.rectangle(*(box or self._placed_box))
+        self.ctx.fill()
+        self.ctx.restore()
+
+    def commit(self):
+        """Report the layer as drawn: composite it at its new box."""
+        if self.box is not None and self.box != self._placed_box:
+            self.stack.damage(*self.box)
+        self.box = self._placed_box
+        self.valid = True
+        self.stack.damage(*self.box)
+
+    def move(self, box):
+        """Composite the cached layer at another place (same size).
+
+        :param tuple box: (pos_x, pos_y, width, height) of the widget.
+        """
+        self.place(box)
+        self.commit()
+
+
+class LayerStack():
+
+    """The layers of a display, composited in z-order.
+
+    :ivar display_object: (:class:`cairotft.tft.TftDisplay`) the display.
+    :ivar layers: (:py:class:`list`) the :class:`Layer` objects, sorted by
+        z-order (bottom first).
+    :ivar background_color: (:py:class:`tuple`) rgba color painted under
+        the layers, or None to restore the base content (see
+        :meth:`update_base`).
+    """
+
+    def __init__(self, display_object, background_color=None):
+        """Initialisation of the layer stack.
+
+        :param display_object: the Display class instanciation.
+        :type display_object: :class:`cairotft.tft.TftDisplay`
+        :param tuple background_color: rgba color painted under the layers
+            (default: the base content).
+        """
+        self.display_object = display_object
+        self.layers = []
+        self.background_color = background_color
+        self._ctx = cairo.Context(display_object.buffer_surf)
+        self._base_ctx = None
+        self._damage = damage.DamageRegion(display_object.width,
+                                           display_object.height)
+
+    def __bool__(self):
+        """Return True if some part of the screen must be composited."""
+        return bool(self._damage)
+
+    def add(self, box, z_order=0, opaque=False):
+        """Create a layer.
+
+        :param tuple box: (pos_x, pos_y, width, height) of the widget.
+        :param int z_order: the z-order of the layer.
+        :param bool opaque: True if the drawings of the widget are opaque.
+        :return: the new :class:`Layer`.
+        """
+        layer = Layer(self, box, z_order, opaque)
+        self._insert(layer)
+        return layer
+
+    def remove(self, layer):
+        """Remove a layer: the screen under it is composited again."""
+        self.layers.remove(layer)
+        if layer.box is not None:
+            self.damage(*layer.box)
+
+    def set_z_order(self, layer, z_order):
+        """Move a layer over or under the others.
+
+        :param layer: the layer.
+        :type layer: :class:`Layer`
+        :param int z_order: the new z-order.
+        """
+        self.layers.remove(layer)
+        layer.z_order = z_order
+        self._insert(layer)
+        if layer.box is not None:
+            self.damage(*layer.box)
+
+    def _insert(self, layer):
+        """Insert a layer over the layers of lower or same z-order."""
+        index = bisect.bisect_right([other.z_order for other in self.layers],
+                                    layer.z_order)
+        self.layers.insert(index, layer)
+
+    def update_base(self, box=None):
+        """Copy the content of the memory buffer drawn under the layers.
+
+        The base is copied at the first composition, so it holds what the
+        application drew before (e.g. in
+        :meth:`cairotft.tft.TftDisplay.draw_interface`). Call this method
+        after drawing again directly in the memory buffer, before the next
+        composition: the copied box must not show composited layers.
+
+        :param tuple box: (pos_x, pos_y, width, height) of the copied box
+            (default: the whole screen).
+        """
+        buffer_surf = self.display_object.buffer_surf
+        if self._base_ctx is None:
+            self._base_ctx = cairo.Context(cairo.ImageSurface(
+                buffer_surf.get_format(), buffer_surf.get_width(),
+                buffer_surf.get_height()))
+            box = None
+        ctx = self._base_ctx
+        ctx.save()
+        ctx.set_operator(cairo.OPERATOR_SOURCE)
+        ctx.set_source_surface(buffer_surf, 0, 0)
+        if box is None:
+            ctx.paint()
+        else:
+            ctx.rectangle(*box)
+            ctx.fill()
+        ctx.restore()
+
+    def damage(self, pos_x, pos_y, width, height):
+        """Mark a box of the screen to composite before the next copy."""
+        self._damage.add(pos_x, pos_y, width, height)
+        self.display_object.invalidate(pos_x, pos_y, width, height)
+
+    def composite(self):
+        """Paint the damaged boxes of the memory buffer from the layers.
+
+        Called by the display before each copy to the screen.
+        """
+        if not self._damage:
+            return
+        if self.background_color is None and self._base_ctx is None:
+            self.update_base()
+        ctx = self._ctx
+        for rect in self._damage.rects:
+            parts = []
+            for layer in self.layers:
+                part = (None if layer.box is None
+                        else _intersection(layer.box, rect))
+                if part is None:
+                    continue
+                if layer.opaque and part == rect:
+                    # nothing under an opaque layer covering the box shows.
+                    parts = []
+                parts.append((layer, part))
+            if not (parts and parts[0][0].opaque and parts[0][1] == rect):
+                # what shows under the layers: the base or the color.
+                ctx.save()
+                ctx.set_operator(cairo.OPERATOR_SOURCE)
+                if self.background_color is None:
+                    ctx.set_source_surface(self._base_ctx.get_target(), 0, 0)
+                else:
+                    ctx.set_source_rgba(*self.background_color)
+                ctx.rectangle(*rect)
+                ctx.fill()
+                ctx.restore()
+            for layer, part in parts:
+                ctx.set_source_surface(layer.surface,
+                                       layer.box[0], layer.box[1])
+                ctx.rectangle(*part)
+                ctx.fill()
+        self._damage.clear()
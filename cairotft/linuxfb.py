@@ -14,8 +14,13 @@ update for cairotft: this module has been modified to support
         It has also been modified for python 3.4 compat'
 """
 import os
+import re
 import mmap
 import ctypes
+import logging
+import math
+import tempfile
+import threading
 from fcntl import ioctl
 
 #
@@ -28,8 +33,27 @@ from fcntl import ioctl
 # (2457600,)
 #
 
+LOGGER = logging.getLogger(__name__)
+
 FBIOGET_VSCREENINFO = 0x4600
+FBIOPUT_VSCREENINFO = 0x4601
 FBIOGET_FSCREENINFO = 0x4602
+FBIOPAN_DISPLAY = 0x4606
+FBIO_WAITFORVSYNC = 0x40044620  # _IOW('F', 0x20, __u32)
+
+FB_VISUAL_TRUECOLOR = 2
+
+#: prefix of the interface names opening a virtual framebuffer, ex:
+#: 'virtual:480x272' or 'virtual:480x272x16'
+VIRTUAL_PREFIX = 'virtual:'
+
+# color bitfields (offset, length) of the virtual framebuffers:
+# (red, green, blue, transp) by bits per pixel.
+_VIRTUAL_BITFIELDS = {
+    8: ((0, 8), (0, 8), (0, 8), (0, 0)),
+    16: ((11, 5), (5, 6), (0, 5), (0, 0)),
+    32: ((16, 8), (8, 8), (0, 8), (24, 8)),
+}
 
 
 class FbFid(int):
@@ -96,6 +120,25 @@ class VarScreenInfo(ctypes.Structure):
         ('green', FbBitField),
         ('blue', FbBitField),
         ('transp', FbBitField),
+
+        ('nonstd', ctypes.c_uint32),
+        ('activate', ctypes.c_uint32),
+        ('height', ctypes.c_uint32),
+        ('width', ctypes.c_uint32),
+        ('accel_flags', ctypes.c_uint32),
+
+        ('pixclock', ctypes.c_uint32),
+        ('left_margin', ctypes.c_uint32),
+        ('right_margin', ctypes.c_uint32),
+        ('upper_margin', ctypes.c_uint32),
+        ('lower_margin', ctypes.c_uint32),
+        ('hsync_len', ctypes.c_uint32),
+        ('vsync_len', ctypes.c_uint32),
+        ('sync', ctypes.c_uint32),
+        ('vmode', ctypes.c_uint32),
+        ('rotate', ctypes.c_uint32),
+        ('colorspace', ctypes.c_uint32),
+        ('reserved', ctypes.c_uint32 * 4),
     ]
 
 
@@ -131,6 +174,41 @@ def get_var_info(fbfid):
     return var_info
 
 
+def put_var_info(fbfid, var_info):
+    """Set the var screen info of the framebuffer file descriptor.
+
+    The driver may adjust the given values: read them back with
+    :func:`get_var_info`.
+    """
+    ioctl(fbfid, FBIOPUT_VSCREENINFO, var_info)
+
+
+def pan_display(fbmem, yoffset):
+    """Show the part of the virtual framebuffer starting at line yoffset.
+
+    :param fbmem: framebuffer memory object
+    :param int yoffset: first line of the virtual framebuffer to display.
+
+    :raise OSError: if the driver does not support panning.
+
+    On a virtual framebuffer, only the yoffset is changed.
+    """
+    if not fbmem.virtual:
+        var_info = VarScreenInfo.from_buffer_copy(fbmem.var_info)
+        var_info.xoffset = 0
+        var_info.yoffset = yoffset
+        ioctl(fbmem.fid, FBIOPAN_DISPLAY, var_info)
+    fbmem.var_info.yoffset = yoffset
+
+
+def wait_for_vsync(fbfid):
+    """Block until the next vertical blank of the framebuffer.
+
+    :raise OSError: if the driver does not support FBIO_WAITFORVSYNC.
+    """
+    ioctl(fbfid, FBIO_WAITFORVSYNC, ctypes.c_uint32(0))
+
+
 def map_fb_memory(fbfid, fix_info):
     """Map the framebuffer memory."""
     return mmap.mmap(
@@ -151,14 +229,23 @@ class FbMem(object):
         - the fix screen info struct
         - the var screen info struct
         - the mapped memory
+        - the virtual flag: True if the memory is not a real framebuffer
     """
 
-    __slots__ = ('fid', 'fix_info', 'var_info', 'mmap')
+    __slots__ = ('fid', 'fix_info', 'var_info', 'mmap', 'virtual')
 
 
 def open_fbmem(fbdev=None):
-    """Create the FbMem framebuffer memory object."""
-    fid = open_fbdev(fbdev)
+    """Create the FbMem framebuffer memory object.
+
+    Try to use the FRAMEBUFFER environment variable if fbdev is not given.
+    Use '/dev/fb0' by default. A name starting with :data:`VIRTUAL_PREFIX`
+    opens a virtual framebuffer (see :func:`parse_virtual_spec`).
+    """
+    dev = fbdev or os.getenv('FRAMEBUFFER', '/dev/fb0')
+    if dev.startswith(VIRTUAL_PREFIX):
+        return open_virtual_fbmem(**parse_virtual_spec(dev))
+    fid = open_fbdev(dev)
     fix_info = get_fix_info(fid)
     fbmmap = map_fb_memory(fid, fix_info)
     fbmem = FbMem()
@@ -166,9 +253,186 @@ def open_fbmem(fbdev=None):
     fbmem.fix_info = fix_info
     fbmem.var_info = get_var_info(fid)
     fbmem.mmap = fbmmap
+    fbmem.virtual = False
+    return fbmem
+
+
+def parse_virtual_spec(spec):
+    """Parse a virtual framebuffer name.
+
+    The name is 'virtual:<xres>x<yres>' or 'virtual:<xres>x<yres>x<bpp>',
+    with an optional ',yres_virtual=<n>' and/or ',line_length=<n>' suffix,
+    ex: 'virtual:480x272x16,yres_virtual=544'.
+
+    :return: a dict of :func:`open_virtual_fbmem` parameters.
+    """
+    match = re.match(
+        r'^%s(\d+)x(\d+)(?:x(\d+))?((?:,\w+=\d+)*)$' % VIRTUAL_PREFIX,
+        spec)
+    if match is None:
+        raise ValueError('invalid virtual framebuffer name: %s' % spec)
+    params = {'xres': int(match.group(1)), 'yres': int(match.group(2))}
+    if match.group(3):
+        params['bits_per_pixel'] = int(match.group(3))
+    for option in match.group(4).split(',')[1:]:
+        key, value = option.split('=')
+        if key not in ('yres_virtual', 'line_length'):
+            raise ValueError('unknown virtual framebuffer option: %s' % key)
+        params[key] = int(value)
+    return params
+
+
+def _memory_fd(name, size):
+    """Return a file descriptor on an anonymous file of the given size.
+
+    Use memfd_create when available, else an unlinked temporary file.
+    """
+    if hasattr(os, 'memfd_create'):
+        fid = os.memfd_create(name)
+    else:
+        fid, path = tempfile.mkstemp(prefix=name)
+        os.unlink(path)
+    os.ftruncate(fid, size)
+    return fid
+
+
+def open_virtual_fbmem(xres, yres, bits_per_pixel=32, line_length=None,
+                       yres_virtual=None):
+    """Create a FbMem object backed by memory instead of a framebuffer.
+
+    The virtual framebuffer can be used like a real one (ex: for
+    benchmarks or tests on a machine without screen). Panning is emulated;
+    FBIO_WAITFORVSYNC is not supported.
+
+    :param int xres: width in pixels.
+    :param int yres: height in pixels.
+    :param int bits_per_pixel: 8, 16 or 32.
+    :param int line_length: number of bytes per line (default: the
+        smallest multiple of 4 bytes holding xres pixels).
+    :param int yres_virtual: height of the virtual framebuffer in pixels
+        (default: yres). Use 2 * yres to allow page flipping.
+    """
+    if bits_per_pixel not in _VIRTUAL_BITFIELDS:
+        raise ValueError('unsupported bits per pixel: %s' % bits_per_pixel)
+    if line_length is None:
+        line_length = (xres * bits_per_pixel // 8 + 3) // 4 * 4
+    yres_virtual = yres_virtual or yres
+
+    fix_info = FixScreenInfo()
+    fix_info.id_name = b'virtual'
+    fix_info.smem_len = line_length * yres_virtual
+    fix_info.visual = FB_VISUAL_TRUECOLOR
+    fix_info.ypanstep = 1
+    fix_info.line_length = line_length
+
+    var_info = VarScreenInfo()
+    var_info.xres = var_info.xres_virtual = xres
+    var_info.yres = yres
+    var_info.yres_virtual = yres_virtual
+    var_info.bits_per_pixel = bits_per_pixel
+    for name, (offset, length) in zip(
+            ('red', 'green', 'blue', 'transp'),
+            _VIRTUAL_BITFIELDS[bits_per_pixel]):
+        bitfield = getattr(var_info, name)
+        bitfield.offset = offset
+        bitfield.length = length
+
+    fid = FbFid(_memory_fd('cairotft-fb', fix_info.smem_len))
+    fid.name = '%s%dx%dx%d' % (VIRTUAL_PREFIX, xres, yres, bits_per_pixel)
+    fbmem = FbMem()
+    fbmem.fid = fid
+    fbmem.fix_info = fix_info
+    fbmem.var_info = var_info
+    fbmem.mmap = map_fb_memory(fid, fix_info)
+    fbmem.virtual = True
     return fbmem
 
 
+def page_size(fbmem):
+    """Return the size in bytes of one visible screen page."""
+    return fbmem.fix_info.line_length * fbmem.var_info.yres
+
+
+def page_buffer(fbmem, page):
+    """Return the mapped memory of one screen page of the framebuffer.
+
+    Page 0 is the memory displayed with a yoffset of 0, page 1 the memory
+    displayed with a yoffset of yres, etc...
+
+    :param fbmem: framebuffer memory object
+    :param int page: page number.
+
+    :return: a memoryview on the mapped memory of the page
+    """
+    size = page_size(fbmem)
+    return memoryview(fbmem.mmap)[page * size:(page + 1) * size]
+
+
+def setup_page_flip(fbmem, pages=2):
+    """Try to make the virtual framebuffer high enough for page flipping.
+
+    If the virtual height is lower than pages * yres, ask the driver for a
+    bigger one (and map the bigger memory), then check that the driver
+    supports panning. If page flipping cannot be used, the original screen
+    info is put back.
+
+    :param fbmem: framebuffer memory object
+    :param int pages: number of screen pages wanted.
+
+    :return: True if page flipping with :func:`pan_display` can be used.
+    """
+    var_info = fbmem.var_info
+    if fbmem.fix_info.ypanstep == 0:
+        return False
+    orig_var_info = VarScreenInfo.from_buffer_copy(var_info)
+    orig_fix_info = fbmem.fix_info
+    orig_mmap = fbmem.mmap
+    resized = False
+    try:
+        if var_info.yres_virtual < pages * var_info.yres:
+            new_var_info = VarScreenInfo.from_buffer_copy(var_info)
+            new_var_info.yres_virtual = pages * var_info.yres
+            new_var_info.yoffset = 0
+            put_var_info(fbmem.fid, new_var_info)
+            resized = True
+            fbmem.var_info = get_var_info(fbmem.fid)
+            fbmem.fix_info = get_fix_info(fbmem.fid)
+        _setup_pages(fbmem, pages)
+    except OSError:
+        # put the device back as it was.
+        if fbmem.mmap is not orig_mmap:
+            fbmem.mmap.close()
+            fbmem.mmap = orig_mmap
+        if resized:
+            try:
+                put_var_info(fbmem.fid, orig_var_info)
+            except OSError:
+                pass
+        fbmem.var_info = orig_var_info
+        fbmem.fix_info = orig_fix_info
+        return False
+    if fbmem.mmap is not orig_mmap:
+        orig_mmap.close()
+    return True
+
+
+def _setup_pages(fbmem, pages):
+    """Map the pages of the virtual framebuffer and check the panning.
+
+    The bigger memory map, if needed, replaces fbmem.mmap but the previous
+    one is not closed.
+
+    :raise OSError: if the pages cannot be used for page flipping.
+    """
+    if fbmem.var_info.yres_virtual < pages * fbmem.var_info.yres:
+        raise OSError('the driver refused the virtual height')
+    if len(fbmem.mmap) < pages * page_size(fbmem):
+        if fbmem.fix_info.smem_len < pages * page_size(fbmem):
+            raise OSError('not enough framebuffer memory')
+        fbmem.mmap = map_fb_memory(fbmem.fid, fbmem.fix_info)
+    pan_display(fbmem, 0)
+
+
 def memory_buffer(buffer_len):
     """Create a memory buffer of buffer_len size.
 
@@ -204,3 +468,221 @@ def cairo_surface_from_fbmem(fbmem, mem, cairo_format):
         fbmem.var_info.xres,
         fbmem.var_info.yres,
         fbmem.fix_info.line_length)
+
+
+class TimerFrameSource():
+
+    """Call a function on the next frame of a fixed frame rate, on request.
+
+    The frame deadlines are on a fixed grid (origin + n * interval) computed
+    from the loop time, so the frames do not drift. Nothing is scheduled until
+    :meth:`request` is called: all the requests done before a frame are
+    merged into one call, and the deadlines missed while the loop was busy
+    or idle are skipped.
+
+    :ivar loop: (:py:class:`asyncio.BaseEventLoop`) the event loop.
+    :ivar callback: function called at each frame with the frame deadline
+        (in loop time) as parameter.
+    :ivar float interval: time between two frames in seconds.
+    """
+
+    def __init__(self, loop, callback, interval):
+        """Initialisation of the frame source.
+
+        :param loop: the event loop
+        :type loop: :py:class:`asyncio.BaseEventLoop`
+        :param callback: function called with the frame time.
+        :param float interval: time between two frames in seconds.
+        """
+        self.loop = loop
+        self.callback = callback
+        self.interval = interval
+        self._origin = None
+        self._last_frame = None
+        self._frame = None
+        self._handle = None
+
+    @property
+    def pending(self):
+        """Return True if a frame is scheduled."""
+        return self._handle is not None
+
+    def start(self):
+        """Start the frame grid now."""
+        if self._origin is None:
+            self._origin = self.loop.time()
+
+    def stop(self):
+        """Cancel the scheduled frame."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def request(self):
+        """Ask for a call of the callback on the next frame."""
+        if self._handle is None:
+            self._frame = self._next_frame()
+            self._handle = self.loop.call_at(self._frame_deadline(self._frame),
+                                             self._tick)
+
+    def next_frame_time(self):
+        """Return the deadline of the next frame (in loop time)."""
+        if self._handle is not None:
+            return self._frame_deadline(self._frame)
+        return self._frame_deadline(self._next_frame())
+
+    def _frame_deadline(self, frame):
+        """Return the deadline of the given frame number."""
+        return self._origin + frame * self.interval
+
+    def _next_frame(self):
+        """Return the number of the first frame not in the past."""
+        self.start()
+        frame = int(math.ceil(
+            (self.loop.time() - self._origin) / self.interval))
+        if self._last_frame is not None:
+            frame = max(frame, self._last_frame + 1)
+        return frame
+
+    def _tick(self):
+        """Call the callback."""
+        self._handle = None
+        self._last_frame = self._frame
+        self.callback(self._frame_deadline(self._frame))
+
+
+class VsyncFrameSource():
+
+    """Call a function on the next vertical blank of the framebuffer.
+
+    A helper thread waits for the vertical blanks with FBIO_WAITFORVSYNC and
+    delivers them to the asyncio loop. The thread sleeps until
+    :meth:`request` is called: all the requests done before a vertical blank
+    are merged into one call.
+
+    If FBIO_WAITFORVSYNC fails while running, the frames are done by a
+    :class:`TimerFrameSource` from then on.
+
+    :ivar fbmem: (:class:`FbMem`) framebuffer memory object.
+    :ivar loop: (:py:class:`asyncio.BaseEventLoop`) the event loop.
+    :ivar callback: function called at each frame with the loop time of
+        the vertical blank as parameter.
+    :ivar float interval: time between two frames of the fallback timer.
+    """
+
+    def __init__(self, fbmem, loop, callback, interval):
+        """Initialisation of the frame source.
+
+        :param fbmem: framebuffer memory object
+        :param loop: the event loop
+        :type loop: :py:class:`asyncio.BaseEventLoop`
+        :param callback: function called with the frame time.
+        :param float interval: time between two frames of the fallback
+            timer.
+        """
+        self.fbmem = fbmem
+        self.loop = loop
+        self.callback = callback
+        self.interval = interval
+        self._running = False
+        self._requested = threading.Event()
+        self._thread = None
+        self._fallback = None
+
+    @property
+    def pending(self):
+        """Return True if a frame is requested."""
+        if self._fallback is not None:
+            return self._fallback.pending
+        return self._requested.is_set()
+
+    def start(self):
+        """Start the helper thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._wait_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the helper thread."""
+        self._running = False
+        self._requested.set()
+        if self._fallback is not None:
+            self._fallback.stop()
+
+    def request(self):
+        """Ask for a call of the callback on the next vertical blank."""
+        if self._fallback is not None:
+            self._fallback.request()
+        else:
+            self._requested.set()
+
+    def next_frame_time(self):
+        """Return the time of the next frame (in loop time).
+
+        The time of the next vertical blank is not known: return the current
+        loop time.
+        """
+        if self._fallback is not None:
+            return self._fallback.next_frame_time()
+        return self.loop.time()
+
+    def _wait_loop(self):
+        """Wait for requests then for vertical blanks (helper thread)."""
+        while self._running:
+            self._requested.wait()
+            if not self._running:
+                break
+            self._requested.clear()
+            try:
+                wait_for_vsync(self.fbmem.fid)
+            except OSError as error:
+                # vsync not supported anymore: continue with a timer.
+                self._running = False
+                callback, args = self._fall_back, (error,)
+            else:
+                callback, args = self._tick, (self.loop.time(),)
+            try:
+                self.loop.call_soon_threadsafe(callback, *args)
+            except RuntimeError:
+                # the loop is closed
+                break
+        self._running = False
+
+    def _tick(self, vsync_time):
+        """Call the callback in the loop thread."""
+        self.callback(vsync_time)
+
+    def _fall_back(self, error):
+        """Do the requested frame and the next ones with a timer.
+
+        Called in the loop thread when FBIO_WAITFORVSYNC failed.
+        """
+        if self._fallback is not None:
+            return
+        LOGGER.warning('%s: waiting for vsync failed (%s), using a timer '
+                       'at %.1f fps', self.fbmem.fid.name, error,
+                       1 / self.interval)
+        self._fallback = TimerFrameSource(self.loop, self.callback,
+                                          self.interval)
+        self._fallback.start()
+        # the frame requested before the failure
+        self._fallback.request()
+
+
+def frame_source(fbmem, loop, callback, interval):
+    """Return a vertical blank frame source, or a timer if not supported.
+
+    :param fbmem: framebuffer memory object
+    :param loop: the event loop
+    :type loop: :py:class:`asyncio.BaseEventLoop`
+    :param callback: function called with the frame time.
+    :param float interval: time between two frames of the fallback timer.
+
+    :return: a :class:`VsyncFrameSource` if the driver supports
+        FBIO_WAITFORVSYNC, else a :class:`TimerFrameSource`.
+    """
+    try:
+        wait_for_vsync(fbmem.fid)
+    except OSError:
+        return TimerFrameSource(loop, callback, interval)
+    return VsyncFrameSource(fbmem, loop, callback, interval)
@@ -0,0 +1,157 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Frame timing statistics.
+
+The statistics are only collected when they are enabled on the display (see
+:class:`cairotft.tft.TftDisplay`), so they cost nothing otherwise.
+"""
+import collections
+import math
+
+
+class RollingStats():
+
+    """Percentiles over the last values of a measure.
+
+    :ivar values: (:py:class:`collections.deque`) the last values.
+    """
+
+    def __init__(self, window=300):
+        """Initialisation of the rolling statistics.
+
+        :param int window: number of values kept.
+        """
+        self.values = collections.deque(maxlen=window)
+
+    def add(self, value):
+        """Add a value."""
+        self.values.append(value)
+
+    def percentile(self, percent):
+        """Return the given percentile of the kept values (nearest rank).
+
+        :param float percent: the percentile, between 0 and 100.
+
+        :return: the value, or None if there is no value.
+        """
+        if not self.values:
+            return None
+        values = sorted(self.values)
+        rank = int(math.ceil(percent / 100 * len(values))) - 1
+        return values[max(0, rank)]
+
+    def summary(self):
+        """Return a dict with the count, mean, p50, p95 and p99."""
+        count = len(self.values)
+        return {
+            'count': count,
+            'mean': sum(self.values) / count if count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+
+class FrameStats():
+
+    """Timing statistics of the frames of a display.
+
+    A frame starts after a copy to the screen and ends with the next one.
+
+    :ivar draw_time: (:class:`RollingStats`) time spent per frame in
+        draw_interface and in the widgets callbacks (blits excluded).
+    :ivar blit_time: (:class:`RollingStats`) time of each copy to the
+        screen.
+    :ivar blit_bytes: (:class:`RollingStats`) bytes copied to the screen per
+        frame.
+    :ivar frames_requested: (:py:class:`int`) number of blit() calls.
+    :ivar frames_presented: (:py:class:`int`) number of copies to the screen.
+    :ivar deadline_misses: (:py:class:`int`) number of frames (in fps or
+        vsync mode) copied after the deadline of the following frame.
+    :ivar blit_total: (:py:class:`float`) total time spent copying to the
+        screen.
+    """
+
+    def __init__(self, window=300):
+        """Initialisation of the statistics.
+
+        :param int window: number of frames used for the percentiles.
+        """
+        self.draw_time = RollingStats(window)
+        self.blit_time = RollingStats(window)
+        self.blit_bytes = RollingStats(window)
+        self.frames_requested = 0
+        self.frames_presented = 0
+        self.deadline_misses = 0
+        self.blit_total = 0
+        self._frame_draw_time = 0
+
+    def add_draw(self, seconds):
+        """Add drawing time to the current frame."""
+        self._frame_draw_time += seconds
+
+    def add_blit(self, seconds, bytes_copied):
+        """Record a copy to the screen: it ends the current frame."""
+        self.frames_presented += 1
+        self.blit_total += seconds
+        self.blit_time.add(seconds)
+        self.blit_bytes.add(bytes_copied)
+        self.draw_time.add(self._frame_draw_time)
+        self._frame_draw_time = 0
+
+    def summary(self):
+        """Return all the statistics in a dict."""
+        return {
+            'draw_time': self.draw_time.summary(),
+            'blit_time': self.blit_time.summary(),
+            'blit_bytes': self.blit_bytes.summary(),
+            'frames_requested': self.frames_requested,
+            'frames_presented': self.frames_presented,
+            'deadline_misses': self.deadline_misses,
+        }
+
+    def format(self):
+        """Return the main statistics in one line of text."""
+        def milliseconds(value):
+            """Format a time in seconds as milliseconds."""
+            return '-' if value is None else '%.2f' % (value * 1000)
+        draw = self.draw_time
+        blit = self.blit_time
+        return ('frames %d/%d requested/presented, %d missed, '
+                'draw p50/p95/p99 %s/%s/%s ms, '
+                'blit p50/p95/p99 %s/%s/%s ms, blit p50 %s bytes' % (
+                    self.frames_requested, self.frames_presented,
+                    self.deadline_misses,
+                    milliseconds(draw.percentile(50)),
+                    milliseconds(draw.percentile(95)),
+                    milliseconds(draw.percentile(99)),
+                    milliseconds(blit.percentile(50)),
+                    milliseconds(blit.percentile(95)),
+                    milliseconds(blit.percentile(99)),
+                    self.blit_bytes.percentile(50)))
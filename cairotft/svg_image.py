@@ -31,10 +31,38 @@
 This module is a modified version of the svg_image module from
 WeasyPrint:
 https://github.com/Kozea/WeasyPrint/blob/master/weasyprint/images.py#L99
+
+The svg images are rasterized once per drawn size: the rasterized surfaces
+are kept in a :class:`cairotft.image.RasterCache`, so drawing the same image
+again at the same size is a simple image copy.
+
+Use :func:`get_svg_image` to share the parsed images and their rasters
+between all the widgets of the process.
+
+Parsing a svg file is slow: :func:`load_svg_image` and :meth:`SVGImage.load`
+parse it in a thread and return an :class:`asyncio.Future`, so the event
+loop keeps running (widgets accept these futures and draw the image once it
+is loaded)::
+
+    icon = yield from svg_image.load_svg_image('icon.svg', loop=display.loop)
 """
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+
+import cairocffi as cairo
 import cairosvg.parser
 import cairosvg.surface
 
+from cairotft import image
+from cairotft import trace
+
+#: default memory cap (in bytes) of the raster cache shared by the images
+#: of a :class:`SVGRegistry`.
+DEFAULT_REGISTRY_CACHE_SIZE = 16 * 1024 * 1024
+
 
 class ImageLoadingError(ValueError):
 
@@ -65,15 +93,26 @@ class ScaledSVGSurface(cairosvg.surface.SVGSurface):
         return scale / 1
 
 
-class SVGImage():
+class SVGImage(image.BaseImage):
 
-    """SVGImage class."""
+    """SVGImage class.
 
-    def __init__(self, base_url, svg_data=None):
+    see :class:`cairotft.image.BaseImage` for the drawing methods.
+
+    :ivar raster_cache: (:class:`cairotft.image.RasterCache`) cache of the
+        rasterized image, by size and pixel format.
+    """
+
+    def __init__(self, base_url, svg_data=None,
+                 cache_size=image.DEFAULT_CACHE_SIZE, raster_cache=None):
         """Initialisation of the class.
 
         :param str base_url: path to a SVG Image.
         :param svg_data: bytestring containing the svg datas.
+        :param int cache_size: memory cap in bytes of the raster cache.
+        :param raster_cache: use this raster cache instead of a new one
+            (cache_size is then ignored).
+        :type raster_cache: :class:`cairotft.image.RasterCache`
 
         You can either provide a base_url, in this case, the file will be
         loaded, or directly use svg_data with a svg content.
@@ -83,6 +122,10 @@ class SVGImage():
         self._base_url = (
             base_url if not base_url.lower().startswith('data:') else None)
         self._svg_data = svg_data
+        self._image_id = image.new_image_id()
+        if raster_cache is None:
+            raster_cache = image.RasterCache(cache_size)
+        self.raster_cache = raster_cache
 
         try:
             # cache the rendering
@@ -98,10 +141,28 @@ class SVGImage():
         self.intrinsic_height = self._svg.height
         self.intrinsic_ratio = self.intrinsic_width / self.intrinsic_height
 
-    def get_intrinsic_size(self, _image_resolution):
-        """Return a tuple: (intrinsic_width, intrinsic_height)."""
-        # Vector images are affected by the 'image-resolution' property.
-        return self.intrinsic_width, self.intrinsic_height
+    @classmethod
+    def load(cls, base_url, svg_data=None, loop=None, executor=None,
+             **kwargs):
+        """Parse a svg image in a thread.
+
+        The parsed image is not shared: see :func:`load_svg_image` for
+        that.
+
+        :param str base_url: path to a SVG Image.
+        :param svg_data: bytestring containing the svg datas.
+        :param loop: the event loop (default: the current event loop).
+        :param executor: a :class:`concurrent.futures.ThreadPoolExecutor`
+            (default: the default executor of the loop).
+
+        The other keyword arguments are given to the constructor.
+
+        :return: an :class:`asyncio.Future` of the :class:`SVGImage`.
+        """
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        return loop.run_in_executor(
+            executor, functools.partial(cls, base_url, svg_data, **kwargs))
 
     def _render(self):
         """Draw to a cairo surface but do not write to a file.
@@ -113,73 +174,147 @@ class SVGImage():
                 bytestring=self._svg_data, url=self._base_url),
             output=None, dpi=96)
 
-    @staticmethod
-    def _scale_to_fit(image, frame, enlarge=False):
-        """scale an image always keeping aspect ratio inside the frame.
+    def rasterize(self, width, height, cairo_format=None):
+        """Return the image rasterized at the given size.
+
+        The rasterized surface is cached: do not draw on it.
 
-        :param image: tuple of int (width, eight)
-        :param fram: tuple of int (width, eight)
-        :param bool enlarge: if True, do not only shrink, also enlarge.
+        :param int width: width of the rasterized image.
+        :param int height: height of the rasterized image.
+        :param int cairo_format: pixel format of the rasterized image
+            (default: ARGB32).
+
+        :return: a :class:`cairocffi.ImageSurface`
+        """
+        if cairo_format is None:
+            cairo_format = cairo.FORMAT_ARGB32
+        key = (self._image_id, width, height, cairo_format)
+        surface = self.raster_cache.get(key)
+        if surface is None:
+            tracer = trace.get_tracer()
+            if tracer is not None:
+                tracer.begin('SVGImage.rasterize', 'image',
+                             {'width': width, 'height': height})
+            svg = self._svg
+            surface = cairo.ImageSurface(cairo_format, width, height)
+            raster_ctx = cairo.Context(surface)
+            raster_ctx.scale(width / svg.width, height / svg.height)
+            raster_ctx.set_source_surface(svg.cairo, 0, 0)
+            raster_ctx.paint()
+            surface.flush()
+            self.raster_cache.put(key, surface)
+            if tracer is not None:
+                tracer.end('SVGImage.rasterize', 'image')
+        return surface
+
+    def invalidate_cache(self):
+        """Drop the rasterized surfaces of this image from the cache."""
+        self.raster_cache.invalidate(self._image_id)
+
+
+class SVGRegistry():
+
+    """Registry of parsed svg images, shared by content.
+
+    The registry returns the same :class:`SVGImage` for the same file, as
+    long as the file is not modified (checked with its mtime and size), and
+    for files with the same content (checked with a sha1 hash).
+    All the images of the registry share the same raster cache, so the
+    memory cap applies to all of them.
+
+    :meth:`get` can be called from loading threads: one file is parsed at
+    a time, and the rasters of a modified file are dropped from the thread
+    safe raster cache.
+
+    :ivar raster_cache: (:class:`cairotft.image.RasterCache`) the shared
+        raster cache.
+    """
 
-        :returns: a (widht, eight) tuple representing the target size of the
-            object.
+    def __init__(self, cache_size=DEFAULT_REGISTRY_CACHE_SIZE):
+        """Initialisation of the registry.
 
-        (thanks to jon for this method)
+        :param int cache_size: memory cap in bytes of the shared raster
+            cache.
         """
-        image_width, image_height = image
-        frame_width, frame_height = frame
-        image_aspect = float(image_width) / image_height
-        frame_aspect = float(frame_width) / frame_height
-        # Determine maximum width/height (prevent up-scaling).
-        if not enlarge:
-            max_width = min(frame_width, image_width)
-            max_height = min(frame_height, image_height)
-        else:
-            max_width = frame_width
-            max_height = frame_height
-        # Frame is wider than image.
-        if frame_aspect > image_aspect:
-            height = max_height
-            width = int(height * image_aspect)
-        # Frame is taller than image.
-        else:
-            width = max_width
-            height = int(width / image_aspect)
-        return (width, height)
-
-    def draw(self, context, pos_x, pos_y,
-             width, height, enlarge=True, center_y=False):
-        """Draw the svg image inside a box of size (width, eight).
-
-        This draw methods keeps automatically the aspect ration of the image.
-
-        :param context: cairo context
-        :param int pos_x: x position (top left corner)
-        :param int pos_y: y position (top left corner)
-        :param int width: width of the box the image will fit inside
-        :param int height: height of the box the image will fit inside
-        :param bool enlarge: if true and if the base image is smaller than
-            the box, it will enlarge the image. If False, display the original
-            smaller image.
-        :param bool center_y: if True add an offset to y in order to center
-            the image into the box.
+        self.raster_cache = image.RasterCache(cache_size)
+        self._files = {}  # path: (mtime, size, digest)
+        self._images = {}  # digest: SVGImage
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        """Return the number of parsed images."""
+        return len(self._images)
+
+    def get(self, path):
+        """Return the parsed image of a svg file.
+
+        :param str path: path of the svg file.
+
+        :return: a :class:`SVGImage`
         """
-        # svg = self._render()
-        svg = self._svg  # use cached version
-        image_width, image_height = self._scale_to_fit(
-            image=(svg.width, svg.height),
-            frame=(width, height),
-            enlarge=enlarge)
-        xratio = image_width / svg.width
-        yratio = image_height / svg.height
-        if center_y:
-            y_offset = int((height - image_height) / 2)
-        else:
-            y_offset = 0
-        context.scale(xratio, yratio)
-        context.set_source_surface(svg.cairo,
-                                   pos_x / xratio,
-                                   (pos_y + y_offset) / yratio)
-        context.paint()
-        # reset the scale
-        context.scale(1 / xratio, 1 / yratio)
+        with self._lock:
+            return self._get(path)
+
+    def _get(self, path):
+        """Return the parsed image of a svg file (registry locked)."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self._files.get(path)
+        if known is not None and known[:2] == (stat.st_mtime, stat.st_size):
+            return self._images[known[2]]
+        with open(path, 'rb') as svg_file:
+            svg_data = svg_file.read()
+        digest = hashlib.sha1(svg_data).hexdigest()
+        parsed = self._images.get(digest)
+        if parsed is None:
+            parsed = SVGImage(path, svg_data=svg_data,
+                              raster_cache=self.raster_cache)
+            self._images[digest] = parsed
+        self._files[path] = (stat.st_mtime, stat.st_size, digest)
+        if known is not None and known[2] != digest:
+            self._forget(known[2])
+        return parsed
+
+    def _forget(self, digest):
+        """Drop an image no more used by any known file."""
+        if all(known[2] != digest for known in self._files.values()):
+            self._images.pop(digest).invalidate_cache()
+
+    def clear(self):
+        """Forget all the images and their rasters."""
+        with self._lock:
+            self._files.clear()
+            self._images.clear()
+            self.raster_cache.invalidate()
+
+
+#: the process-wide registry used by :func:`get_svg_image`.
+REGISTRY = SVGRegistry()
+
+
+def get_svg_image(path):
+    """Return the shared parsed image of a svg file.
+
+    See :class:`SVGRegistry`: the same file (or the same content) always
+    gives the same :class:`SVGImage`, so it is parsed only once.
+
+    :param str path: path of the svg file.
+    """
+    return REGISTRY.get(path)
+
+
+def load_svg_image(path, loop=None, executor=None):
+    """Load the shared parsed image of a svg file in a thread.
+
+    Same as :func:`get_svg_image`, without blocking the event loop.
+
+    :param str path: path of the svg file.
+    :param loop: the event loop (default: the current event loop).
+    :param executor: a :class:`concurrent.futures.ThreadPoolExecutor`
+        (default: the default executor of the loop).
+
+    :return: an :class:`asyncio.Future` of the :class:`SVGImage`.
+    """
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    return loop.run_in_executor(executor, get_svg_image, path)
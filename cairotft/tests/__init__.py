@@ -27,3 +27,117 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 """Unitests."""
+import struct
+import unittest
+
+try:
+    import cairocffi as cairo
+except (ImportError, OSError):
+    # cairocffi raises OSError when the cairo library is not installed.
+    HAVE_CAIRO = False
+else:
+    HAVE_CAIRO = True
+
+#: decorator of the tests drawing with cairo.
+requires_cairo = unittest.skipUnless(HAVE_CAIRO, 'cairo is not available')
+
+
+def pixel(surface, pos_x, pos_y):
+    """Return the ARGB32 pixel value of a surface at (pos_x, pos_y)."""
+    surface.flush()
+    return struct.unpack_from('=I', surface.get_data(),
+                              pos_y * surface.get_stride() + 4 * pos_x)[0]
+
+
+class FakeHandle():
+
+    """A call scheduled on a :class:`FakeDisplay`.
+
+    :ivar callback: the scheduled callback.
+    :ivar tuple args: the arguments of the callback.
+    :ivar float delay: the delay of call_later (None for call_soon).
+    :ivar bool cancelled: True if the call was cancelled.
+    """
+
+    def __init__(self, callback, args, delay=None):
+        """Initialisation of the handle."""
+        self.callback = callback
+        self.args = args
+        self.delay = delay
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancel the call."""
+        self.cancelled = True
+
+
+class FakeDisplay():
+
+    """Display double driven by the tests.
+
+    The scheduled calls are recorded in :attr:`calls` and run by
+    :meth:`run_calls`; the frame callbacks are recorded in
+    :attr:`requests` and run by :meth:`frame`. With cairo, the memory
+    buffer is an ARGB32 surface, drawn with :attr:`ctx`.
+    """
+
+    fps = None
+
+    def __init__(self, width=20, height=10):
+        """Initialisation of the display, at frame time 0.
+
+        :param int width: width of the screen.
+        :param int height: height of the screen.
+        """
+        self.width = width
+        self.height = height
+        self.frame_time = 0
+        self.calls = []
+        self.requests = []
+        self.blits = 0
+        self.layers = None
+        if HAVE_CAIRO:
+            self.cairo_format = cairo.FORMAT_ARGB32
+            self.buffer_surf = cairo.ImageSurface(self.cairo_format,
+                                                  width, height)
+            self.ctx = cairo.Context(self.buffer_surf)
+
+    def invalidate(self, *args):
+        """Nothing to copy."""
+
+    def blit(self, *args, **kwargs):
+        """Count the copies to the screen."""
+        self.blits += 1
+
+    def call_soon(self, callback, *args):
+        """Record a call."""
+        handle = FakeHandle(callback, args)
+        self.calls.append(handle)
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        """Record a delayed call."""
+        handle = FakeHandle(callback, args, delay)
+        self.calls.append(handle)
+        return handle
+
+    def pending_calls(self):
+        """Return the scheduled calls not run nor cancelled."""
+        return [handle for handle in self.calls if not handle.cancelled]
+
+    def run_calls(self):
+        """Run the scheduled calls (not the ones they schedule)."""
+        calls, self.calls = self.pending_calls(), []
+        for handle in calls:
+            handle.callback(*handle.args)
+
+    def request_frame(self, callback):
+        """Record a frame request."""
+        self.requests.append(callback)
+
+    def frame(self, frame_time):
+        """Do a frame: call the requested callbacks."""
+        self.frame_time = frame_time
+        requests, self.requests = self.requests, []
+        for callback in requests:
+            callback(frame_time)
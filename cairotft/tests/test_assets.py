@@ -0,0 +1,181 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+"""Tests of the precompiled image bundles."""
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    import cairocffi as cairo
+
+    from cairotft import assets
+    from cairotft import svg_image
+
+SQUARE_SVG = b"""<svg xmlns="http://www.w3.org/2000/svg"
+  width="10" height="10">
+  <rect width="10" height="10" fill="#000"/>
+</svg>
+"""
+
+
+@requires_cairo
+class AssetBundleTest(unittest.TestCase):
+
+    """Tests of :func:`cairotft.assets.build_bundle` and of the bundles."""
+
+    def setUp(self):
+        """Write a svg file and build a bundle of it."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.svg_path = os.path.join(self.directory, 'square.svg')
+        with open(self.svg_path, 'wb') as svg_file:
+            svg_file.write(SQUARE_SVG)
+        self.path = os.path.join(self.directory, 'icons.bundle')
+        # (20, 5) is drawn at 5x5 in its box.
+        assets.build_bundle(
+            self.path, [('square', self.svg_path, [(10, 10), (4, 4),
+                                                   (20, 5), (10, 10)])])
+
+    def _open(self, path=None):
+        """Open a bundle, closed at the end of the test."""
+        bundle = assets.AssetBundle(path or self.path)
+        self.addCleanup(bundle.close)
+        return bundle
+
+    def _rewrite(self, data):
+        """Write another bundle file and return its path."""
+        path = os.path.join(self.directory, 'other.bundle')
+        with open(path, 'wb') as bundle_file:
+            bundle_file.write(data)
+        return path
+
+    def _read(self):
+        """Return the content of the bundle file."""
+        with open(self.path, 'rb') as bundle_file:
+            return bundle_file.read()
+
+    def test_read_back(self):
+        """The bundle gives the rasters of the svg image."""
+        bundle = self._open()
+        self.assertEqual(bundle.format_name, 'ARGB32')
+        self.assertEqual(bundle.names(), ['square'])
+        self.assertIn('square', bundle)
+        self.assertNotIn('circle', bundle)
+        square = bundle['square']
+        self.assertIs(bundle['square'], square)
+        self.assertEqual(square.intrinsic_width, 10)
+        self.assertEqual(square.sizes, [(4, 4), (5, 5), (10, 10)])
+        svg = svg_image.SVGImage(self.svg_path)
+        for width, height in square.sizes:
+            stored = square.rasterize(width, height)
+            self.assertEqual(
+                bytes(stored.get_data()),
+                bytes(svg.rasterize(width, height).get_data()))
+
+    def test_stored_and_scaled(self):
+        """The stored rasters are not copied, other sizes are cached."""
+        bundle = self._open()
+        square = bundle['square']
+        stored = square.rasterize(10, 10)
+        self.assertIs(square.rasterize(10, 10), stored)
+        self.assertEqual(len(bundle.raster_cache), 0)
+        scaled = square.rasterize(8, 8)
+        self.assertEqual((scaled.get_width(), scaled.get_height()), (8, 8))
+        self.assertIs(square.rasterize(8, 8), scaled)
+        square.rasterize(10, 10, cairo.FORMAT_A8)
+        self.assertEqual(len(bundle.raster_cache), 2)
+
+    def test_truncated(self):
+        """A truncated header or raster raises BundleError."""
+        with self.assertRaises(assets.BundleError):
+            assets.AssetBundle(self._rewrite(self._read()[:4]))
+        data = self._read()
+        _, _, index_size = assets.HEADER.unpack_from(data)
+        data_start = assets._align(assets.HEADER.size + index_size)
+        bundle = self._open(self._rewrite(data[:data_start + 10]))
+        with self.assertRaises(assets.BundleError):
+            bundle['square'].rasterize(10, 10)
+
+    def test_bad_magic(self):
+        """A file without the bundle magic raises BundleError."""
+        with self.assertRaises(assets.BundleError):
+            assets.AssetBundle(self._rewrite(b'NOTABNDL' + self._read()[8:]))
+
+    def test_byte_order(self):
+        """A bundle built for another byte order raises BundleError."""
+        data = self._read()
+        _, version, index_size = assets.HEADER.unpack_from(data)
+        index = json.loads(data[assets.HEADER.size:
+                                assets.HEADER.size + index_size].decode())
+        index['byteorder'] = 'big' if index['byteorder'] == 'little' else (
+            'little')
+        index_data = json.dumps(index).encode()
+        path = self._rewrite(
+            assets.HEADER.pack(assets.MAGIC, version, len(index_data)) +
+            index_data)
+        with self.assertRaises(assets.BundleError):
+            assets.AssetBundle(path)
+
+    def test_command_line(self):
+        """The build and list commands."""
+        path = os.path.join(self.directory, 'cli.bundle')
+        assets.main(['build', '-o', path, '-f', 'RGB16_565',
+                     'icon=%s:10x10,4x4' % self.svg_path])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            assets.main(['list', path])
+        self.assertEqual(output.getvalue().splitlines(),
+                         ['%s (RGB16_565)' % path, '  icon: 4x4, 10x10'])
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                assets.main(['build', '-o', path, '-f', 'RGB15',
+                             'icon=%s:10x10' % self.svg_path])
+            with self.assertRaises(SystemExit):
+                assets.main(['build', '-o', path, self.svg_path])
+
+
+@requires_cairo
+class ParseImageSpecTest(unittest.TestCase):
+
+    """Tests of :func:`cairotft.assets.parse_image_spec`."""
+
+    def test_spec(self):
+        """The name defaults to the file name without extension."""
+        self.assertEqual(assets.parse_image_spec('icons/ok.svg:70x70,32X32'),
+                         ('ok', 'icons/ok.svg', [(70, 70), (32, 32)]))
+        self.assertEqual(assets.parse_image_spec('alert=ko.svg:8x6'),
+                         ('alert', 'ko.svg', [(8, 6)]))
+        with self.assertRaises(ValueError):
+            assets.parse_image_spec('ok.svg')
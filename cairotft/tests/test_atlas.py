@@ -0,0 +1,128 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the sprite atlas packing."""
+import itertools
+import unittest
+
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    import cairocffi as cairo
+
+    from cairotft import atlas
+    from cairotft import svg_image
+
+SQUARE_SVG = b"""<svg xmlns="http://www.w3.org/2000/svg"
+  width="10" height="10">
+  <rect width="10" height="10" fill="#000"/>
+</svg>
+"""
+
+
+def _overlap(rect_a, rect_b):
+    """Return True if two (x, y, width, height) rectangles overlap."""
+    return (rect_a[0] < rect_b[0] + rect_b[2] and
+            rect_b[0] < rect_a[0] + rect_a[2] and
+            rect_a[1] < rect_b[1] + rect_b[3] and
+            rect_b[1] < rect_a[1] + rect_a[3])
+
+
+@requires_cairo
+class AtlasBuilderTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.atlas.AtlasBuilder`."""
+
+    def _builder(self, sizes, **kwargs):
+        """Return a builder with blank images of the given sizes."""
+        builder = atlas.AtlasBuilder(**kwargs)
+        for index, (width, height) in enumerate(sizes):
+            builder._add('image%d' % index,
+                         cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                            width, height),
+                         (width, height))
+        return builder
+
+    def _check_places(self, sizes, builder, padding):
+        """Check that the packed images fit their page, without overlap."""
+        page_sizes, places = builder.pack()
+        rects = {}
+        for index, (width, height) in enumerate(sizes):
+            page, pos_x, pos_y = places['image%d' % index]
+            page_width, page_height = page_sizes[page]
+            self.assertLessEqual(pos_x + width, page_width)
+            self.assertLessEqual(pos_y + height, page_height)
+            self.assertLessEqual(page_width, builder.max_width)
+            self.assertLessEqual(page_height, builder.max_height)
+            rects[index] = (page, (pos_x, pos_y,
+                                   width + padding, height + padding))
+        for (page_a, rect_a), (page_b, rect_b) in itertools.combinations(
+                rects.values(), 2):
+            if page_a == page_b:
+                self.assertFalse(_overlap(rect_a, rect_b))
+        return page_sizes
+
+    def test_one_page(self):
+        """Small images are packed in one page without overlap."""
+        sizes = [(16, 16), (32, 8), (8, 32), (24, 24), (16, 16), (5, 7)]
+        builder = self._builder(sizes, max_width=64, max_height=64)
+        page_sizes = self._check_places(sizes, builder, 1)
+        self.assertEqual(len(page_sizes), 1)
+
+    def test_several_pages(self):
+        """Images not fitting one page go to the next pages."""
+        sizes = [(30, 30)] * 6
+        builder = self._builder(sizes, max_width=64, max_height=64,
+                                padding=0)
+        page_sizes = self._check_places(sizes, builder, 0)
+        self.assertEqual(page_sizes, [(60, 60), (60, 30)])
+
+    def test_too_big(self):
+        """Images bigger than a page are refused."""
+        self.assertRaises(ValueError, self._builder, [(65, 10)],
+                          max_width=64, max_height=64)
+
+    def test_add_uncached(self):
+        """The packed images are not kept in the cache of their source."""
+        svg = svg_image.SVGImage('data:', svg_data=SQUARE_SVG)
+        builder = atlas.AtlasBuilder(max_width=64, max_height=64)
+        builder.add('square', svg, 8, 8)
+        self.assertEqual(len(svg.raster_cache), 0)
+        built = builder.build()
+        self.assertEqual(built['square'].size, (8, 8))
+        self.assertEqual(built['square'].intrinsic_width, 10)
+
+    def test_build(self):
+        """The built atlas has an entry per image."""
+        sizes = [(16, 16), (8, 8)]
+        built = self._builder(sizes, max_width=64, max_height=64).build()
+        self.assertEqual(len(built), 2)
+        self.assertIn('image1', built)
+        self.assertEqual(sorted(built.names()), ['image0', 'image1'])
+        self.assertEqual(built['image0'].intrinsic_width, 16)
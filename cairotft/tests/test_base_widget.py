@@ -0,0 +1,78 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+"""Tests of the base widget."""
+import unittest
+
+from cairotft.tests import FakeDisplay
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    from cairotft.widgets import base
+
+    class _Counter(base.BaseWidget):
+
+        """A widget counting its drawings."""
+
+        draws = 0
+
+        def draw(self, ctx):
+            """Count the drawing."""
+            self.draws += 1
+            self.invalidate()
+            self.display_object.blit()
+
+
+@requires_cairo
+class BaseWidgetTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.widgets.base.BaseWidget`."""
+
+    def setUp(self):
+        """Create and show a widget."""
+        self.display = FakeDisplay()
+        self.widget = _Counter(self.display, 0, 0, 10, 10)
+        self.widget.start(self.display.ctx)
+        self.display.run_calls()
+        self.assertEqual(self.widget.draws, 1)
+
+    def test_not_scheduled(self):
+        """A shown widget does not draw again without request."""
+        self.assertEqual(self.display.pending_calls(), [])
+
+    def test_redraw_requests_collapse(self):
+        """Several redraw requests give one drawing."""
+        for _ in range(3):
+            self.widget.request_redraw()
+        self.assertEqual(len(self.display.pending_calls()), 1)
+        self.display.run_calls()
+        self.assertEqual(self.widget.draws, 2)
+        self.assertEqual(self.display.pending_calls(), [])
+        self.widget.request_redraw()
+        self.display.run_calls()
+        self.assertEqual(self.widget.draws, 3)
@@ -0,0 +1,106 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+"""Tests of the blinking icon widget."""
+import asyncio
+import unittest
+
+from cairotft.tests import FakeDisplay
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    from cairotft.widgets import blink_icon
+
+
+class _Image():
+
+    """An image recording its drawings."""
+
+    def __init__(self):
+        """No drawing yet."""
+        self.draws = 0
+
+    def draw(self, **kwargs):
+        """Count the drawing."""
+        self.draws += 1
+
+
+@requires_cairo
+class BlinkIconLoadingTest(unittest.TestCase):
+
+    """Tests of a blinking icon given as a future."""
+
+    def setUp(self):
+        """Start an icon whose image is loading: the placeholder shows."""
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.display = FakeDisplay()
+        self.placeholder = _Image()
+        self.image = _Image()
+        self.future = self.loop.create_future()
+        self.widget = blink_icon.BlinkIcon(self.display, 0, 0, 10, 10,
+                                           self.future,
+                                           placeholder=self.placeholder)
+        self.widget.start(self.display.ctx)
+        self.display.run_calls()  # show
+        self.assertEqual(self.placeholder.draws, 1)
+
+    def _run_callbacks(self):
+        """Run the callbacks of the future."""
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+
+    def test_loaded_while_visible(self):
+        """The loaded image replaces the visible placeholder at once."""
+        self.future.set_result(self.image)
+        self._run_callbacks()
+        self.assertEqual(self.image.draws, 1)
+        self.display.run_calls()  # hide
+        self.display.run_calls()  # show
+        self.assertEqual(self.image.draws, 2)
+        self.assertEqual(self.placeholder.draws, 1)
+
+    def test_loaded_while_hidden(self):
+        """The image loaded while hidden is drawn at the next show."""
+        self.display.run_calls()  # hide
+        self.future.set_result(self.image)
+        self._run_callbacks()
+        self.assertEqual(self.image.draws, 0)
+        self.display.run_calls()  # show
+        self.assertEqual(self.image.draws, 1)
+        self.assertEqual(self.placeholder.draws, 1)
+
+    def test_loading_error(self):
+        """The placeholder stays if the loading fails."""
+        with self.assertLogs('cairotft.widgets.blink_icon', 'ERROR'):
+            self.future.set_exception(ValueError('broken icon'))
+            self._run_callbacks()
+        self.display.run_calls()  # hide
+        self.display.run_calls()  # show
+        self.assertEqual(self.placeholder.draws, 2)
+        self.assertIsNone(self.widget.svg_icon)
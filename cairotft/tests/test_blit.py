@@ -0,0 +1,100 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the blit engine."""
+import unittest
+
+from cairotft import damage
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    import cairocffi as cairo
+
+    from cairotft import blit
+
+WIDTH, HEIGHT = 8, 4
+
+
+@requires_cairo
+class BlitEngineTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.blit.BlitEngine`."""
+
+    def _engine(self, cairo_format=None, strategy=None):
+        """Return an engine copying a 8x4 buffer into another one."""
+        cairo_format = (cairo.FORMAT_ARGB32 if cairo_format is None
+                        else cairo_format)
+        stride = cairo.ImageSurface.format_stride_for_width(cairo_format,
+                                                            WIDTH)
+        self.source = bytearray(range(256)) * (stride * HEIGHT // 256 + 1)
+        self.source = self.source[:stride * HEIGHT]
+        self.dest = bytearray(stride * HEIGHT)
+        source_surf = cairo.ImageSurface.create_for_data(
+            self.source, cairo_format, WIDTH, HEIGHT, stride)
+        dest_surf = cairo.ImageSurface.create_for_data(
+            self.dest, cairo_format, WIDTH, HEIGHT, stride)
+        return blit.BlitEngine(source_surf, self.source, dest_surf,
+                               self.dest, cairo_format, stride,
+                               strategy=strategy)
+
+    def test_rows(self):
+        """The rows strategy copies only the damaged pixels."""
+        engine = self._engine()
+        region = damage.DamageRegion(WIDTH, HEIGHT)
+        region.add(2, 1, 3, 2)
+        self.assertEqual(engine.blit(region, 'rows'), 3 * 2 * 4)
+        for row in range(HEIGHT):
+            for column in range(WIDTH):
+                offset = row * WIDTH * 4 + column * 4
+                pixel = self.dest[offset:offset + 4]
+                if 2 <= column < 5 and 1 <= row < 3:
+                    self.assertEqual(pixel, self.source[offset:offset + 4])
+                else:
+                    self.assertEqual(pixel, bytearray(4))
+
+    def test_full(self):
+        """The full strategy copies the whole buffer."""
+        engine = self._engine()
+        region = damage.DamageRegion(WIDTH, HEIGHT)
+        region.add_all()
+        self.assertEqual(engine.choose_strategy(region), 'full')
+        engine.blit(region)
+        self.assertEqual(self.dest, self.source)
+
+    def test_unknown_strategy(self):
+        """Unknown strategies are refused."""
+        self.assertRaises(ValueError, self._engine, strategy='fast')
+
+    def test_unsupported_format(self):
+        """Memory copies cannot be forced on formats of unknown size."""
+        for strategy in ('rows', 'full'):
+            self.assertRaises(ValueError, self._engine, cairo.FORMAT_A1,
+                              strategy)
+        engine = self._engine(cairo.FORMAT_A1)
+        self.assertEqual(engine.strategies, ('cairo',))
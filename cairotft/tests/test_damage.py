@@ -0,0 +1,108 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the damage region."""
+import unittest
+
+from cairotft import damage
+
+
+class DamageRegionTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.damage.DamageRegion`."""
+
+    def setUp(self):
+        """Create a 100x50 region."""
+        self.region = damage.DamageRegion(100, 50)
+
+    def test_empty(self):
+        """A new region is not damaged."""
+        self.assertFalse(self.region)
+        self.assertEqual(self.region.rects, [])
+        self.assertEqual(self.region.area, 0)
+
+    def test_clip_and_round(self):
+        """Rectangles are clipped to the area and extended to pixels."""
+        self.region.add(-10, 40.5, 20.2, 30)
+        self.assertEqual(self.region.rects, [(0, 40, 11, 10)])
+
+    def test_outside(self):
+        """Empty or outside rectangles are ignored."""
+        self.region.add(100, 0, 10, 10)
+        self.region.add(10, 10, 0, 10)
+        self.assertFalse(self.region)
+
+    def test_merge_overlapping(self):
+        """Overlapping rectangles are merged into their bounding box."""
+        self.region.add(0, 0, 10, 10)
+        self.region.add(5, 5, 10, 10)
+        self.assertEqual(self.region.rects, [(0, 0, 15, 15)])
+
+    def test_merge_touching(self):
+        """Touching rectangles are merged."""
+        self.region.add(0, 0, 10, 10)
+        self.region.add(10, 0, 10, 10)
+        self.assertEqual(self.region.rects, [(0, 0, 20, 10)])
+
+    def test_distant_rects(self):
+        """Distant small rectangles are kept apart."""
+        self.region.add(0, 0, 2, 2)
+        self.region.add(90, 40, 2, 2)
+        self.assertEqual(sorted(self.region.rects),
+                         [(0, 0, 2, 2), (90, 40, 2, 2)])
+        self.assertEqual(self.region.area, 8)
+
+    def test_merge_chain(self):
+        """A rectangle bridging two others merges the three."""
+        self.region.add(0, 0, 2, 2)
+        self.region.add(50, 0, 2, 2)
+        self.region.add(1, 0, 50, 1)
+        self.assertEqual(self.region.rects, [(0, 0, 52, 2)])
+
+    def test_max_rects(self):
+        """Too many rectangles collapse into their bounding box."""
+        region = damage.DamageRegion(100, 50, max_rects=2)
+        region.add(0, 0, 1, 1)
+        region.add(50, 20, 1, 1)
+        region.add(98, 48, 1, 1)
+        self.assertEqual(region.rects, [(0, 0, 99, 49)])
+
+    def test_add_all(self):
+        """add_all damages everything; other rectangles are then ignored."""
+        self.region.add(0, 0, 1, 1)
+        self.region.add_all()
+        self.assertTrue(self.region.is_full)
+        self.region.add(10, 10, 5, 5)
+        self.assertEqual(self.region.rects, [(0, 0, 100, 50)])
+
+    def test_clear(self):
+        """clear forgets the rectangles."""
+        self.region.add_all()
+        self.region.clear()
+        self.assertFalse(self.region)
+        self.assertFalse(self.region.is_full)
@@ -0,0 +1,184 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the raster cache and of the image drawing."""
+import threading
+import unittest
+
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import pixel
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    import cairocffi as cairo
+
+    from cairotft import image
+
+
+def _surface(width, height=1):
+    """Return an ARGB32 surface of width * height * 4 bytes."""
+    return cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+
+
+@requires_cairo
+class RasterCacheTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.image.RasterCache`."""
+
+    def setUp(self):
+        """Create a cache of 100 bytes."""
+        self.cache = image.RasterCache(100)
+
+    def test_get_put(self):
+        """Cached surfaces are returned by their key."""
+        surface = _surface(5)
+        self.cache.put((1, 5, 1), surface)
+        self.assertIs(self.cache.get((1, 5, 1)), surface)
+        self.assertIsNone(self.cache.get((1, 6, 1)))
+        self.assertEqual(self.cache.size, 20)
+
+    def test_replace(self):
+        """A key cached again replaces the previous surface."""
+        self.cache.put((1, 5, 1), _surface(5))
+        self.cache.put((1, 5, 1), _surface(10))
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.size, 40)
+
+    def test_lru(self):
+        """The least recently used surfaces are dropped first."""
+        for key in range(4):
+            self.cache.put((key,), _surface(5))
+        self.cache.get((0,))
+        self.cache.put((4,), _surface(15))
+        self.assertIsNotNone(self.cache.get((0,)))
+        self.assertIsNone(self.cache.get((1,)))
+        self.assertIsNone(self.cache.get((2,)))
+        self.assertEqual(self.cache.size, 100)
+
+    def test_too_big(self):
+        """Surfaces bigger than the cache are not cached."""
+        self.cache.put((1,), _surface(26))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_invalidate(self):
+        """invalidate drops the surfaces of one image, or all of them."""
+        self.cache.put((1, 5, 1), _surface(5))
+        self.cache.put((1, 6, 1), _surface(5))
+        self.cache.put((2, 5, 1), _surface(5))
+        self.cache.invalidate(1)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.size, 20)
+        self.cache.invalidate()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_threads(self):
+        """The cache stays consistent when used from several threads."""
+        surfaces = [_surface(1) for _ in range(10)]
+
+        def use(image_id):
+            """Cache surfaces of an image, and drop them."""
+            for step in range(2000):
+                self.cache.put((image_id, step % 10), surfaces[step % 10])
+                self.cache.get((1 - image_id, step % 10))
+                if step % 7 == 0:
+                    self.cache.invalidate(image_id)
+
+        threads = [threading.Thread(target=use, args=(image_id,))
+                   for image_id in (0, 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        cached = [self.cache.get((image_id, key))
+                  for image_id in (0, 1) for key in range(10)]
+        self.assertEqual(
+            self.cache.size,
+            sum(self.cache.surface_size(surface) for surface in cached
+                if surface is not None))
+
+
+if HAVE_CAIRO:
+    class _HalfImage(image.BaseImage):
+
+        """A 4x2 image: its left half is opaque red, its right half empty."""
+
+        intrinsic_width = 4
+        intrinsic_height = 2
+        intrinsic_ratio = 2
+
+        def __init__(self):
+            """Cache the rasters."""
+            self.raster_cache = image.RasterCache()
+            self.rasterized = []
+
+        def rasterize(self, width, height, cairo_format=None):
+            """Return the image rasterized at the given size."""
+            if cairo_format is None:
+                cairo_format = cairo.FORMAT_ARGB32
+            key = (0, width, height, cairo_format)
+            surface = self.raster_cache.get(key)
+            if surface is None:
+                self.rasterized.append(key)
+                surface = cairo.ImageSurface(cairo_format, width, height)
+                context = cairo.Context(surface)
+                context.set_source_rgba(1, 0, 0, 1)
+                context.rectangle(0, 0, width // 2, height)
+                context.fill()
+                surface.flush()
+                self.raster_cache.put(key, surface)
+            return surface
+
+
+@requires_cairo
+class ImageMaskTest(unittest.TestCase):
+
+    """Tests of the images drawn in a color."""
+
+    def test_tint(self):
+        """The alpha mask of the image is painted in the color."""
+        half = _HalfImage()
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 10, 6)
+        context = cairo.Context(surface)
+        half.draw(context, 1, 1, 8, 8, color=(0, 0, 1, 1))
+        # drawn at 8x4 in the box.
+        self.assertEqual(pixel(surface, 1, 1), 0xff0000ff)
+        self.assertEqual(pixel(surface, 4, 4), 0xff0000ff)
+        self.assertEqual(pixel(surface, 5, 1), 0)
+        self.assertEqual(pixel(surface, 0, 0), 0)
+        self.assertEqual(pixel(surface, 1, 5), 0)
+        self.assertEqual(half.rasterized, [(0, 8, 4, cairo.FORMAT_A8)])
+        mask = half.raster_cache.get((0, 8, 4, cairo.FORMAT_A8))
+        self.assertIs(half.mask(8, 4), mask)
+        self.assertEqual(mask.get_format(), cairo.FORMAT_A8)
+        # another color uses the cached mask.
+        half.draw(context, 1, 1, 8, 8, color=(0, 1, 0, 1))
+        self.assertEqual(pixel(surface, 1, 1), 0xff00ff00)
+        self.assertEqual(pixel(surface, 5, 1), 0)
+        self.assertEqual(half.rasterized, [(0, 8, 4, cairo.FORMAT_A8)])
@@ -0,0 +1,170 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+"""Tests of the offscreen layers."""
+import unittest
+
+from cairotft.tests import FakeDisplay
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import pixel
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    from cairotft import layers
+    from cairotft.widgets import base
+
+RED = (1, 0, 0, 1)
+GREEN = (0, 1, 0, 1)
+BLUE = (0, 0, 1, 1)
+
+#: ARGB32 pixel values of the colors.
+PIXELS = {RED: 0xffff0000, GREEN: 0xff00ff00, BLUE: 0xff0000ff}
+
+
+def _paint(ctx, color, box=None):
+    """Paint a box (default: the whole surface) of a context."""
+    ctx.set_source_rgba(*color)
+    if box is None:
+        ctx.paint()
+    else:
+        ctx.rectangle(*box)
+        ctx.fill()
+
+
+def _red_display():
+    """Return a 20x10 display whose application content is red."""
+    display = FakeDisplay(20, 10)
+    _paint(display.ctx, RED)
+    return display
+
+
+@requires_cairo
+class LayerStackTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.layers.LayerStack`."""
+
+    def setUp(self):
+        """Create a display and its layer stack."""
+        self.display = _red_display()
+        self.stack = self.display.layers = layers.LayerStack(self.display)
+
+    def _add(self, box, color, z_order=0):
+        """Add a layer painted with a color, and composite it."""
+        layer = self.stack.add(box, z_order)
+        _paint(layer.ctx, color)
+        layer.commit()
+        self.stack.composite()
+        return layer
+
+    def _assertpixel(self, pos_x, pos_y, color):
+        """Check the color of a pixel of the memory buffer."""
+        self.assertEqual(
+            pixel(self.display.buffer_surf, pos_x, pos_y), PIXELS[color])
+
+    def test_restore_base(self):
+        """The application content is restored under a moved layer."""
+        layer = self._add((2, 2, 4, 4), BLUE)
+        self._assertpixel(3, 3, BLUE)
+        self._assertpixel(0, 0, RED)
+        layer.move((10, 2, 4, 4))
+        self.stack.composite()
+        self._assertpixel(3, 3, RED)
+        self._assertpixel(11, 3, BLUE)
+        self.stack.remove(layer)
+        self.stack.composite()
+        self._assertpixel(11, 3, RED)
+        self.assertFalse(self.stack)
+
+    def test_update_base(self):
+        """update_base copies the content drawn again under the layers."""
+        layer = self._add((2, 2, 4, 4), BLUE)
+        _paint(self.display.ctx, GREEN, (10, 0, 10, 10))
+        self.stack.update_base((10, 0, 10, 10))
+        layer.move((12, 2, 4, 4))
+        self.stack.composite()
+        self._assertpixel(3, 3, RED)
+        self._assertpixel(13, 3, BLUE)
+        layer.move((2, 2, 4, 4))
+        self.stack.composite()
+        self._assertpixel(13, 3, GREEN)
+
+    def test_background_color(self):
+        """A background color is painted under the layers."""
+        self.stack.background_color = GREEN
+        layer = self._add((2, 2, 4, 4), BLUE)
+        layer.move((10, 2, 4, 4))
+        self.stack.composite()
+        self._assertpixel(3, 3, GREEN)
+        self._assertpixel(0, 0, RED)
+
+    def test_z_order(self):
+        """The layers of higher z-order are painted over the others."""
+        bottom = self._add((2, 2, 4, 4), BLUE, z_order=1)
+        top = self._add((4, 4, 4, 4), GREEN, z_order=2)
+        self._assertpixel(5, 5, GREEN)
+        self.stack.set_z_order(bottom, 3)
+        self.stack.composite()
+        self._assertpixel(5, 5, BLUE)
+        self._assertpixel(7, 7, GREEN)
+        self.assertEqual(self.stack.layers, [top, bottom])
+
+
+if HAVE_CAIRO:
+    class _Mark(base.BaseWidget):
+
+        """A widget drawing a blue pixel at pos_x + mark."""
+
+        mark = 0
+
+        def draw(self, ctx):
+            """Draw the pixel."""
+            _paint(ctx, BLUE, (self.pos_x + self.mark, self.pos_y, 1, 1))
+            self.invalidate()
+            self.display_object.blit()
+
+
+@requires_cairo
+class WidgetLayerTest(unittest.TestCase):
+
+    """Tests of the widgets in layer mode."""
+
+    def test_redraw_clears(self):
+        """The previous drawing of the widget is cleared from its layer."""
+        display = _red_display()
+        display.layers = layers.LayerStack(display)
+        widget = _Mark(display, 2, 2, 8, 4)
+        layer = widget.enable_layer()
+        widget.start(display.ctx)
+        widget.show(widget._ctx)
+        self.assertEqual(pixel(layer.surface, 0, 0), PIXELS[BLUE])
+        widget.mark = 3
+        widget.redraw()
+        self.assertEqual(pixel(layer.surface, 0, 0), 0)
+        self.assertEqual(pixel(layer.surface, 3, 0), PIXELS[BLUE])
+        display.layers.composite()
+        self.assertEqual(pixel(display.buffer_surf, 2, 2), PIXELS[RED])
+        self.assertEqual(pixel(display.buffer_surf, 5, 2), PIXELS[BLUE])
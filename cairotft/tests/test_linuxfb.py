@@ -0,0 +1,151 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the framebuffer helpers."""
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from cairotft import linuxfb
+
+
+class PageFlipSetupTest(unittest.TestCase):
+
+    """Tests of :func:`cairotft.linuxfb.setup_page_flip`."""
+
+    def setUp(self):
+        """Open a one page virtual framebuffer."""
+        self.fbmem = linuxfb.open_virtual_fbmem(16, 8)
+        self.addCleanup(linuxfb.close_fbmem, self.fbmem)
+        self.device_var_info = linuxfb.VarScreenInfo.from_buffer_copy(
+            self.fbmem.var_info)
+        self.device_fix_info = linuxfb.FixScreenInfo.from_buffer_copy(
+            self.fbmem.fix_info)
+
+    def _put_var_info(self, fbfid, var_info):
+        """Emulate a driver accepting the virtual height."""
+        self.device_var_info = linuxfb.VarScreenInfo.from_buffer_copy(
+            var_info)
+        self.device_fix_info.smem_len = (self.device_fix_info.line_length *
+                                         var_info.yres_virtual)
+        os.ftruncate(fbfid, self.device_fix_info.smem_len)
+
+    def _patch_driver(self):
+        """Patch the screen info ioctls with the emulated driver."""
+        for name, function in (
+                ('put_var_info', self._put_var_info),
+                ('get_var_info', lambda fid: self.device_var_info),
+                ('get_fix_info', lambda fid: self.device_fix_info)):
+            patcher = mock.patch.object(linuxfb, name,
+                                        side_effect=function)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+    def test_already_high_enough(self):
+        """A virtual framebuffer of two pages is used as is."""
+        fbmem = linuxfb.open_virtual_fbmem(16, 8, yres_virtual=16)
+        self.addCleanup(linuxfb.close_fbmem, fbmem)
+        self.assertTrue(linuxfb.setup_page_flip(fbmem))
+
+    def test_no_panning(self):
+        """Without ypanstep, page flipping is not used."""
+        self.fbmem.fix_info.ypanstep = 0
+        self.assertFalse(linuxfb.setup_page_flip(self.fbmem))
+
+    def test_resize(self):
+        """The virtual height is doubled and the memory mapped again."""
+        self._patch_driver()
+        orig_mmap = self.fbmem.mmap
+        self.assertTrue(linuxfb.setup_page_flip(self.fbmem))
+        self.assertEqual(self.fbmem.var_info.yres_virtual, 16)
+        self.assertEqual(len(self.fbmem.mmap), 2 * linuxfb.page_size(
+            self.fbmem))
+        self.assertTrue(orig_mmap.closed)
+
+    def test_restore_on_pan_failure(self):
+        """If panning fails, the device gets its original info back."""
+        self._patch_driver()
+        orig_mmap = self.fbmem.mmap
+        with mock.patch.object(linuxfb, 'pan_display',
+                               side_effect=OSError('no pan')):
+            self.assertFalse(linuxfb.setup_page_flip(self.fbmem))
+        self.assertEqual(self.device_var_info.yres_virtual, 8)
+        self.assertEqual(self.fbmem.var_info.yres_virtual, 8)
+        self.assertIs(self.fbmem.mmap, orig_mmap)
+        self.assertFalse(orig_mmap.closed)
+
+    def test_restore_on_refused_height(self):
+        """If the driver keeps a smaller height, the info is put back."""
+        self._patch_driver()
+        calls = []
+
+        def refuse(fbfid, var_info):
+            calls.append(var_info.yres_virtual)
+
+        with mock.patch.object(linuxfb, 'put_var_info', side_effect=refuse):
+            self.assertFalse(linuxfb.setup_page_flip(self.fbmem))
+        self.assertEqual(calls, [16, 8])
+        self.assertEqual(self.fbmem.var_info.yres_virtual, 8)
+
+
+class VsyncFrameSourceTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.linuxfb.VsyncFrameSource`."""
+
+    def setUp(self):
+        """Open a virtual framebuffer (FBIO_WAITFORVSYNC always fails)."""
+        self.fbmem = linuxfb.open_virtual_fbmem(16, 8)
+        self.addCleanup(linuxfb.close_fbmem, self.fbmem)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.frames = []
+
+    def _frame(self, frame_time):
+        """Record a frame; request the next one until 3 frames."""
+        self.frames.append(frame_time)
+        if len(self.frames) < 3:
+            self.source.request()
+        else:
+            self.loop.stop()
+
+    def test_timer_fallback(self):
+        """After a vsync failure, the frames continue on a timer."""
+        self.source = linuxfb.VsyncFrameSource(self.fbmem, self.loop,
+                                               self._frame, 0.01)
+        self.source.start()
+        self.addCleanup(self.source.stop)
+        self.source.request()
+        self.loop.call_later(2, self.loop.stop)
+        with self.assertLogs('cairotft.linuxfb', 'WARNING') as logs:
+            self.loop.run_forever()
+        self.assertEqual(len(self.frames), 3)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIsInstance(self.source._fallback,
+                              linuxfb.TimerFrameSource)
+        self.assertEqual(self.frames, sorted(self.frames))
@@ -0,0 +1,237 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+"""Tests of the marquee widgets."""
+import math
+import struct
+import unittest
+
+from cairotft.tests import FakeDisplay
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    import cairocffi as cairo
+
+    from cairotft import text
+    from cairotft.widgets import marquee
+    from cairotft.widgets import streaming_marquee
+
+#: opaque black background, and its ARGB32 pixel value.
+BACKGROUND = (0, 0, 0, 1)
+BACKGROUND_PIXEL = 0xff000000
+
+
+@requires_cairo
+class MarqueeTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.widgets.Marquee`."""
+
+    def setUp(self):
+        """Create a display and a context."""
+        self.display = FakeDisplay()
+        self.face = cairo.ToyFontFace('sans')
+        self.advances = text.get_glyph_advances(self.face, 10)
+        self.ctx = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                                    100, 20))
+
+    def _width(self, string):
+        """Return the width of a string in the marquee font."""
+        return text.TextIndex(string, self.advances).width()
+
+    def _marquee(self, string, width, smooth):
+        """Create and start a marquee."""
+        widget = marquee.Marquee(self.display, string, self.face, 10,
+                                 (1, 1, 1, 1), 0, 0, width, 20,
+                                 background_color=BACKGROUND,
+                                 smooth=smooth)
+        widget.start(self.ctx)
+        return widget
+
+    def _scroll(self, widget):
+        """Show the marquee in a few frames, until it has scrolled."""
+        for frame in range(4):
+            self.display.frame_time = frame * widget.interval_time
+            widget.show(self.ctx, no_loop=True)
+        self.assertGreater(widget._pos, 0)
+
+    def test_static_not_scheduled(self):
+        """A static marquee is shown once, then on redraw requests."""
+        for smooth in (False, True):
+            widget = self._marquee('Price 12', 100, smooth)
+            self.assertEqual(len(self.display.pending_calls()), 1)
+            self.display.run_calls()
+            self.assertEqual(self.display.blits, 1)
+            self.assertEqual(self.display.pending_calls(), [])
+            widget.change_color((1, 0, 0, 1))
+            self.display.run_calls()
+            self.assertEqual(self.display.blits, 2)
+            self.assertEqual(self.display.pending_calls(), [])
+            widget.stop()
+            self.display.blits = 0
+
+    def test_scrolling_scheduled(self):
+        """A scrolling marquee schedules its next show."""
+        widget = self._marquee('Price 1234567890', 20, True)
+        self.display.run_calls()
+        calls = self.display.pending_calls()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0].delay, widget.interval_time)
+        widget.stop()
+        self.assertEqual(self.display.pending_calls(), [])
+
+    def test_redraw_requests_collapse(self):
+        """Several redraw requests give one show."""
+        widget = self._marquee('Price 12', 100, False)
+        self.display.run_calls()
+        widget.request_redraw()
+        widget.set_text('Price 13')
+        widget.change_background((0, 0, 1, 1))
+        self.assertEqual(len(self.display.pending_calls()), 1)
+        self.display.run_calls()
+        self.assertEqual(self.display.blits, 2)
+        self.assertEqual(self.display.pending_calls(), [])
+
+    def test_too_wide(self):
+        """A text too wide for the smooth buffer scrolls by characters."""
+        long_text = 'x' * (marquee.MAX_SURFACE_WIDTH //
+                           int(self._width('x')))
+        widget = self._marquee('Price 12', 100, True)
+        with self.assertLogs('cairotft.widgets.marquee', 'WARNING'):
+            widget.append_text(long_text)
+        self.assertFalse(widget.smooth)
+        self.assertIsNone(widget.smooth_textsurf)
+        self.assertEqual(widget.max_offset,
+                         len(widget.text) + len(marquee.SEPARATOR))
+        self._scroll(widget)
+        self.assertTrue(widget.full_text.startswith(widget._shrinked_text,
+                                                    widget._drawn_pos))
+        widget.stop()
+        with self.assertLogs('cairotft.widgets.marquee', 'WARNING'):
+            widget = self._marquee(long_text, 100, True)
+        self.assertFalse(widget.smooth)
+        self.assertTrue(widget._should_scroll)
+
+    def _check_text(self, widget, string):
+        """Check the text and the advances index of the marquee."""
+        self.assertEqual(widget.text, string)
+        self.assertEqual(widget.full_text,
+                         string + marquee.SEPARATOR + string)
+        self.assertEqual(
+            widget._get_text_index().offsets,
+            text.TextIndex(widget.full_text, self.advances).offsets)
+
+    def test_edit(self):
+        """set_text, append_text and replace_span edit the text."""
+        for smooth in (False, True):
+            widget = self._marquee('Price 12', 100, smooth)
+            widget.set_text('Price 13')
+            self._check_text(widget, 'Price 13')
+            widget.append_text(' EUR')
+            self._check_text(widget, 'Price 13 EUR')
+            widget.replace_span(6, 8, '1234')
+            self._check_text(widget, 'Price 1234 EUR')
+            widget.set_text('Cost 1234 EUR')
+            self._check_text(widget, 'Cost 1234 EUR')
+            widget.replace_span(0, 5, '')
+            self._check_text(widget, '1234 EUR')
+
+    def test_stop_scrolling(self):
+        """A text becoming short enough is shown static from its start."""
+        width = int(self._width('Price 12')) + 1
+        for smooth in (False, True):
+            widget = self._marquee('Price 1234567890', width, smooth)
+            self.assertTrue(widget._should_scroll)
+            self._scroll(widget)
+            widget.set_text('Price 12')
+            self.assertFalse(widget._should_scroll)
+            self.assertEqual(widget._pos, 0)
+            self.assertIsNone(widget._first_time)
+            widget.show(self.ctx, no_loop=True)
+            self.assertEqual(widget._pos, 0)
+            self.assertFalse(widget._should_scroll)
+            if not smooth:
+                self.assertEqual(widget._shrinked_text, 'Price 12')
+
+    def _pixels(self, widget, left, right):
+        """Return the pixel values of columns of the smooth text buffer."""
+        surface = widget.smooth_textsurf
+        surface.flush()
+        data = surface.get_data()
+        stride = surface.get_stride()
+        return set(struct.unpack_from('=I', data, row * stride + 4 * column)[0]
+                   for row in range(surface.get_height())
+                   for column in range(left, right))
+
+    def test_static_shrink(self):
+        """The glyphs of a longer static text are cleared."""
+        widget = self._marquee('Price 1234567890', 1000, True)
+        self.assertFalse(widget._should_scroll)
+        widget.set_text('Price 12')
+        # room for the overhang of the last glyph.
+        first_x = int(math.ceil(self._width('Price 12'))) + 5
+        self.assertEqual(
+            self._pixels(widget, first_x, widget.smooth_full_width),
+            {BACKGROUND_PIXEL})
+
+    def test_static_edit(self):
+        """The glyphs after a same width edit of a static text are kept."""
+        widget = self._marquee('Price 12.34 EUR', 1000, True)
+        self.assertFalse(widget._should_scroll)
+        widget.set_text('Price 12.35 EUR')
+        left = int(math.ceil(self._width('Price 12.35 ')))
+        right = int(self._width('Price 12.35 EUR'))
+        self.assertIn(BACKGROUND_PIXEL, self._pixels(widget, left, right))
+        self.assertNotEqual(self._pixels(widget, left, right),
+                            {BACKGROUND_PIXEL})
+
+
+@requires_cairo
+class StreamingMarqueeTextTest(unittest.TestCase):
+
+    """Tests of the text changes of the streaming marquee."""
+
+    def setUp(self):
+        """Create a streaming marquee."""
+        self.widget = streaming_marquee.StreamingMarquee(
+            FakeDisplay(), 'Price 12', cairo.ToyFontFace('sans'), 10,
+            (1, 1, 1, 1), 0, 0, 100, 20)
+
+    def test_replace_span(self):
+        """replace_span changes the text, shown after the drawn glyphs."""
+        self.widget.replace_span(6, 8, '1234')
+        self.assertEqual(self.widget.text, 'Price 1234')
+        self.assertEqual(''.join(self.widget._pending), 'Price 1234')
+        self.widget.replace_span(0, 5, 'Cost')
+        self.assertEqual(self.widget.text, 'Cost 1234')
+        self.assertEqual(''.join(self.widget._pending), 'Cost 1234')
+
+    def test_append_text(self):
+        """append_text adds the text once, after the pending text."""
+        self.widget.append_text(' EUR')
+        self.assertEqual(self.widget.text, 'Price 12')
+        self.assertEqual(''.join(self.widget._pending), 'Price 12 EUR')
@@ -0,0 +1,89 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+"""Tests of the frame timing statistics."""
+import unittest
+
+from cairotft import stats
+
+
+class RollingStatsTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.stats.RollingStats`."""
+
+    def test_empty(self):
+        """Without value, the percentiles are None."""
+        rolling = stats.RollingStats()
+        self.assertIsNone(rolling.percentile(50))
+        self.assertEqual(rolling.summary(), {
+            'count': 0, 'mean': None, 'p50': None, 'p95': None,
+            'p99': None})
+
+    def test_percentiles(self):
+        """The percentiles are the nearest rank values."""
+        rolling = stats.RollingStats()
+        for value in reversed(range(1, 101)):
+            rolling.add(value)
+        self.assertEqual(rolling.percentile(0), 1)
+        self.assertEqual(rolling.percentile(50), 50)
+        self.assertEqual(rolling.percentile(95), 95)
+        self.assertEqual(rolling.percentile(99.5), 100)
+        self.assertEqual(rolling.percentile(100), 100)
+        summary = rolling.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['mean'], 50.5)
+        self.assertEqual(summary['p99'], 99)
+
+    def test_window(self):
+        """Only the last values are kept."""
+        rolling = stats.RollingStats(window=3)
+        for value in (100, 1, 2, 3):
+            rolling.add(value)
+        self.assertEqual(rolling.percentile(100), 3)
+        self.assertEqual(rolling.summary()['count'], 3)
+
+
+class FrameStatsTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.stats.FrameStats`."""
+
+    def test_frames(self):
+        """The drawing time is summed per frame, until the blit."""
+        frame_stats = stats.FrameStats()
+        frame_stats.add_draw(0.001)
+        frame_stats.add_draw(0.002)
+        frame_stats.add_blit(0.004, 100)
+        frame_stats.add_blit(0.006, 300)
+        self.assertEqual(frame_stats.frames_presented, 2)
+        self.assertAlmostEqual(frame_stats.blit_total, 0.01)
+        self.assertEqual(list(frame_stats.draw_time.values), [0.003, 0])
+        self.assertEqual(frame_stats.blit_bytes.percentile(100), 300)
+        summary = frame_stats.summary()
+        self.assertEqual(summary['blit_bytes']['mean'], 200)
+        self.assertEqual(summary['deadline_misses'], 0)
+        self.assertIn('0/2 requested/presented, 0 missed',
+                      frame_stats.format())
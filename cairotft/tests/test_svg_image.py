@@ -0,0 +1,166 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the svg images loading and of the shared registry."""
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    from cairotft import svg_image
+
+SQUARE_SVG = b"""<svg xmlns="http://www.w3.org/2000/svg"
+  width="10" height="10">
+  <rect width="10" height="10" fill="#000"/>
+</svg>
+"""
+
+WIDE_SVG = b"""<svg xmlns="http://www.w3.org/2000/svg"
+  width="20" height="10">
+  <rect width="20" height="10" fill="#fff"/>
+</svg>
+"""
+
+
+class _SVGFilesTest(unittest.TestCase):
+
+    """Base class of the tests writing svg files."""
+
+    def setUp(self):
+        """Create a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _write(self, name, svg_data):
+        """Write a svg file and return its path."""
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as svg_file:
+            svg_file.write(svg_data)
+        return path
+
+
+@requires_cairo
+class SVGLoadTest(_SVGFilesTest):
+
+    """Tests of the loading of the svg images in a thread."""
+
+    def setUp(self):
+        """Create an event loop."""
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def test_load(self):
+        """SVGImage.load parses a file or svg data in a thread."""
+        path = self._write('square.svg', SQUARE_SVG)
+        future = svg_image.SVGImage.load(path, loop=self.loop)
+        self.assertIsInstance(future, asyncio.Future)
+        square = self.loop.run_until_complete(future)
+        self.assertIsInstance(square, svg_image.SVGImage)
+        self.assertEqual(square.intrinsic_width, 10)
+        wide = self.loop.run_until_complete(svg_image.SVGImage.load(
+            'data:', svg_data=WIDE_SVG, loop=self.loop))
+        self.assertEqual(wide.intrinsic_width, 20)
+
+    def test_load_error(self):
+        """The loading errors are raised by the future."""
+        path = self._write('broken.svg', b'<svg')
+        with self.assertRaises(svg_image.ImageLoadingError):
+            self.loop.run_until_complete(
+                svg_image.SVGImage.load(path, loop=self.loop))
+
+    def test_load_svg_image(self):
+        """load_svg_image gives the shared image of the registry."""
+        self.addCleanup(svg_image.REGISTRY.clear)
+        path = self._write('square.svg', SQUARE_SVG)
+        shared = self.loop.run_until_complete(
+            svg_image.load_svg_image(path, loop=self.loop))
+        self.assertIs(shared, svg_image.get_svg_image(path))
+
+
+@requires_cairo
+class SVGRegistryTest(_SVGFilesTest):
+
+    """Tests of :class:`cairotft.svg_image.SVGRegistry`."""
+
+    def setUp(self):
+        """Create a registry."""
+        super().setUp()
+        self.registry = svg_image.SVGRegistry()
+
+    def test_same_file(self):
+        """The same file gives the same image."""
+        path = self._write('square.svg', SQUARE_SVG)
+        parsed = self.registry.get(path)
+        self.assertIs(self.registry.get(path), parsed)
+        self.assertIs(parsed.raster_cache, self.registry.raster_cache)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_same_content(self):
+        """Files with the same content give the same image."""
+        first = self.registry.get(self._write('a.svg', SQUARE_SVG))
+        second = self.registry.get(self._write('b.svg', SQUARE_SVG))
+        self.assertIs(first, second)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_modified_file(self):
+        """A modified file is parsed again, the old image is dropped."""
+        path = self._write('icon.svg', SQUARE_SVG)
+        square = self.registry.get(path)
+        self._write('icon.svg', WIDE_SVG)
+        wide = self.registry.get(path)
+        self.assertIsNot(wide, square)
+        self.assertEqual(wide.intrinsic_width, 20)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_clear(self):
+        """clear forgets the images."""
+        path = self._write('square.svg', SQUARE_SVG)
+        parsed = self.registry.get(path)
+        self.registry.clear()
+        self.assertEqual(len(self.registry), 0)
+        self.assertIsNot(self.registry.get(path), parsed)
+
+    def test_modified_file_in_thread(self):
+        """The rasters of a modified file are dropped from a thread."""
+        path = self._write('icon.svg', SQUARE_SVG)
+        square = self.registry.get(path)
+        square.rasterize(4, 4)
+        self.assertEqual(len(self.registry.raster_cache), 1)
+        self._write('icon.svg', WIDE_SVG)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        wide = loop.run_until_complete(
+            loop.run_in_executor(None, self.registry.get, path))
+        self.assertIsNot(wide, square)
+        self.assertEqual(len(self.registry.raster_cache), 0)
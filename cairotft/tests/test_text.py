@@ -0,0 +1,143 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the text measurement helpers."""
+import unittest
+
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    import cairocffi as cairo
+
+    from cairotft import text
+
+
+class _Advances():
+
+    """Advances of a font where each character is (code % 4) + 1 wide."""
+
+    @staticmethod
+    def advance(char):
+        """Return the advance of a character."""
+        return ord(char) % 4 + 1
+
+
+@requires_cairo
+class TextIndexTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.text.TextIndex`."""
+
+    def _check_offsets(self, index):
+        """Check the offsets against the sum of the advances."""
+        expected = [0]
+        for char in index.text:
+            expected.append(expected[-1] + _Advances.advance(char))
+        self.assertEqual(index.offsets, expected)
+
+    def test_width(self):
+        """The width of a slice is the sum of its advances."""
+        # a: 2, b: 3, c: 4, d: 1
+        index = text.TextIndex('abcd', _Advances())
+        self._check_offsets(index)
+        self.assertEqual(index.width(), 10)
+        self.assertEqual(index.width(1, 3), 7)
+        self.assertEqual(index.width(2, 2), 0)
+
+    def test_fit(self):
+        """fit returns the end of the longest slice fitting the width."""
+        index = text.TextIndex('abcd', _Advances())
+        self.assertEqual(index.fit(0, 5), 2)
+        self.assertEqual(index.fit(0, 4.9), 1)
+        self.assertEqual(index.fit(0, 100), 4)
+        self.assertEqual(index.fit(1, 7), 3)
+        self.assertEqual(index.fit(1, 100, end=2), 2)
+        self.assertEqual(index.fit(0, 1), 0)
+
+    def test_replace(self):
+        """replace updates the text and the offsets, and returns the shift."""
+        index = text.TextIndex('abcd', _Advances())
+        # same width: b (3) -> b (3)
+        self.assertEqual(index.replace(1, 2, 'b'), 0)
+        self.assertEqual(index.text, 'abcd')
+        self._check_offsets(index)
+        # wider: b (3) -> cc (8)
+        self.assertEqual(index.replace(1, 2, 'cc'), 5)
+        self.assertEqual(index.text, 'acccd')
+        self._check_offsets(index)
+        # narrower: cc (8) -> nothing
+        self.assertEqual(index.replace(1, 3, ''), -8)
+        self.assertEqual(index.text, 'acd')
+        self._check_offsets(index)
+        # insertion at the end, then at the start
+        self.assertEqual(index.replace(3, 3, 'ab'), 5)
+        self.assertEqual(index.replace(0, 0, 'd'), 1)
+        self.assertEqual(index.text, 'dacdab')
+        self._check_offsets(index)
+
+
+@requires_cairo
+class GlyphAtlasTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.text.GlyphAtlas`."""
+
+    def test_lru(self):
+        """The atlas keeps max_fonts fonts, dropping the oldest first."""
+        atlas = text.GlyphAtlas(max_fonts=2)
+        face = cairo.ToyFontFace('sans')
+        font_10 = atlas.get(face, 10)
+        atlas.get(face, 12)
+        self.assertIs(atlas.get(face, 10), font_10)
+        atlas.get(face, 14)
+        self.assertEqual(len(atlas), 2)
+        self.assertIs(atlas.get(face, 10), font_10)
+        self.assertEqual(len(atlas), 2)
+
+    def test_toy_font_faces(self):
+        """Equal toy font faces share their glyph fonts."""
+        atlas = text.GlyphAtlas()
+        font = atlas.get(cairo.ToyFontFace('sans'), 10)
+        self.assertIs(atlas.get(cairo.ToyFontFace('sans'), 10), font)
+        self.assertEqual(len(atlas), 1)
+        self.assertIsNot(atlas.get(cairo.ToyFontFace('serif'), 10), font)
+        self.assertIsNot(
+            atlas.get(cairo.ToyFontFace('sans',
+                                        weight=cairo.FONT_WEIGHT_BOLD), 10),
+            font)
+        self.assertEqual(len(atlas), 3)
+
+    def test_shared_advances(self):
+        """The shared advances are the ones of the atlas glyph fonts."""
+        face = cairo.ToyFontFace('sans')
+        advances = text.get_glyph_advances(face, 11)
+        self.assertIs(advances, text.get_glyph_font(face, 11).advances)
+        self.assertIs(text.get_glyph_advances(face, 11), advances)
+        for size in range(100, 100 + 2 * text.DEFAULT_MAX_FONTS):
+            text.get_glyph_advances(face, size)
+        self.assertEqual(len(text.GLYPH_ATLAS), text.DEFAULT_MAX_FONTS)
+        self.assertIsNot(text.get_glyph_advances(face, 11), advances)
@@ -0,0 +1,98 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the display class, on a virtual framebuffer."""
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from cairotft.tests import HAVE_CAIRO
+from cairotft.tests import requires_cairo
+
+if HAVE_CAIRO:
+    from cairotft import tft
+    from cairotft import trace
+
+    class _Display(tft.TftDisplay):
+
+        """Display blanking the screen then stopping the loop."""
+
+        def draw_interface(self, ctx):
+            """Blank the screen and stop after a few frames."""
+            self.blank_screen(ctx)
+            self.loop.call_later(0.05, self.blank_screen, ctx)
+            self.loop.call_later(0.1, self.loop.stop)
+
+
+@requires_cairo
+class DisplayRunTest(unittest.TestCase):
+
+    """Run and shut down displays."""
+
+    def setUp(self):
+        """Use a new event loop."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(asyncio.set_event_loop, None)
+        self.addCleanup(self.loop.close)
+
+    def test_run_fps(self):
+        """A display at a fixed fps shuts down cleanly."""
+        path = os.path.join(tempfile.mkdtemp(), 'trace.json')
+        self.addCleanup(os.unlink, path)
+        display = _Display('virtual:32x16', fps=50,
+                           tracer=trace.Tracer(path))
+        display.run()
+        self.assertTrue(self.loop.is_closed())
+        self.assertTrue(display._fbmem.mmap.closed)
+        with open(path, encoding='utf-8') as trace_file:
+            self.assertIsInstance(json.load(trace_file), list)
+
+    def test_close_page_flip(self):
+        """A page flip display unmaps the framebuffer when closed."""
+        display = _Display('virtual:32x16,yres_virtual=32', page_flip=True)
+        self.assertTrue(display.page_flip)
+        display.close()
+        self.assertTrue(display._fbmem.mmap.closed)
+
+    def test_deadline_misses(self):
+        """The frames copied after the next frame deadline are counted."""
+        display = _Display('virtual:32x16', fps=50, collect_stats=True)
+        self.addCleanup(display.close)
+        display.blit()
+        display.fps_call(self.loop.time())
+        self.assertEqual(display.stats.deadline_misses, 0)
+        display.blit()
+        display.fps_call(self.loop.time() - 1)
+        self.assertEqual(display.stats.deadline_misses, 1)
+        display.fps_call(self.loop.time() - 1)  # nothing to copy
+        self.assertEqual(display.stats.frames_requested, 2)
+        self.assertEqual(display.stats.frames_presented, 2)
+        self.assertEqual(display.stats.deadline_misses, 1)
@@ -0,0 +1,83 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+"""Tests of the render loop tracer."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from cairotft import trace
+
+
+class TracerTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.trace.Tracer`."""
+
+    def setUp(self):
+        """Create a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    @staticmethod
+    def _record(tracer):
+        """Record a begin/end pair and an instant event."""
+        tracer.begin('blit', 'blit', {'rects': 2})
+        tracer.end('blit', 'blit')
+        tracer.instant('frame', 'frame', {'pending': True})
+
+    def _check_events(self, events):
+        """Check the events recorded by :meth:`_record`."""
+        self.assertEqual([(event['name'], event['ph']) for event in events],
+                         [('blit', 'B'), ('blit', 'E'), ('frame', 'i')])
+        self.assertEqual(events[0]['args'], {'rects': 2})
+        self.assertNotIn('args', events[1])
+        self.assertLessEqual(events[0]['ts'], events[1]['ts'])
+        self.assertEqual(events[2]['pid'], os.getpid())
+
+    def test_file(self):
+        """The events are streamed to a JSON array file."""
+        path = os.path.join(self.directory, 'trace.json')
+        tracer = trace.Tracer(path)
+        self.assertIsNone(tracer.events)
+        self._record(tracer)
+        tracer.close()
+        with open(path, encoding='utf-8') as trace_file:
+            self._check_events(json.load(trace_file))
+
+    def test_ring_buffer(self):
+        """The last events are kept in a ring buffer, and dumped."""
+        tracer = trace.Tracer(ring_size=3)
+        tracer.instant('dropped', 'frame')
+        self._record(tracer)
+        self.assertEqual(len(tracer.events), 3)
+        path = os.path.join(self.directory, 'dump.json')
+        tracer.dump(path)
+        with open(path, encoding='utf-8') as trace_file:
+            self._check_events(json.load(trace_file)['traceEvents'])
+        tracer.close()
@@ -0,0 +1,172 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the transitions."""
+import unittest
+
+from cairotft import transitions
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#: the transition classes of the module.
+TRANSITIONS = (
+    transitions.LinearTransition,
+    transitions.QuadTransition,
+    transitions.CubicTransition,
+    transitions.QuartTransition,
+    transitions.QuintTransition,
+    transitions.PowTransition,
+    transitions.ExpoTransition,
+    transitions.CircTransition,
+    transitions.SineTransition,
+    transitions.BackTransition,
+    transitions.BounceTransition,
+    transitions.ElasticTransition,
+)
+
+
+#: progress values compared between the scalar and array evaluations.
+PROGRESS = [index / 64 for index in range(65)]
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class ArrayTransitionTest(unittest.TestCase):
+
+    """The transitions give the same values for scalars and numpy arrays."""
+
+    def _check(self, function):
+        """Compare function on PROGRESS values and on an array of them."""
+        values = function(numpy.array(PROGRESS))
+        self.assertIsInstance(values, numpy.ndarray)
+        self.assertEqual(values.shape, (len(PROGRESS),))
+        for progress, value in zip(PROGRESS, values):
+            self.assertAlmostEqual(value, function(progress), places=9,
+                                   msg='%r at %s' % (function, progress))
+
+    def test_transitions(self):
+        """ease_in, ease_out and ease_in_out of every transition."""
+        for transition in TRANSITIONS:
+            for function in (transition.ease_in, transition.ease_out,
+                             transition.ease_in_out):
+                self._check(function)
+
+    def test_lut(self):
+        """Lookup-table transitions."""
+        self._check(transitions.LUTTransition(
+            transitions.BounceTransition.ease_out))
+
+    def test_is_array(self):
+        """Only numpy arrays are arrays."""
+        self.assertTrue(transitions.is_array(numpy.zeros(2)))
+        self.assertFalse(transitions.is_array(0.5))
+        self.assertFalse(transitions.is_array([0.5]))
+
+
+class LUTTransitionTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.transitions.LUTTransition`."""
+
+    def test_samples(self):
+        """The table values are exact at the sampled progress values."""
+        function = transitions.CubicTransition.ease_out
+        lut = transitions.LUTTransition(function, size=16)
+        for index in range(17):
+            self.assertAlmostEqual(lut(index / 16), function(index / 16))
+
+    def test_interpolation(self):
+        """Between the samples, the values are interpolated."""
+        lut = transitions.LUTTransition(transitions.QuadTransition, size=2)
+        self.assertAlmostEqual(lut(0.25), 0.125)
+        self.assertLess(transitions.LUTTransition(
+            transitions.QuadTransition.ease_out).max_error(), 1e-4)
+
+    def test_clamp(self):
+        """The progress is clamped to [0, 1]."""
+        lut = transitions.LUTTransition(transitions.LinearTransition.ease_in)
+        self.assertEqual(lut(-1), 0)
+        self.assertEqual(lut(2), 1)
+        self.assertEqual(lut(1), 1)
+
+
+def _exact_bezier(transition, progress):
+    """Return the bezier transition value solved by bisection."""
+    x1, y1, x2, y2 = transition.control_points
+    low, high = 0.0, 1.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if transition._bezier(x1, x2, middle) < progress:
+            low = middle
+        else:
+            high = middle
+    return transition._bezier(y1, y2, (low + high) / 2)
+
+
+class BezierTransitionTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.transitions.BezierTransition`."""
+
+    #: control points, with steep and flat parts for the last ones.
+    CURVES = ((0.25, 0.1, 0.25, 1), (0.42, 0, 0.58, 1),
+              (0.68, -0.55, 0.27, 1.55), (0, 0, 1, 1), (1, 0, 0, 1))
+
+    def test_accuracy(self):
+        """The values match the exact curve, even for steep curves."""
+        for points in self.CURVES:
+            transition = transitions.BezierTransition.curve(*points)
+            for index in range(1001):
+                progress = index / 1000
+                self.assertAlmostEqual(
+                    transition.pos(progress),
+                    _exact_bezier(transition, progress), delta=1e-4,
+                    msg='%s at %s' % (transition.__name__, progress))
+
+    def test_linear(self):
+        """Control points on the diagonal give a linear transition."""
+        transition = transitions.BezierTransition.curve(1 / 3, 1 / 3,
+                                                        2 / 3, 2 / 3)
+        for progress in (0, 0.1, 0.5, 0.77, 1):
+            self.assertAlmostEqual(transition.pos(progress), progress)
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_array(self):
+        """Arrays give the scalar values."""
+        for points in self.CURVES:
+            transition = transitions.BezierTransition.curve(*points)
+            values = transition.pos(numpy.array(PROGRESS))
+            for progress, value in zip(PROGRESS, values):
+                self.assertAlmostEqual(value, transition.pos(progress))
+
+    def test_invalid(self):
+        """x of the control points out of [0, 1] are refused."""
+        self.assertRaises(ValueError, transitions.BezierTransition.curve,
+                          1.5, 0, 0.5, 1)
+        self.assertRaises(NotImplementedError,
+                          transitions.BezierTransition.pos, 0.5)
@@ -0,0 +1,113 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the tween engine."""
+import unittest
+
+from cairotft import transitions
+from cairotft import tween
+from cairotft.tests import FakeDisplay
+
+
+class _Target():
+
+    """Object with animated attributes."""
+
+    pos_x = 0
+    color = (0, 0, 0, 1)
+
+
+class TweenEngineTest(unittest.TestCase):
+
+    """Tests of :class:`cairotft.tween.TweenEngine`."""
+
+    def setUp(self):
+        """Create an engine and a target."""
+        self.display = FakeDisplay()
+        self.engine = tween.TweenEngine(self.display)
+        self.target = _Target()
+
+    def test_linear(self):
+        """The attribute follows the transition, then stays at the end."""
+        updates = []
+        self.engine.start(tween.Tween(self.target, 'pos_x', 100, 1,
+                                      on_update=updates.append))
+        self.assertEqual(len(self.display.requests), 1)
+        self.display.frame(0.25)
+        self.assertAlmostEqual(self.target.pos_x, 25)
+        self.display.frame(2)
+        self.assertEqual(self.target.pos_x, 100)
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(len(self.engine), 0)
+        # no frame requested when idle
+        self.assertEqual(self.display.requests, [])
+
+    def test_transition_and_tuple(self):
+        """Tuples are animated per component, with the transition."""
+        self.engine.start(tween.Tween(
+            self.target, 'color', (1, 0.5, 0, 1), 1,
+            transition=transitions.QuadTransition.ease_in))
+        self.display.frame(0.5)
+        self.assertEqual(self.target.color, (0.25, 0.125, 0, 1))
+
+    def test_delay(self):
+        """A delayed tween does not change the attribute before its start."""
+        self.engine.start(tween.Tween(self.target, 'pos_x', 10, 1,
+                                      delay=1))
+        self.display.frame(0.5)
+        self.assertEqual(self.target.pos_x, 0)
+        self.display.frame(1.5)
+        self.assertAlmostEqual(self.target.pos_x, 5)
+
+    def test_then(self):
+        """Chained tweens start when the previous one ends."""
+        completed = []
+        first = tween.Tween(self.target, 'pos_x', 10, 1,
+                            on_complete=completed.append)
+        second = first.then(tween.Tween(self.target, 'pos_x', 0, 1))
+        self.engine.start(first)
+        self.display.frame(1)
+        self.assertEqual(completed, [first])
+        self.assertEqual(self.target.pos_x, 10)
+        self.display.frame(1.5)
+        self.assertAlmostEqual(self.target.pos_x, 5)
+        self.assertFalse(second.finished)
+
+    def test_cancel(self):
+        """Cancelled tweens stop where they are, without their next."""
+        completed = []
+        first = tween.Tween(self.target, 'pos_x', 10, 1,
+                            on_complete=completed.append)
+        first.then(tween.Tween(self.target, 'pos_x', 0, 1))
+        self.engine.start(first)
+        self.display.frame(0.5)
+        self.engine.cancel_all(self.target)
+        self.display.frame(0.75)
+        self.assertAlmostEqual(self.target.pos_x, 5)
+        self.assertEqual(completed, [])
+        self.assertEqual(len(self.engine), 0)
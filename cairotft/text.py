@@ -0,0 +1,353 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Text measurement and rendering helpers.
+
+Measuring a text with cairo (``text_extents``) is slow for long texts.
+:class:`GlyphAdvances` caches the advance of each character for a font face
+and size, and :class:`TextIndex` keeps the cumulative advances of a text,
+so the characters fitting in a width are found by a binary search::
+
+    index = text.TextIndex(ticker_text,
+                           text.get_glyph_advances(font_face, 18))
+    end = index.fit(start, 300)  # ticker_text[start:end] fits in 300px
+
+The advances of the characters are summed: kerning is ignored (the cairo
+toy font api does not apply it either).
+
+:class:`GlyphFont` draws texts without cairo text rendering: each glyph is
+rasterized once in an alpha mask atlas, then a text is drawn by painting
+its glyph masks in the text color at the cached advances::
+
+    font = text.get_glyph_font(font_face, 18)
+    font.draw_text(ctx, 'hello', 10, 30, (0, 0, 0, 1))
+
+The glyph fonts (and the glyph advances) are kept in a
+:class:`GlyphAtlas`, with a maximum number of (font face, font size)
+pairs.
+"""
+import bisect
+import collections
+import itertools
+import math
+
+import cairocffi as cairo
+
+
+class GlyphAdvances():
+
+    """Cache of the horizontal advances of the characters of a font.
+
+    :ivar font_face: (:class:`cairocffi.FontFace`) the font face.
+    :ivar font_size: (:py:class:`float`) the font size.
+    :ivar scaled_font: (:class:`cairocffi.ScaledFont`) the font measuring
+        the characters.
+    """
+
+    def __init__(self, font_face, font_size):
+        """Initialisation of the cache.
+
+        :param font_face: the font face.
+        :type font_face: :class:`cairocffi.FontFace`
+        :param float font_size: the font size.
+        """
+        self.font_face = font_face
+        self.font_size = font_size
+        self.scaled_font = cairo.ScaledFont(
+            font_face, cairo.Matrix(xx=font_size, yy=font_size))
+        self._advances = {}
+
+    def __len__(self):
+        """Return the number of cached characters."""
+        return len(self._advances)
+
+    def advance(self, char):
+        """Return the horizontal advance of a character."""
+        advance = self._advances.get(char)
+        if advance is None:
+            advance = self.scaled_font.text_extents(char)[4]
+            self._advances[char] = advance
+        return advance
+
+    def text_advance(self, text):
+        """Return the horizontal advance of a text."""
+        return sum(self.advance(char) for char in text)
+
+
+def get_glyph_advances(font_face, font_size):
+    """Return the shared :class:`GlyphAdvances` of a font face and size.
+
+    The advances are kept by the glyph font of :func:`get_glyph_font`, so
+    they are dropped with it by the LRU of the :class:`GlyphAtlas`.
+
+    :param font_face: the font face.
+    :type font_face: :class:`cairocffi.FontFace`
+    :param float font_size: the font size.
+    """
+    return get_glyph_font(font_face, font_size).advances
+
+
+class TextIndex():
+
+    """Cumulative advances of a text.
+
+    :ivar text: (:py:class:`str`) the indexed text.
+    :ivar advances: (:class:`GlyphAdvances`) the advances of the font.
+    :ivar offsets: (:py:class:`list`) x offset of each character, followed
+        by the advance of the whole text (len(text) + 1 values).
+    """
+
+    def __init__(self, text, advances):
+        """Index a text.
+
+        :param str text: the text.
+        :param advances: the advances of the font of the text.
+        :type advances: :class:`GlyphAdvances`
+        """
+        self.text = text
+        self.advances = advances
+        self.offsets = [0]
+        self.offsets.extend(itertools.accumulate(
+            advances.advance(char) for char in text))
+
+    def width(self, start=0, end=None):
+        """Return the advance of text[start:end]."""
+        if end is None:
+            end = len(self.text)
+        return self.offsets[end] - self.offsets[start]
+
+    def fit(self, start, width, end=None):
+        """Return the end of the longest text[start:end] fitting in width.
+
+        :param int start: index of the first character.
+        :param float width: the available width.
+        :param int end: maximum end index (default: the end of the text).
+        """
+        if end is None:
+            end = len(self.text)
+        limit = self.offsets[start] + width
+        return max(start, min(end, bisect.bisect_right(
+            self.offsets, limit, start, end + 1) - 1))
+
+    def replace(self, start, end, new_text):
+        """Replace text[start:end] by new_text, updating the offsets.
+
+        Only the advances of new_text are summed; the offsets after the
+        span are shifted.
+
+        :return: the shift in pixels of the text after the span.
+        """
+        base = self.offsets[start]
+        span_offsets = list(itertools.accumulate(
+            self.advances.advance(char) for char in new_text))
+        shift = base + (span_offsets[-1] if span_offsets else 0) - (
+            self.offsets[end])
+        tail = self.offsets[end + 1:]
+        if shift:
+            tail = [offset + shift for offset in tail]
+        self.offsets[start + 1:] = [base + offset for offset in span_offsets]
+        self.offsets.extend(tail)
+        self.text = self.text[:start] + new_text + self.text[end:]
+        return shift
+
+
+#: width of the glyph atlas pages.
+GLYPH_PAGE_WIDTH = 512
+
+#: default maximum number of fonts of a :class:`GlyphAtlas`.
+DEFAULT_MAX_FONTS = 8
+
+
+class GlyphFont():
+
+    """Glyphs of a font face and size, rasterized in alpha masks.
+
+    The glyphs are rasterized on demand in pages (A8 surfaces one glyph
+    row high) and cached with the offset of their mask from the pen
+    position.
+
+    :ivar advances: (:class:`GlyphAdvances`) the advances of the glyphs.
+    :ivar ascent: (:py:class:`float`) ascent of the font.
+    :ivar descent: (:py:class:`float`) descent of the font.
+    """
+
+    def __init__(self, font_face, font_size):
+        """Initialisation of the glyph font.
+
+        :param font_face: the font face.
+        :type font_face: :class:`cairocffi.FontFace`
+        :param float font_size: the font size.
+        """
+        self.advances = GlyphAdvances(font_face, font_size)
+        self.ascent, self.descent = self.advances.scaled_font.extents()[:2]
+        # 1 pixel around each glyph for the antialiasing.
+        self._row_height = int(math.ceil(self.ascent + self.descent)) + 2
+        self._pages = []
+        self._page_x = GLYPH_PAGE_WIDTH
+        self._cells = {}  # char: (mask or None, x offset, y offset)
+
+    @property
+    def pages(self):
+        """Number of atlas pages."""
+        return len(self._pages)
+
+    def _new_cell(self, width, height):
+        """Return a (surface, x) with room for a glyph of this size."""
+        if height > self._row_height or width > GLYPH_PAGE_WIDTH:
+            # unusual glyph: its own surface.
+            return cairo.ImageSurface(cairo.FORMAT_A8, width, height), 0
+        if self._page_x + width > GLYPH_PAGE_WIDTH:
+            self._pages.append(cairo.ImageSurface(
+                cairo.FORMAT_A8, GLYPH_PAGE_WIDTH, self._row_height))
+            self._page_x = 0
+        cell_x = self._page_x
+        self._page_x += width
+        return self._pages[-1], cell_x
+
+    def _rasterize(self, char):
+        """Rasterize a glyph and return its cell."""
+        (x_bearing, y_bearing, width, height,
+         _, _) = self.advances.scaled_font.text_extents(char)
+        if width <= 0 or height <= 0:
+            return None, 0, 0  # blank glyph (ex: space)
+        offset_x = int(math.floor(x_bearing)) - 1
+        offset_y = int(math.floor(y_bearing)) - 1
+        cell_width = int(math.ceil(x_bearing + width)) + 1 - offset_x
+        cell_height = int(math.ceil(y_bearing + height)) + 1 - offset_y
+        surface, cell_x = self._new_cell(cell_width, cell_height)
+        context = cairo.Context(surface)
+        context.rectangle(cell_x, 0, cell_width, cell_height)
+        context.clip()
+        context.set_scaled_font(self.advances.scaled_font)
+        context.move_to(cell_x - offset_x, -offset_y)
+        context.show_text(char)
+        surface.flush()
+        mask = surface.create_for_rectangle(cell_x, 0,
+                                            cell_width, cell_height)
+        return mask, offset_x, offset_y
+
+    def cell(self, char):
+        """Return (mask, x offset, y offset) of a glyph.
+
+        The offsets are from the pen position on the baseline; the mask is
+        None for the blank glyphs.
+        """
+        cell = self._cells.get(char)
+        if cell is None:
+            cell = self._rasterize(char)
+            self._cells[char] = cell
+        return cell
+
+    def draw_text(self, context, text, pos_x, baseline_y, color):
+        """Draw a text.
+
+        :param context: the cairo context.
+        :param str text: the text.
+        :param float pos_x: x of the pen at the start of the text.
+        :param float baseline_y: y of the baseline.
+        :param tuple color: rgba color (4 floats) of the text.
+
+        :return: the x of the pen after the text.
+        """
+        context.set_source_rgba(*color)
+        baseline_y = int(round(baseline_y))
+        advance = self.advances.advance
+        for char in text:
+            mask, offset_x, offset_y = self.cell(char)
+            if mask is not None:
+                context.mask_surface(mask, int(round(pos_x)) + offset_x,
+                                     baseline_y + offset_y)
+            pos_x += advance(char)
+        return pos_x
+
+
+def _font_face_key(font_face):
+    """Return a key comparing font faces by their description if possible.
+
+    cairocffi font faces are compared by identity.
+    """
+    if isinstance(font_face, cairo.ToyFontFace):
+        return (font_face.get_family(), font_face.get_slant(),
+                font_face.get_weight())
+    return font_face
+
+
+class GlyphAtlas():
+
+    """LRU cache of :class:`GlyphFont`, by (font face, font size).
+
+    The toy font faces are compared by family, slant and weight: the
+    widgets creating their own :class:`cairocffi.ToyFontFace` share the
+    glyph fonts. The other font faces are compared by identity.
+
+    :ivar max_fonts: (:py:class:`int`) maximum number of cached fonts: the
+        least recently used ones are dropped first.
+    """
+
+    def __init__(self, max_fonts=DEFAULT_MAX_FONTS):
+        """Initialisation of the atlas.
+
+        :param int max_fonts: maximum number of cached fonts.
+        """
+        self.max_fonts = max_fonts
+        self._fonts = collections.OrderedDict()
+
+    def __len__(self):
+        """Return the number of cached fonts."""
+        return len(self._fonts)
+
+    def get(self, font_face, font_size):
+        """Return the glyph font of a font face and size."""
+        key = (_font_face_key(font_face), font_size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = GlyphFont(font_face, font_size)
+            self._fonts[key] = font
+            while len(self._fonts) > self.max_fonts:
+                self._fonts.popitem(last=False)
+        else:
+            self._fonts.move_to_end(key)
+        return font
+
+    def clear(self):
+        """Drop all the cached fonts."""
+        self._fonts.clear()
+
+
+#: the process-wide atlas used by :func:`get_glyph_font`.
+GLYPH_ATLAS = GlyphAtlas()
+
+
+def get_glyph_font(font_face, font_size):
+    """Return the shared :class:`GlyphFont` of a font face and size.
+
+    :param font_face: the font face.
+    :type font_face: :class:`cairocffi.FontFace`
+    :param float font_size: the font size.
+    """
+    return GLYPH_ATLAS.get(font_face, font_size)
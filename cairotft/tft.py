@@ -28,9 +28,38 @@
 # POSSIBILITY OF SUCH DAMAGE.
 """Class for display on tft using linuxfb."""
 import asyncio
+import logging
+import time
+
 import cairocffi as cairo
 
+from cairotft import blit
+from cairotft import damage
+from cairotft import layers
 from cairotft import linuxfb
+from cairotft import stats
+from cairotft import trace
+from cairotft import tween
+
+LOGGER = logging.getLogger(__name__)
+
+
+#: frame rate of the timer used when vsync is asked without a forced fps
+#: and the driver does not support FBIO_WAITFORVSYNC.
+VSYNC_FALLBACK_FPS = 60
+
+
+def _callback_name(callback):
+    """Return the trace event name and arguments of a callback.
+
+    For methods, the arguments identify the object, so the callback chains
+    of two widgets of the same class can be told apart.
+    """
+    owner = getattr(callback, '__self__', None)
+    name = getattr(callback, '__qualname__', repr(callback))
+    if owner is None:
+        return name, None
+    return name, {'object': '%s@%x' % (type(owner).__name__, id(owner))}
 
 
 class TftDisplay():
@@ -38,20 +67,37 @@ class TftDisplay():
     """Display class for the tft display.
 
     :ivar fb_interface: (:py:class:`str`) framebuffer interface
-        name (ex: /dev/fb0)
+        name (ex: /dev/fb0, virtual:480x272)
     :ivar cairo_format: (:py:class:`int`) cairo pixel format.
         see cairocffi documentation:
         https://pythonhosted.org/cairocffi/api.html#pixel-format
     :ivar fps: (:py:class:`int`) forced fps
+    :ivar vsync: (:py:class:`bool`) True if the frames are aligned on the
+        vertical blanks of the screen.
+    :ivar page_flip: (:py:class:`bool`) True if the display flips between
+        two pages of the virtual framebuffer instead of copying into the
+        visible one.
     :ivar _blit_flag: (:py:class:`bool`) used in forced fps mode: each blit()
         call will activate the blit flag in order to do a real buffer copy
         in the next blit.
+    :ivar _frame_source: the :class:`cairotft.linuxfb.TimerFrameSource` or
+        :class:`cairotft.linuxfb.VsyncFrameSource` calling :meth:`fps_call`
+        in fps or vsync mode. It is only scheduled when a blit is pending.
+    :ivar _frame_time: (:py:class:`float`) time of the frame being done by
+        :meth:`fps_call`, else None.
+    :ivar _damage: (:class:`cairotft.damage.DamageRegion`) the parts of the
+        memory buffer that changed since the last copy to the screen.
+    :ivar _invalidated: (:py:class:`bool`) True if :meth:`invalidate` was
+        called since the last :meth:`blit` call.
+    :ivar _blit_engines: (:py:class:`list`) one
+        :class:`cairotft.blit.BlitEngine` per screen page, copying the memory
+        buffer into the page.
     :ivar _fbmem: (:class:`cairotft.linuxfb.FbMem`) framebuffer memory
         interface. This object is the memory interface to the screen.
     :ivar _buffermem: (ctypes array of c_char) memory buffer.
         This object is the memory buffer for the double buffer.
     :ivar surf: (:class:`cairocffi.ImageSurface`) cairo surface pointing to
-        the actual screen.
+        the actual screen (the displayed page in page flip mode).
     :ivar buffer_surf: (:class:`cairocffi.ImageSurface`) cairo surface pointing
         to the double buffer.
     :ivar width: (:py:class:`int`) width of the screen in pixels.
@@ -60,15 +106,31 @@ class TftDisplay():
     :ivar ctx: (:class:`cairocffi.Context`) cairocffi default context.
         This context draws in the double (memory) buffer.
     :ivar screen_ctx: (:class:`cairocffi.Context`) cairocffi context to draw
-        directly on the screen.
+        directly on the screen (the displayed page in page flip mode).
     :ivar loop: (:py:class:`asyncio.BaseEventLoop`) The main event loop.
+    :ivar stats: (:class:`cairotft.stats.FrameStats`) the frame timing
+        statistics, or None if they are not collected.
+    :ivar stats_log_interval: (:py:class:`float`) interval in seconds
+        between two statistics log lines, or None.
+    :ivar tracer: (:class:`cairotft.trace.Tracer`) the tracer recording the
+        render loop events, or None.
+    :ivar tweens: (:class:`cairotft.tween.TweenEngine`) the property
+        animations of the display, advanced at each frame.
+    :ivar layers: (:class:`cairotft.layers.LayerStack`) the offscreen
+        layers of the widgets in layer mode, composited into the memory
+        buffer before each copy to the screen.
     """
 
     def __init__(self, interface='/dev/fb0', cairo_format=cairo.FORMAT_ARGB32,
-                 fps=None):
+                 fps=None, page_flip=False, vsync=False, blit_strategy=None,
+                 collect_stats=False, stats_log_interval=None, tracer=None):
         """Initialisation of the class.
 
-        :param str interface: framebuffer interface name
+        :param interface: framebuffer interface name, or an already opened
+            :class:`cairotft.linuxfb.FbMem` object.
+            Names starting with 'virtual:' open a memory backed
+            framebuffer (see :func:`cairotft.linuxfb.parse_virtual_spec`),
+            ex: 'virtual:480x272x16'.
         :param int cairo_format: the pixel format.
             see: https://pythonhosted.org/cairocffi/api.html#pixel-format
         :param int fps: a forced fps.
@@ -77,7 +139,9 @@ class TftDisplay():
               buffer.
             * If a forced fps is given, each call to :class:`TftDisplay.blit`
               will not redraw the screen but only trigger a redraw for the
-              next frame. The 'real' blit is called every 1/fps seconds.
+              next frame. The 'real' blit is called on the next frame of
+              a 1/fps seconds grid that does not drift. When nothing
+              calls blit(), no frame is scheduled at all.
 
               .. warning:: choose your fps carefully: if you choose a to high
                  fps for your hardware, the application may pass all its time
@@ -90,69 +154,380 @@ class TftDisplay():
                  20 000 000 / (480 * 272 * 2 * 8) = 9.57 fps
                  (without taking care of the spi communications overhead)
 
+        :param bool page_flip: if True and if the driver supports panning
+            with a virtual height of at least two screens, blit() copies the
+            damaged rectangles into the hidden page then shows it with
+            FBIOPAN_DISPLAY: the visible page is never written, so there is
+            no tearing. Without driver support, the display falls back to
+            the copy into the visible page.
+        :param bool vsync: if True, blit() works like in fps mode but the
+            real blits are done just after the vertical blanks of the screen
+            (FBIO_WAITFORVSYNC, waited in a helper thread).
+            If the driver does not support it, the frames are done on a
+            timer at fps (or :data:`VSYNC_FALLBACK_FPS` if fps is None).
+        :param str blit_strategy: force the strategy used to copy the memory
+            buffer to the screen (see :mod:`cairotft.blit`). By default, it
+            is chosen at each blit based on the pixel format and the damage.
+        :param bool collect_stats: if True, record the timing of each frame
+            in :attr:`stats`: the time spent in draw_interface and in the
+            callbacks scheduled with :meth:`call_soon` and
+            :meth:`call_later`, the time and bytes of the copies to the
+            screen, the frames requested and presented and the deadline
+            misses.
+        :param float stats_log_interval: if given (and collect_stats is
+            True), log a line of statistics every stats_log_interval seconds.
+        :param tracer: if given, record begin/end trace events for the
+            callbacks scheduled with :meth:`call_soon` and
+            :meth:`call_later`, the copies to the screen and the svg
+            drawings. The tracer becomes the process-wide tracer and is
+            closed with the display.
+        :type tracer: :class:`cairotft.trace.Tracer`
         """
         self.fb_interface = interface
         self.cairo_format = cairo_format
         self.fps = fps
+        self.vsync = vsync
         self._blit_flag = False
+        self._frame_time = None
+        self._frame_callbacks = []
+        self._frame_handle = None
+        self._in_frame = False
+        self._frame_interval = 1 / (fps or VSYNC_FALLBACK_FPS)
+        self.stats = stats.FrameStats() if collect_stats else None
+        self.stats_log_interval = stats_log_interval
+        self.tracer = tracer
+        if tracer is not None:
+            trace.set_tracer(tracer)
 
         # two memory buffers:
         #     * fbmem for direct draw on the screen
         #     * buffermem: memory buffer for double buffering.
-        self._fbmem = linuxfb.open_fbmem(self.fb_interface)
-        self._buffermem = linuxfb.memory_buffer(self._fbmem.fix_info.smem_len)
+        if isinstance(interface, linuxfb.FbMem):
+            self._fbmem = interface
+            self.fb_interface = interface.fid.name
+        else:
+            self._fbmem = linuxfb.open_fbmem(self.fb_interface)
+        self._orig_var_info = linuxfb.VarScreenInfo.from_buffer_copy(
+            self._fbmem.var_info)
+        self.page_flip = page_flip and linuxfb.setup_page_flip(self._fbmem)
+        self._buffermem = linuxfb.memory_buffer(
+            linuxfb.page_size(self._fbmem))
 
         # two cairo surface, directly on the screen and in the memory buffer.
-        self.surf = linuxfb.cairo_surface_from_fbmem(
-            self._fbmem,
-            self._fbmem.mmap,
-            cairo_format)
+        # in page flip mode, one screen surface per page.
+        if self.page_flip:
+            page_mems = [linuxfb.page_buffer(self._fbmem, page)
+                         for page in range(2)]
+        else:
+            page_mems = [self._fbmem.mmap]
+        self._page_surfs = [
+            linuxfb.cairo_surface_from_fbmem(self._fbmem, mem, cairo_format)
+            for mem in page_mems]
+        self._page_ctxs = [cairo.Context(surf) for surf in self._page_surfs]
+        self.surf = self._page_surfs[0]
+        self._front_page = 0
         self.buffer_surf = linuxfb.cairo_surface_from_fbmem(
             self._fbmem,
             self._buffermem,
             cairo_format)
+        self._blit_engines = [
+            blit.BlitEngine(self.buffer_surf, self._buffermem,
+                            surf, mem, cairo_format,
+                            self._fbmem.fix_info.line_length,
+                            strategy=blit_strategy)
+            for (surf, mem) in zip(self._page_surfs, page_mems)]
 
         # calculates width and height of the screen
         self.width, self.height = self.surf.get_width(), self.surf.get_height()
-        self.size_per_pixel = self._fbmem.fix_info.smem_len / (self.width *
-                                                               self.height)
+        self.size_per_pixel = linuxfb.page_size(self._fbmem) / (self.width *
+                                                                self.height)
         # by default we write only in buffer using self.ctx
         self.ctx = cairo.Context(self.buffer_surf)
 
         # cairo context for direct rendering on the screen.
-        # normaly only used with blit.
-        self.screen_ctx = cairo.Context(self.surf)
+        self.screen_ctx = self._page_ctxs[0]
+
+        # dirty rectangles of the memory buffer, and, in page flip mode,
+        # the rectangles not yet copied into the hidden page.
+        self._damage = damage.DamageRegion(self.width, self.height)
+        self._back_damage = damage.DamageRegion(self.width, self.height)
+        self._back_damage.add_all()
+        self._invalidated = False
 
         # async io loop
         self.loop = asyncio.get_event_loop()
 
+        # frame clock used in fps and vsync modes
+        self._frame_source = None
+        if self.vsync:
+            self._frame_source = linuxfb.frame_source(
+                self._fbmem, self.loop, self.fps_call, self._frame_interval)
+        elif self.fps:
+            self._frame_source = linuxfb.TimerFrameSource(
+                self.loop, self.fps_call, self._frame_interval)
+
+        self.tweens = tween.TweenEngine(self)
+        self.layers = layers.LayerStack(self)
+
+    @property
+    def frame_time(self):
+        """Return the time of the frame being drawn (in loop time).
+
+        In fps or vsync mode, all the drawings done before a frame get the
+        same time: the deadline of this frame. Widgets should use it instead
+        of :py:func:`time.time` for their animations.
+        """
+        if self._frame_time is not None:
+            return self._frame_time
+        if self._frame_source is not None:
+            return self._frame_source.next_frame_time()
+        return self.loop.time()
+
+    def invalidate(self, pos_x=0, pos_y=0, width=None, height=None):
+        """Mark a rectangle of the memory buffer as changed.
+
+        Only the invalidated rectangles are copied to the screen by the next
+        blit. Without argument, the whole screen is invalidated.
+
+        :param int pos_x: x coordinates of the rectangle (top left corner)
+        :param int pos_y: y coordinates of the rectangle (top left corner)
+        :param int width: width of the rectangle (default: up to the right
+            of the screen)
+        :param int height: height of the rectangle (default: up to the
+            bottom of the screen)
+        """
+        if width is None:
+            width = self.width - pos_x
+        if height is None:
+            height = self.height - pos_y
+        self._damage.add(pos_x, pos_y, width, height)
+        self._invalidated = True
+
     def blit(self, force=False):
         """Display the buffer in the screen.
 
         Take the content of the memory buffer and draw it on the screen.
+        Only the rectangles given to :meth:`invalidate` are copied; if
+        nothing has been invalidated since the previous blit() call, the
+        whole screen is copied.
 
         :param bool force: if force is True, force a buffer copy, even in fps
             mode.
         """
-        if self.fps is None or force:
-            self.screen_ctx.set_source_surface(self.buffer_surf)
-            self.screen_ctx.paint()
+        if not self._invalidated:
+            self._damage.add_all()
+        self._invalidated = False
+        if self.stats is not None:
+            self.stats.frames_requested += 1
+        if self._frame_source is None or force:
+            self._copy_damage()
         else:
             self._blit_flag = True
+            if not self._in_frame:
+                self._frame_source.request()
+
+    def _copy_damage(self):
+        """Copy the damaged parts of the memory buffer to the screen.
+
+        The changed layers are composited into the memory buffer first.
+        """
+        self.layers.composite()
+        if not self._damage:
+            return
+        if self.tracer is not None:
+            self.tracer.begin('blit', 'blit',
+                              {'rects': len(self._damage.rects)})
+        if self.stats is not None:
+            start = time.perf_counter()
+        if self.page_flip:
+            bytes_copied = self._flip_page()
+        else:
+            bytes_copied = self._paint_damage(self._front_page, self._damage)
+        self._damage.clear()
+        if self.stats is not None:
+            self.stats.add_blit(time.perf_counter() - start, bytes_copied)
+        if self.tracer is not None:
+            self.tracer.end('blit', 'blit', {'bytes': bytes_copied})
+
+    def _paint_damage(self, page, region):
+        """Copy the damaged region of the memory buffer into a screen page.
+
+        :param int page: the destination page.
+        :param region: the damaged region.
+        :type region: :class:`cairotft.damage.DamageRegion`
+
+        :return: the number of bytes copied.
+        """
+        return self._blit_engines[page].blit(region)
 
-    def fps_call(self):
-        """force a redraw screen. Called every x ms when fps mode is set."""
+    def _flip_page(self):
+        """Update the hidden page and display it.
+
+        The hidden page was displayed one frame ago: it misses the damage of
+        the previous frame and the damage of this frame.
+
+        :return: the number of bytes copied.
+        """
+        back_page = 1 - self._front_page
+        frame_rects = self._damage.rects
+        for rect in self._back_damage.rects:
+            self._damage.add(*rect)
+        bytes_copied = self._paint_damage(back_page, self._damage)
+        try:
+            linuxfb.pan_display(self._fbmem, back_page * self.height)
+        except OSError:
+            # the driver refused to pan: copy into the visible page from now
+            self.page_flip = False
+            self._damage.add_all()
+            return bytes_copied + self._paint_damage(self._front_page,
+                                                     self._damage)
+        self._front_page = back_page
+        self.surf = self._page_surfs[back_page]
+        self.screen_ctx = self._page_ctxs[back_page]
+        self._back_damage.clear()
+        for rect in frame_rects:
+            self._back_damage.add(*rect)
+        return bytes_copied
+
+    def request_frame(self, callback):
+        """Call callback(frame_time) at the next frame.
+
+        The callbacks are called just before the copy to the screen of the
+        frame, so what they draw is shown in this frame. Request again to be
+        called at the following frame. Without fps nor vsync, the frames
+        are done on a timer at :data:`VSYNC_FALLBACK_FPS`.
+
+        :param callback: function called with the loop time of the frame.
+        """
+        self._frame_callbacks.append(callback)
+        if self._frame_source is not None:
+            self._frame_source.request()
+        elif self._frame_handle is None:
+            self._frame_handle = self.loop.call_later(self._frame_interval,
+                                                      self._frame_timer)
+
+    def _frame_timer(self):
+        """Do a frame without frame source (see :meth:`request_frame`)."""
+        self._frame_handle = None
+        self.fps_call(self.loop.time())
+
+    def fps_call(self, frame_time=None):
+        """force a redraw screen. Called at each frame in fps or vsync mode.
+
+        :param float frame_time: the loop time of the frame.
+        """
+        self._frame_time = frame_time
+        if self.tracer is not None:
+            self.tracer.instant('frame', 'frame', {'pending': self._blit_flag})
+        if self._frame_callbacks:
+            callbacks = self._frame_callbacks
+            self._frame_callbacks = []
+            self._in_frame = True
+            try:
+                for callback in callbacks:
+                    if self.stats is None and self.tracer is None:
+                        callback(frame_time)
+                    else:
+                        self._instrumented_call(callback, frame_time)
+            finally:
+                self._in_frame = False
         if self._blit_flag:
-            self.blit(force=True)
+            self._copy_damage()
             self._blit_flag = False
-        self.loop.call_later(1 / self.fps, self.fps_call)
+            if (self.stats is not None and frame_time is not None and
+                    self.loop.time() > frame_time + self._frame_interval):
+                self.stats.deadline_misses += 1
+        self._frame_time = None
+
+    def call_soon(self, callback, *args):
+        r"""Call callback(\*args) as soon as possible in the event loop.
+
+        Same as :py:meth:`asyncio.BaseEventLoop.call_soon`, but the time
+        spent in the callback is recorded in the statistics and the trace
+        (when enabled). Widgets should schedule their drawing callbacks
+        with it.
+        """
+        if self.stats is None and self.tracer is None:
+            return self.loop.call_soon(callback, *args)
+        return self.loop.call_soon(self._instrumented_call, callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        r"""Call callback(\*args) after delay seconds in the event loop.
+
+        Same as :py:meth:`asyncio.BaseEventLoop.call_later`, but the time
+        spent in the callback is recorded in the statistics and the trace
+        (when enabled). Widgets should schedule their drawing callbacks
+        with it.
+        """
+        if self.stats is None and self.tracer is None:
+            return self.loop.call_later(delay, callback, *args)
+        return self.loop.call_later(delay, self._instrumented_call,
+                                    callback, *args)
+
+    def _instrumented_call(self, callback, *args):
+        r"""Call callback(\*args), record its drawing time and trace it.
+
+        The time of the copies to the screen done by the callback is not
+        counted as drawing time.
+        """
+        tracer = self.tracer
+        if tracer is not None:
+            name, trace_args = _callback_name(callback)
+            tracer.begin(name, 'callback', trace_args)
+        if self.stats is not None:
+            blit_total = self.stats.blit_total
+            start = time.perf_counter()
+        try:
+            return callback(*args)
+        finally:
+            if self.stats is not None:
+                self.stats.add_draw(time.perf_counter() - start -
+                                    (self.stats.blit_total - blit_total))
+            if tracer is not None:
+                tracer.end(name, 'callback')
+
+    def _log_stats(self):
+        """Log a line of statistics and schedule the next one."""
+        LOGGER.info('%s: %s', self.fb_interface, self.stats.format())
+        self.loop.call_later(self.stats_log_interval, self._log_stats)
 
     def close(self):
-        """Close the interface."""
+        """Close the interface.
+
+        Call it before closing the event loop: the scheduled frames are
+        cancelled and the last copy to the screen is done immediately.
+        """
+        if self._frame_source is not None:
+            self._frame_source.stop()
+        if self._frame_handle is not None:
+            self._frame_handle.cancel()
+            self._frame_handle = None
         # Back to black background
-        self.blank_screen(self.ctx)
+        self.blank_screen(self.ctx, blit=False)
+        self.blit(force=True)
+        if self.page_flip:
+            # back to the first page and to the original virtual size
+            self._back_damage.add_all()
+            self._paint_damage(0, self._back_damage)
+            try:
+                linuxfb.pan_display(self._fbmem, 0)
+                linuxfb.put_var_info(self._fbmem.fid, self._orig_var_info)
+            except OSError:
+                pass
+        self._release_pages()
         linuxfb.close_fbmem(self._fbmem)
 
+    def _release_pages(self):
+        """Drop all the references to the memory of the screen pages.
+
+        The framebuffer memory map cannot be closed while a memory view or
+        a cairo surface points into it.
+        """
+        for engine in self._blit_engines:
+            engine.release()
+        self.surf = self.screen_ctx = None
+        self._page_surfs = self._page_ctxs = self._blit_engines = None
+
     def blank_screen(self, ctx, color=(0, 0, 0, 1), blit=True):
         """Blank the screen with the given color.
 
@@ -163,6 +538,7 @@ class TftDisplay():
         ctx.set_source_rgba(*color)
         ctx.rectangle(0, 0, self.width, self.height)
         ctx.fill()
+        self.invalidate()
         if blit:
             self.blit()
 
@@ -177,13 +553,20 @@ class TftDisplay():
     def run(self):
         """main loop."""
         # just afer loop is started, draw the interface
-        self.loop.call_soon(self.draw_interface, self.ctx)
-        if self.fps:
-            self.loop.call_later(1 / self.fps, self.fps_call)
+        self.call_soon(self.draw_interface, self.ctx)
+        if self.stats is not None and self.stats_log_interval:
+            self.loop.call_later(self.stats_log_interval, self._log_stats)
+        if self._frame_source is not None:
+            self._frame_source.start()
         try:
             self.loop.run_forever()
         except KeyboardInterrupt:
             pass
         finally:
-            self.loop.close()
-            self.close()
+            try:
+                self.close()
+            finally:
+                self.loop.close()
+                if self.tracer is not None:
+                    self.tracer.close()
+                    trace.set_tracer(None)
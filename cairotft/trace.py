@@ -0,0 +1,153 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Trace events of the render loop, in the Chrome trace event format.
+
+The traces can be opened with https://ui.perfetto.dev or chrome://tracing.
+
+Usage::
+
+    tracer = trace.Tracer(path='/tmp/cairotft.json')
+    display = MyDisplay(tracer=tracer)
+    display.run()  # the trace file is closed with the display
+
+The display sets its tracer as the process-wide tracer (see
+:func:`set_tracer`) so modules without access to the display (ex:
+:mod:`cairotft.svg_image`) can also record events.
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+_TRACER = None
+
+
+def get_tracer():
+    """Return the process-wide tracer, or None if tracing is disabled."""
+    return _TRACER
+
+
+def set_tracer(tracer):
+    """Set the process-wide tracer (None to disable tracing)."""
+    global _TRACER  # pylint: disable=global-statement
+    _TRACER = tracer
+
+
+class Tracer():
+
+    """Record begin/end events in the Chrome trace event format.
+
+    The events are either written to a file as they come, or kept in a ring
+    buffer of the last events, that can be written with :meth:`dump`.
+
+    :ivar path: (:py:class:`str`) path of the trace file, or None when the
+        events are kept in the ring buffer.
+    :ivar events: (:py:class:`collections.deque`) the ring buffer (None
+        when writing to a file).
+    """
+
+    def __init__(self, path=None, ring_size=100000):
+        """Initialisation of the tracer.
+
+        :param str path: write the events in this file. If None, keep them
+            in a ring buffer.
+        :param int ring_size: number of events kept in the ring buffer.
+        """
+        self.path = path
+        self._pid = os.getpid()
+        if path is not None:
+            self.events = None
+            self._file = open(path, 'w', encoding='utf-8')
+            # the JSON array format: the closing bracket is optional for
+            # the trace viewers, so the file can be read while running.
+            self._file.write('[')
+            self._separator = '\n'
+        else:
+            self.events = collections.deque(maxlen=ring_size)
+            self._file = None
+
+    @staticmethod
+    def now():
+        """Return the current trace time in microseconds."""
+        return time.perf_counter() * 1000000
+
+    def _add(self, event):
+        """Record an event."""
+        if self._file is not None:
+            self._file.write(self._separator)
+            self._file.write(json.dumps(event))
+            self._separator = ',\n'
+        elif self.events is not None:
+            self.events.append(event)
+
+    def begin(self, name, category, args=None):
+        """Record the beginning of an event.
+
+        :param str name: name of the event.
+        :param str category: category of the event (ex: 'blit').
+        :param dict args: optional arguments shown with the event.
+        """
+        event = {'name': name, 'cat': category, 'ph': 'B', 'ts': self.now(),
+                 'pid': self._pid, 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        self._add(event)
+
+    def end(self, name, category, args=None):
+        """Record the end of an event (see :meth:`begin`)."""
+        event = {'name': name, 'cat': category, 'ph': 'E', 'ts': self.now(),
+                 'pid': self._pid, 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        self._add(event)
+
+    def instant(self, name, category, args=None):
+        """Record an instant event."""
+        event = {'name': name, 'cat': category, 'ph': 'i', 's': 't',
+                 'ts': self.now(), 'pid': self._pid,
+                 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        self._add(event)
+
+    def dump(self, path):
+        """Write the events of the ring buffer in a trace file.
+
+        :param str path: path of the trace file.
+        """
+        with open(path, 'w', encoding='utf-8') as trace_file:
+            json.dump({'traceEvents': list(self.events)}, trace_file)
+
+    def close(self):
+        """Close the trace file."""
+        if self._file is not None:
+            self._file.write('\n]\n')
+            self._file.close()
+            self._file = None
@@ -35,9 +35,48 @@ Idea and implementation is taken from mootools Fx project:
 https://github.com/mootools/mootools-core/blob/master/Source/Fx/Fx.Transitions.js
 
 see: http://www.chipwreck.de/blog/2010/02/17/mootools-transitions-explained/
+
+On slow cpus, wrap the transitions in a :class:`LUTTransition`: the
+transition is sampled once and then evaluated by interpolation::
+
+    Marquee(..., transition=LUTTransition(BounceTransition.ease_out))
+
+When numpy is installed, all the transitions also accept numpy arrays of
+progress values and return arrays, to compute whole animation paths at
+once::
+
+    path = QuadTransition.ease_out(numpy.linspace(0, 1, 1000))
 """
 import math
 
+try:
+    import numpy
+except ImportError:  # numpy is optional: only needed for arrays.
+    numpy = None
+
+#: default number of intervals of the lookup tables.
+DEFAULT_LUT_SIZE = 256
+
+
+def is_array(progress):
+    """Return True if progress is a numpy array."""
+    return numpy is not None and isinstance(progress, numpy.ndarray)
+
+
+def _pow(base, exponent):
+    """math.pow, vectorized for numpy arrays."""
+    if is_array(base) or is_array(exponent):
+        return numpy.power(numpy.asarray(base, dtype=float), exponent)
+    return math.pow(base, exponent)
+
+
+def _math(progress):
+    """Return the module of the math functions for the progress value.
+
+    numpy for arrays, math otherwise.
+    """
+    return numpy if is_array(progress) else math
+
 
 class BaseTransition():
 
@@ -71,6 +110,10 @@ class BaseTransition():
             In the first half of the time the transition is applied normally,
             in the second half it is applied reverse.
         """
+        if is_array(progress):
+            return numpy.where(progress <= 0.5,
+                               cls.pos(2 * progress) / 2,
+                               2 - cls.pos(2 * (1 - progress)) / 2)
         if progress <= 0.5:
             return cls.pos(2 * progress) / 2
         else:
@@ -121,7 +164,7 @@ class QuadTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return math.pow(progress, 2)
+        return _pow(progress, 2)
 
 
 class CubicTransition(BaseTransition):
@@ -139,7 +182,7 @@ class CubicTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return math.pow(progress, 3)
+        return _pow(progress, 3)
 
 
 class QuartTransition(BaseTransition):
@@ -157,7 +200,7 @@ class QuartTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return math.pow(progress, 4)
+        return _pow(progress, 4)
 
 
 class QuintTransition(BaseTransition):
@@ -175,7 +218,7 @@ class QuintTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return math.pow(progress, 5)
+        return _pow(progress, 5)
 
 
 class PowTransition(BaseTransition):
@@ -193,7 +236,7 @@ class PowTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return math.pow(progress, 6)
+        return _pow(progress, 6)
 
 
 class ExpoTransition(BaseTransition):
@@ -210,7 +253,7 @@ class ExpoTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return math.pow(2, 8 * (progress - 1))
+        return _pow(2, 8 * (progress - 1))
 
 
 class CircTransition(BaseTransition):
@@ -227,6 +270,8 @@ class CircTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
+        if is_array(progress):
+            return 1 - numpy.sin(numpy.arccos(progress - 1))
         return 1 - math.sin(math.acos(progress - 1))
 
 
@@ -245,7 +290,7 @@ class SineTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return 1 - math.cos(progress * math.pi / 2)
+        return 1 - _math(progress).cos(progress * math.pi / 2)
 
 
 class BackTransition(BaseTransition):
@@ -262,7 +307,7 @@ class BackTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return math.pow(progress, 2) * (2.618 * progress - 1.618)
+        return _pow(progress, 2) * (2.618 * progress - 1.618)
 
 
 class BounceTransition(BaseTransition):
@@ -281,6 +326,8 @@ class BounceTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
+        if is_array(progress):
+            return cls._pos_array(progress)
         value = 0
         p_a = 0
         p_b = 1
@@ -293,6 +340,26 @@ class BounceTransition(BaseTransition):
             p_b /= 2
         return value
 
+    @classmethod
+    def _pos_array(cls, progress):
+        """Vectorized :meth:`pos`: one loop iteration per bounce.
+
+        :param progress: numpy array of progress values.
+        """
+        progress = numpy.asarray(progress, dtype=float)
+        value = numpy.zeros_like(progress)
+        pending = numpy.ones(progress.shape, dtype=bool)
+        p_a = 0
+        p_b = 1
+        while p_b > 0 and pending.any():
+            bounce = pending & (progress >= (7 - 4 * p_a) / 11)
+            value[bounce] = p_b * p_b - numpy.power(
+                (11 - 6 * p_a - 11 * progress[bounce]) / 4, 2)
+            pending &= ~bounce
+            p_a += p_b
+            p_b /= 2
+        return value
+
 
 class ElasticTransition(BaseTransition):
 
@@ -309,5 +376,228 @@ class ElasticTransition(BaseTransition):
 
         :param float progress: the wanted progression of the transition.
         """
-        return math.pow(2, 10 * (progress - 1)) * math.cos(
+        return _pow(2, 10 * (progress - 1)) * _math(progress).cos(
             20 * progress * math.pi * 1 / 3)
+
+
+class BezierTransition(BaseTransition):
+
+    """Cubic bezier transition, like the css ``cubic-bezier()`` function.
+
+    The curve goes from (0, 0) to (1, 1) with the control points (x1, y1)
+    and (x2, y2). Create the transitions with :meth:`curve`::
+
+        EaseTransition = BezierTransition.curve(0.25, 0.1, 0.25, 1)
+        Marquee(..., transition=EaseTransition.ease_out)
+
+    The curve parameter t of each progress value is precomputed in a table.
+    Evaluating the transition starts from an interpolation in the table,
+    refined by Newton iterations kept inside the bracket of the two table
+    entries (with bisection steps where the curve is too flat for Newton):
+    usually one or two iterations.
+    """
+
+    control_points = None
+    size = None
+    t_table = None
+
+    #: maximum number of iterations solving the curve parameter t.
+    NEWTON_ITERATIONS = 32
+
+    #: precision of the solved curve parameter t.
+    PRECISION = 1e-9
+
+    @classmethod
+    def curve(cls, x1, y1, x2, y2, size=DEFAULT_LUT_SIZE):
+        """Return a new transition class following a cubic bezier curve.
+
+        :param float x1: x of the first control point (between 0 and 1).
+        :param float y1: y of the first control point.
+        :param float x2: x of the second control point (between 0 and 1).
+        :param float y2: y of the second control point.
+        :param int size: number of intervals of the table.
+        """
+        if not (0 <= x1 <= 1 and 0 <= x2 <= 1):
+            raise ValueError('the x of the control points must be between '
+                             '0 and 1')
+        name = 'BezierTransition(%g, %g, %g, %g)' % (x1, y1, x2, y2)
+        transition = type(name, (cls,), {
+            'control_points': (x1, y1, x2, y2),
+            'size': size,
+        })
+        transition.t_table = transition._solve_table(size)
+        return transition
+
+    @staticmethod
+    def _bezier(point1, point2, curve_t):
+        """Return a coordinate of the curve at the parameter t."""
+        # 3(1-t)^2 t p1 + 3(1-t) t^2 p2 + t^3, in horner form.
+        coef_c = 3 * point1
+        coef_b = 3 * (point2 - point1) - coef_c
+        coef_a = 1 - coef_c - coef_b
+        return ((coef_a * curve_t + coef_b) * curve_t + coef_c) * curve_t
+
+    @staticmethod
+    def _bezier_slope(point1, point2, curve_t):
+        """Return the derivative of a coordinate at the parameter t."""
+        coef_c = 3 * point1
+        coef_b = 3 * (point2 - point1) - coef_c
+        coef_a = 1 - coef_c - coef_b
+        return (3 * coef_a * curve_t + 2 * coef_b) * curve_t + coef_c
+
+    @classmethod
+    def _solve(cls, progress, low, high, curve_t):
+        """Return the parameter t of the curve at a progress value.
+
+        x(t) is monotonic: the Newton iterations starting at curve_t are
+        kept in the bracket [low, high] of the solution.
+        """
+        x1, _, x2, _ = cls.control_points
+        for _ in range(cls.NEWTON_ITERATIONS):
+            error = cls._bezier(x1, x2, curve_t) - progress
+            if error > 0:
+                high = curve_t
+            else:
+                low = curve_t
+            slope = cls._bezier_slope(x1, x2, curve_t)
+            new_t = curve_t - error / slope if slope > 0 else -1
+            if not low <= new_t <= high:
+                new_t = (low + high) / 2
+            if abs(new_t - curve_t) < cls.PRECISION:
+                return new_t
+            curve_t = new_t
+        return curve_t
+
+    @classmethod
+    def _solve_array(cls, progress, low, high, curve_t):
+        """Same as :meth:`_solve`, for numpy arrays."""
+        x1, _, x2, _ = cls.control_points
+        for _ in range(cls.NEWTON_ITERATIONS):
+            error = cls._bezier(x1, x2, curve_t) - progress
+            high = numpy.where(error > 0, curve_t, high)
+            low = numpy.where(error > 0, low, curve_t)
+            slope = cls._bezier_slope(x1, x2, curve_t)
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                new_t = curve_t - error / slope
+            new_t = numpy.where((slope > 0) & (low <= new_t) &
+                                (new_t <= high),
+                                new_t, (low + high) / 2)
+            converged = numpy.all(abs(new_t - curve_t) < cls.PRECISION)
+            curve_t = new_t
+            if converged:
+                break
+        return curve_t
+
+    @classmethod
+    def _solve_table(cls, size):
+        """Return the parameters t of the progress values index / size."""
+        x1, _, x2, _ = cls.control_points
+        # x(t) is monotonic: bracket t by walking a sampled curve.
+        samples = [cls._bezier(x1, x2, index / size)
+                   for index in range(size + 1)]
+        table = [0]
+        sample = 0
+        for index in range(1, size):
+            progress = index / size
+            while sample < size - 1 and samples[sample + 1] < progress:
+                sample += 1
+            low, high = samples[sample], samples[sample + 1]
+            curve_t = (sample + (progress - low) / (high - low)
+                       if high > low else sample) / size
+            table.append(cls._solve(progress, sample / size,
+                                    (sample + 1) / size, curve_t))
+        table.append(1)
+        table.append(1)  # sentinel for progress 1
+        return table
+
+    @classmethod
+    def pos(cls, progress=0):
+        """calculate pos based on progress value, progress is between 0 and 1.
+
+        :param float progress: the wanted progression of the transition.
+        """
+        if cls.t_table is None:
+            raise NotImplementedError(
+                'use BezierTransition.curve() to create the transitions')
+        _, y1, _, y2 = cls.control_points
+        size = cls.size
+        if is_array(progress):
+            progress = numpy.clip(progress, 0, 1)
+            position = progress * size
+            index = numpy.minimum(position.astype(int), size - 1)
+            table = numpy.asarray(cls.t_table)
+            low, high = table[index], table[index + 1]
+            curve_t = cls._solve_array(
+                progress, low, high, low + (high - low) * (position - index))
+            return cls._bezier(y1, y2, curve_t)
+        if progress <= 0:
+            return 0
+        if progress >= 1:
+            return 1
+        position = progress * size
+        index = int(position)
+        low, high = cls.t_table[index], cls.t_table[index + 1]
+        curve_t = cls._solve(progress, low, high,
+                             low + (high - low) * (position - index))
+        return cls._bezier(y1, y2, curve_t)
+
+
+class LUTTransition():
+
+    """A transition precomputed in a lookup table.
+
+    The transition is sampled at regular progress values, and evaluated by
+    linear interpolation between the samples. The progress is clamped to
+    [0, 1].
+
+    A LUTTransition is called like the transition functions:
+    ``LUTTransition(QuadTransition.ease_out)(0.5)``.
+
+    :ivar function: the sampled transition function.
+    :ivar size: (:py:class:`int`) number of intervals of the table.
+    :ivar table: (:py:class:`list`) the size + 1 samples.
+    """
+
+    def __init__(self, function, size=DEFAULT_LUT_SIZE):
+        """Sample a transition.
+
+        :param function: the transition function (ex:
+            ``CubicTransition.ease_in``) or a transition class (its
+            ease_in function is sampled).
+        :param int size: number of intervals of the table.
+        """
+        if (isinstance(function, type) and
+                issubclass(function, BaseTransition)):
+            function = function.ease_in
+        self.function = function
+        self.size = size
+        self.table = [function(index / size) for index in range(size + 1)]
+        # sentinel: progress 1 interpolates without an index check.
+        self.table.append(self.table[-1])
+
+    def __call__(self, progress=0):
+        """Return the transition value at the given progress.
+
+        :param float progress: the wanted progression of the transition
+            (or a numpy array of them).
+        """
+        if is_array(progress):
+            return numpy.interp(progress,
+                                numpy.linspace(0, 1, self.size + 1),
+                                self.table[:-1])
+        if progress <= 0:
+            return self.table[0]
+        if progress >= 1:
+            return self.table[self.size]
+        position = progress * self.size
+        index = int(position)
+        low = self.table[index]
+        return low + (self.table[index + 1] - low) * (position - index)
+
+    def max_error(self, samples=10000):
+        """Return the maximum difference with the exact transition.
+
+        :param int samples: number of progress values compared.
+        """
+        return max(abs(self(index / samples) - self.function(index / samples))
+                   for index in range(samples + 1))
@@ -0,0 +1,254 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Property animations (tweens).
+
+A :class:`Tween` changes a numeric attribute of any object (widget
+position, alpha, color...) from a start value to an end value over a
+duration, following a transition (see :mod:`cairotft.transitions`).
+
+All the tweens of a display are advanced together, once per frame, by its
+:class:`TweenEngine` (:attr:`cairotft.tft.TftDisplay.tweens`)::
+
+    move = display.tweens.start(
+        tween.Tween(icon, 'pos_x', 200, duration=0.5,
+                    transition=transitions.QuadTransition.ease_out,
+                    on_update=icon.redraw))
+    move.then(tween.Tween(icon, 'pos_x', 10, duration=0.5,
+                          on_update=icon.redraw))
+
+Widgets have a shortcut: :meth:`cairotft.widgets.base.BaseWidget.animate`.
+"""
+from cairotft import transitions
+
+
+class Tween():
+
+    """Animation of a numeric attribute.
+
+    The attribute can also be a tuple of numbers (ex: a rgba color): each
+    component is animated.
+
+    :ivar target: the object of the animated attribute.
+    :ivar attribute: (:py:class:`str`) name of the animated attribute.
+    :ivar start: the start value (None: the value of the attribute when the
+        tween starts).
+    :ivar end: the end value.
+    :ivar duration: (:py:class:`float`) duration in seconds.
+    :ivar delay: (:py:class:`float`) delay in seconds before the start.
+    :ivar transition: the transition function (progress -> position).
+    :ivar on_update: function called with the tween after each change of
+        the attribute (ex: to redraw the widget).
+    :ivar on_complete: function called with the tween when it ends (not
+        when it is cancelled).
+    :ivar next: (:class:`Tween`) the tween started when this one ends
+        (see :meth:`then`).
+    :ivar cancelled: (:py:class:`bool`) True if the tween was cancelled.
+    :ivar finished: (:py:class:`bool`) True if the tween is ended or
+        cancelled.
+    """
+
+    __slots__ = ('target', 'attribute', 'start', 'end', 'duration', 'delay',
+                 'transition', 'on_update', 'on_complete', 'next',
+                 'cancelled', 'finished', '_start_time', '_delta')
+
+    def __init__(self, target, attribute, end, duration,
+                 transition=transitions.LinearTransition.ease_in,
+                 start=None, delay=0, on_update=None, on_complete=None):
+        """Initialisation of the tween.
+
+        :param target: the object of the animated attribute.
+        :param str attribute: name of the animated attribute.
+        :param end: the end value.
+        :param float duration: duration in seconds.
+        :param transition: the transition function, ex:
+            ``transitions.QuadTransition.ease_out`` or a
+            :class:`cairotft.transitions.LUTTransition`.
+        :param start: the start value (default: the value of the attribute
+            when the tween starts).
+        :param float delay: delay in seconds before the start.
+        :param on_update: function called with the tween after each change
+            of the attribute.
+        :param on_complete: function called with the tween when it ends.
+        """
+        self.target = target
+        self.attribute = attribute
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.delay = delay
+        self.transition = transition
+        self.on_update = on_update
+        self.on_complete = on_complete
+        self.next = None
+        self.cancelled = False
+        self.finished = False
+        self._start_time = None
+        self._delta = None
+
+    def then(self, tween):
+        """Start a tween when this one ends.
+
+        :param tween: the next tween.
+        :type tween: :class:`Tween`
+
+        :return: the next tween, so calls can be chained:
+            ``first.then(second).then(third)``.
+        """
+        self.next = tween
+        return tween
+
+    def cancel(self):
+        """Stop the tween where it is (the next tweens are not started)."""
+        self.cancelled = True
+        self.finished = True
+
+    def begin(self, now):
+        """Start the tween (called by the :class:`TweenEngine`).
+
+        :param float now: the start time (loop time).
+        """
+        self._start_time = now + self.delay
+        if self.start is None:
+            self.start = getattr(self.target, self.attribute)
+        if isinstance(self.start, (tuple, list)):
+            self._delta = tuple(end - start
+                                for start, end in zip(self.start, self.end))
+        else:
+            self._delta = self.end - self.start
+
+    def advance(self, now):
+        """Set the attribute at its value at the given time.
+
+        :param float now: the time of the frame (loop time).
+
+        :return: True if the tween is finished.
+        """
+        if self.finished:
+            return True
+        elapsed = now - self._start_time
+        if elapsed < 0:
+            return False
+        if elapsed >= self.duration:
+            value = self.end
+            self.finished = True
+        else:
+            position = self.transition(elapsed / self.duration)
+            if isinstance(self._delta, tuple):
+                value = tuple(start + delta * position
+                              for start, delta in zip(self.start,
+                                                      self._delta))
+            else:
+                value = self.start + self._delta * position
+        setattr(self.target, self.attribute, value)
+        if self.on_update is not None:
+            self.on_update(self)
+        return self.finished
+
+
+class TweenEngine():
+
+    """Advance all the tweens of a display at each frame.
+
+    The engine requests frames from the display only while tweens are
+    running.
+
+    :ivar display_object: (:class:`cairotft.tft.TftDisplay`) the display
+        giving the frames.
+    """
+
+    def __init__(self, display_object):
+        """Initialisation of the engine.
+
+        :param display_object: the display giving the frames.
+        :type display_object: :class:`cairotft.tft.TftDisplay`
+        """
+        self.display_object = display_object
+        self._tweens = []
+        self._scheduled = False
+
+    def __len__(self):
+        """Return the number of running tweens."""
+        return len(self._tweens)
+
+    def start(self, tween, now=None):
+        """Start a tween.
+
+        :param tween: the tween to start.
+        :type tween: :class:`Tween`
+        :param float now: the start time (default: the frame time of the
+            display).
+
+        :return: the tween.
+        """
+        if now is None:
+            now = self.display_object.frame_time
+        tween.begin(now)
+        self._tweens.append(tween)
+        self._schedule()
+        return tween
+
+    def cancel_all(self, target=None):
+        """Cancel the running tweens.
+
+        :param target: if given, only cancel the tweens of this object.
+        """
+        for tween in self._tweens:
+            if target is None or tween.target is target:
+                tween.cancel()
+
+    def _schedule(self):
+        """Request the next frame if tweens are running."""
+        if self._tweens and not self._scheduled:
+            self._scheduled = True
+            self.display_object.request_frame(self.tick)
+
+    def tick(self, frame_time=None):
+        """Advance all the tweens (called at each frame).
+
+        :param float frame_time: the time of the frame (loop time).
+        """
+        self._scheduled = False
+        if frame_time is None:
+            frame_time = self.display_object.loop.time()
+        ended = False
+        for tween in self._tweens:
+            if tween.advance(frame_time):
+                ended = True
+        if ended:
+            finished = [tween for tween in self._tweens if tween.finished]
+            self._tweens = [tween for tween in self._tweens
+                            if not tween.finished]
+            for tween in finished:
+                if tween.cancelled:
+                    continue
+                if tween.on_complete is not None:
+                    tween.on_complete(tween)
+                if tween.next is not None:
+                    self.start(tween.next, frame_time)
+        self._schedule()
@@ -34,4 +34,6 @@ from .base import BaseAnimatedWidget
 
 # predefined widgets
 from .blink_icon import BlinkIcon
+from .label import Label
 from .marquee import Marquee
+from .streaming_marquee import StreamingMarquee
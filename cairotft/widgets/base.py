@@ -27,6 +27,8 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 """base widget class."""
+from cairotft import transitions
+from cairotft import tween
 
 
 class BaseWidget():
@@ -39,8 +41,15 @@ class BaseWidget():
     :ivar pos_y: (:py:class:`int`) y coordinates to display the widget
     :ivar width: (:py:class:`int`) the width of the widget
     :ivar height: (:py:class:`int`) the height of the widget
+    :ivar background_color: (:py:class:`tuple`) rgba color painted by
+        :meth:`erase` (None: erase does nothing).
+    :ivar layer: (:class:`cairotft.layers.Layer`) the offscreen layer of
+        the widget in layer mode (see :meth:`enable_layer`), else None.
     """
 
+    background_color = None
+    layer = None
+
     def __init__(self, display_object,
                  pos_x, pos_y, width, height):
         """Initialisation of the base widget.
@@ -60,6 +69,14 @@ class BaseWidget():
 
         self._stop = False
         self._showing = False
+        self._ctx = None
+        self._drawn_box = None
+        self._redraw_handle = None
+
+    @property
+    def box(self):
+        """(pos_x, pos_y, width, height) of the widget."""
+        return self.pos_x, self.pos_y, self.width, self.height
 
     def draw(self, ctx):
         """draw the widget.
@@ -68,6 +85,142 @@ class BaseWidget():
         """
         raise NotImplementedError
 
+    def erase(self, ctx, box=None):
+        """Repaint a box with the background color of the widget.
+
+        In layer mode, the box of the layer is made transparent first.
+
+        :param ctx: the cairo context.
+        :param tuple box: (pos_x, pos_y, width, height) of the repainted box
+            (default: the widget box).
+        """
+        if self.layer is not None and ctx is self.layer.ctx:
+            self.layer.clear(box)
+        if self.background_color is None:
+            return
+        ctx.set_source_rgba(*self.background_color)
+        ctx.rectangle(*(box or self.box))
+        ctx.fill()
+
+    def invalidate(self):
+        """Report the widget box as changed to the display object.
+
+        Call it after painting the widget and before blit(), so only the
+        widget box is copied to the screen. In layer mode, the layer is
+        composited again at the widget box.
+        """
+        self._drawn_box = self.box
+        if self.layer is not None:
+            self.layer.commit()
+        else:
+            self.display_object.invalidate(*self._drawn_box)
+
+    def enable_layer(self, z_order=0, opaque=False):
+        """Draw the widget in its own offscreen layer.
+
+        The widget then draws only when its content changed: a move (with
+        :meth:`animate` or :meth:`request_redraw`) or a change of the
+        widgets around it only composites the cached layer again (see
+        :mod:`cairotft.layers`). Call it before :meth:`start`.
+
+        :param int z_order: layers with a higher z_order are shown over the
+            others.
+        :param bool opaque: True if each drawing of the widget covers its
+            box with opaque pixels (the layers under it are then skipped).
+
+        :return: the :class:`cairotft.layers.Layer` of the widget.
+        """
+        self.disable_layer()
+        self.layer = self.display_object.layers.add(self.box, z_order,
+                                                    opaque)
+        return self.layer
+
+    def disable_layer(self):
+        """Draw the widget directly in the memory buffer again.
+
+        Call it when the widget is stopped.
+        """
+        if self.layer is not None:
+            self.display_object.layers.remove(self.layer)
+            self.layer = None
+
+    def _target_ctx(self, ctx):
+        """Return the context the widget draws with.
+
+        In layer mode, the layer is made transparent: the widget is drawn
+        again from scratch, not over its previous pixels.
+
+        :param ctx: the context given to :meth:`start`.
+        :return: the layer context in layer mode, else ctx.
+        """
+        if self.layer is None:
+            return ctx
+        layer_ctx = self.layer.place(self.box)
+        self.layer.clear()
+        return layer_ctx
+
+    def redraw(self, *_args):
+        """Draw the widget again, erasing its previous box if it moved.
+
+        Used as on_update callback of the animations.
+        """
+        ctx = self._ctx
+        if ctx is None or self._stop:
+            return
+        old_box = self._drawn_box
+        box = self.box
+        if self.layer is not None:
+            if (self.layer.valid and old_box is not None and
+                    old_box != box and old_box[2:] == box[2:]):
+                # moved only: composite the cached layer at its new place.
+                self.layer.move(box)
+                self._drawn_box = box
+                self.display_object.blit()
+                return
+            ctx = self._ctx = self._target_ctx(ctx)
+        elif old_box is not None and old_box != box:
+            self.erase(ctx, old_box)
+            self.display_object.invalidate(*old_box)
+        self.draw(ctx)
+
+    def request_redraw(self):
+        """Draw the widget again at the next loop iteration.
+
+        Widgets draw only when something changed: call it after changing
+        an attribute of a started widget. Several calls before the drawing
+        give one drawing.
+        """
+        if self.layer is not None:
+            self.layer.valid = False
+        if (self._ctx is None or self._stop or
+                self._redraw_handle is not None):
+            return
+        self._redraw_handle = self.display_object.call_soon(
+            self._scheduled_redraw)
+
+    def _scheduled_redraw(self):
+        """Draw the widget again (scheduled call)."""
+        self._redraw_handle = None
+        self.redraw()
+
+    def animate(self, attribute, end, duration,
+                transition=transitions.LinearTransition.ease_in, **kwargs):
+        """Animate an attribute of the widget, redrawing it at each frame.
+
+        :param str attribute: name of the animated attribute (ex: 'pos_x').
+        :param end: the end value.
+        :param float duration: duration in seconds.
+        :param transition: the transition function.
+
+        The other keyword arguments are given to
+        :class:`cairotft.tween.Tween`.
+
+        :return: the started :class:`cairotft.tween.Tween`.
+        """
+        kwargs.setdefault('on_update', self.redraw)
+        return self.display_object.tweens.start(
+            tween.Tween(self, attribute, end, duration, transition, **kwargs))
+
     def show(self, ctx):
         """show the icon."""
         # here call the draw method (which includes the eventual blit)
@@ -75,7 +228,8 @@ class BaseWidget():
 
     def start(self, ctx):
         """Start showing the widget."""
-        self.display_object.loop.call_soon(
+        ctx = self._ctx = self._target_ctx(ctx)
+        self.display_object.call_soon(
             self.show, ctx)
 
     def stop(self):
@@ -92,7 +246,8 @@ class BaseAnimatedWidget(BaseWidget):
     :ivar float interval_time: (:py:class:`float`) interval between
         two frames (in seconds)
 
-    TODO: add transition support in BaseAnimatedWidget
+    Use :meth:`BaseWidget.animate` to animate the attributes of the widget
+    with transitions.
     """
 
     def __init__(self, display_object,
@@ -139,9 +294,10 @@ class BaseAnimatedWidget(BaseWidget):
         if not self._stop:
             # here call the draw method (which includes the eventual blit)
             self._showing = True
+            ctx = self._target_ctx(ctx)
             self.draw(ctx)
             # the call the next show
-            self.display_object.loop.call_later(
+            self.display_object.call_later(
                 self.interval_time, self.show, ctx)
 
     def start(self, ctx):
@@ -149,7 +305,8 @@ class BaseAnimatedWidget(BaseWidget):
         if not self._showing:
             self._showing = True
             self._stop = False
-            self.display_object.loop.call_soon(
+            ctx = self._ctx = self._target_ctx(ctx)
+            self.display_object.call_soon(
                 self.show, ctx)
 
     def stop(self):
@@ -27,25 +27,36 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 """BlinkIcon widget."""
+import asyncio
+import logging
 
 from . import base
 
+LOGGER = logging.getLogger(__name__)
+
 
 class BlinkIcon(base.BaseAnimatedWidget):
 
-    """A svg icon that can blink."""
+    """A svg icon that can blink.
+
+    The icon can be given as an :class:`asyncio.Future` (see
+    :func:`cairotft.svg_image.load_svg_image`): the placeholder (or
+    nothing) is drawn until the icon is loaded.
+    """
 
     def __init__(self, display_object,
                  pos_x, pos_y, width, height,
                  svg_icon,
                  background_color=(1, 1, 1, 1),
-                 on_time=0.5, off_time=0.5):
+                 on_time=0.5, off_time=0.5,
+                 placeholder=None, color=None):
         """Initialisation of the bliking Icon.
 
         :param display_object: the Display class instanciation.
         :type display_object: :class:`cairotft.yfy.TftDisplay`
-        :param svg_icon: the svg icon to display.
-        :type svg_icon: :class:`cairoftf.svg_image.SVGImage`
+        :param svg_icon: the svg icon to display, or a future of it.
+        :type svg_icon: :class:`cairotft.image.BaseImage` or
+            :class:`asyncio.Future`
         :param int pos_x: x coordinates to display the icon
         :param int pos_y: y coordinates to display the icon
         :param int width: the width of the icon
@@ -54,36 +65,65 @@ class BlinkIcon(base.BaseAnimatedWidget):
             rgba value of the background color to repaint the icon.
         :param float on_time: the time in s the icon is displayed
         :param float off_time: the time in s the icon is not displayed
+        :param placeholder: image drawn while the icon is loading.
+        :type placeholder: :class:`cairotft.image.BaseImage`
+        :param tuple color: if given, rgba color (4 floats) of the icon
+            (see :meth:`cairotft.image.BaseImage.mask`).
 
         TODO: instead of repainting with a color, save the background before
               painting the icon
         """
         super().__init__(display_object, pos_x, pos_y, width, height)
-        self.svg_icon = svg_icon
         self.background_color = background_color
         self.on_time = on_time
         self.off_time = off_time
+        self.placeholder = placeholder
+        self.color = color
+        self._visible_ctx = None
+        if isinstance(svg_icon, asyncio.Future):
+            self.svg_icon = None
+            svg_icon.add_done_callback(self._icon_loaded)
+        else:
+            self.svg_icon = svg_icon
+
+    def _icon_loaded(self, future):
+        """Draw the loaded icon in place of the placeholder."""
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            LOGGER.error('cannot load the icon: %s', future.exception())
+            return
+        self.svg_icon = future.result()
+        ctx = self._visible_ctx
+        if ctx is not None and not self._stop:
+            self.erase(ctx)
+            self.draw(ctx)
 
     def draw(self, ctx):
         """draw the widget."""
-        self.svg_icon.draw(
+        icon = self.svg_icon if self.svg_icon is not None else self.placeholder
+        if icon is None:
+            return
+        icon.draw(
             context=ctx,
             pos_x=self.pos_x,
             pos_y=self.pos_y,
             width=self.width,
             height=self.height,
-            enlarge=True)
+            enlarge=True,
+            color=self.color)
+        self.invalidate()
         self.display_object.blit()
 
     def hide(self, ctx):
         """hide the icon."""
+        self._visible_ctx = None
         if not self._stop:
-            ctx.set_source_rgba(*self.background_color)
-            ctx.rectangle(self.pos_x, self.pos_y, self.width, self.height)
-            ctx.fill()
+            self.erase(ctx)
+            self.invalidate()
             self.display_object.blit()
 
-            self.display_object.loop.call_later(
+            self.display_object.call_later(
                 self.off_time, self.show, ctx)
         else:
             self._showing = False
@@ -92,7 +132,9 @@ class BlinkIcon(base.BaseAnimatedWidget):
         """show the icon."""
         if not self._stop:
             # here call the draw method (which includes the eventual blit)
+            ctx = self._target_ctx(ctx)
+            self._visible_ctx = ctx
             self.draw(ctx)
             # the call the next show
-            self.display_object.loop.call_later(
+            self.display_object.call_later(
                 self.on_time, self.hide, ctx)
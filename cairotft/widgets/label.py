@@ -0,0 +1,120 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Label widget."""
+from cairotft import text as text_metrics
+
+from . import base
+
+
+class Label(base.BaseWidget):
+
+    """A static text.
+
+    The text is drawn from the cached glyphs of
+    :func:`cairotft.text.get_glyph_font`, and truncated to the width of the
+    label. The label is drawn when it is started and when it changes only.
+
+    :ivar text: (:py:class:`str`) the text.
+    :ivar font_face: (:class:`cairocffi.ToyFontFace`) the font face.
+    :ivar font_size: (:py:class:`int`) the font size.
+    :ivar text_color: (:py:class:`tuple`) rgba color of the text.
+    :ivar align: (:py:class:`str`) 'left', 'center' or 'right'.
+    """
+
+    def __init__(self, display_object,
+                 pos_x, pos_y, width, height,
+                 text, font_face, font_size,
+                 text_color=(0, 0, 0, 1),
+                 background_color=(1, 1, 1, 1),
+                 align='left'):
+        """Initialisation of the label.
+
+        :param display_object: the Display class instanciation.
+        :type display_object: :class:`cairotft.tft.TftDisplay`
+        :param int pos_x: x coordinates of the label (top left corner)
+        :param int pos_y: y coordinates of the label (top left corner)
+        :param int width: the width of the label
+        :param int height: the height of the label
+        :param str text: the text to display.
+        :param font_face: the font face used for the text
+        :type font_face: :class:`cairocffi.ToyFontFace`
+        :param int font_size: the size of the font.
+        :param tuple text_color: a tuple of 4 float representing the rgba
+            value of the text color.
+        :param tuple background_color: a tuple of 4 float representing the
+            rgba value of the background color.
+        :param str align: horizontal alignment of the text: 'left',
+            'center' or 'right'.
+        """
+        super().__init__(display_object, pos_x, pos_y, width, height)
+        if align not in ('left', 'center', 'right'):
+            raise ValueError('unknown alignment: %r' % align)
+        self.text = text
+        self.font_face = font_face
+        self.font_size = font_size
+        self.text_color = text_color
+        self.background_color = background_color
+        self.align = align
+
+    def set_text(self, text):
+        """Change the text of the label."""
+        if text != self.text:
+            self.text = text
+            self.request_redraw()
+
+    def change_color(self, color):
+        """Change the text color of the label."""
+        if color != self.text_color:
+            self.text_color = color
+            self.request_redraw()
+
+    def draw(self, ctx):
+        """draw the label."""
+        font = text_metrics.get_glyph_font(self.font_face, self.font_size)
+        index = text_metrics.TextIndex(self.text, font.advances)
+        end = index.fit(0, self.width)
+        text_width = index.width(0, end)
+        if self.align == 'center':
+            text_x = self.pos_x + (self.width - text_width) / 2
+        elif self.align == 'right':
+            text_x = self.pos_x + self.width - text_width
+        else:
+            text_x = self.pos_x
+        baseline_y = (self.pos_y +
+                      (self.height - font.ascent - font.descent) / 2 +
+                      font.ascent)
+        self.erase(ctx)
+        ctx.save()
+        ctx.rectangle(*self.box)
+        ctx.clip()
+        font.draw_text(ctx, self.text[:end], text_x, baseline_y,
+                       self.text_color)
+        ctx.restore()
+        self.invalidate()
+        self.display_object.blit()
@@ -27,13 +27,23 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 """Text Marquee widget."""
-import time
+import logging
+import math
 
 import cairocffi as cairo
 
 from cairotft import linuxfb
+from cairotft import text as text_metrics
 from cairotft import transitions
 
+LOGGER = logging.getLogger(__name__)
+
+#: text between the end and the start of a scrolling text.
+SEPARATOR = "   "
+
+#: maximum width of a cairo image surface.
+MAX_SURFACE_WIDTH = 32767
+
 
 class Marquee():
 
@@ -67,6 +77,9 @@ class Marquee():
         :param int step: number of unit we skip at each frame. (X chars if
             smooth is False, X pixels if smooth is True)
         :param float interval_time: the time in s between two frames
+        :param bool smooth: if True, scroll by pixels (the text is rendered
+            in a buffer). A text wider than :data:`MAX_SURFACE_WIDTH` pixels
+            (with its copy) scrolls by chars.
 
         TODO: instead of repainting with a color, save the background or paint
               in order: from bottom to top.
@@ -76,7 +89,7 @@ class Marquee():
         self._pos = 0
         self.display_object = display_object
         self.text = text
-        self.full_text = self.text + "   " + self.text
+        self.full_text = self.text + SEPARATOR + self.text
         self._shrinked_text = text
         self.font_face = font_face
         self.font_size = font_size
@@ -90,21 +103,32 @@ class Marquee():
         self.height = height
         self.step = step
         self.smooth = smooth
-        self.max_offset = len(self.text) + 3
+        self.max_offset = len(self.text) + len(SEPARATOR)
         self.interval_time = interval_time
         self.transition = transition
         self._transition_time = None
         self._first_time = None
         self._should_scroll = False  # if False, text does not scroll
-
-    def _smooth_init_buffer(self, ctx):
-        """Initialise the buffer used in smooth text."""
+        self._text_index = None  # cumulative advances of full_text
+        self._text_index_font = None
+        self.smooth_textsurf = None
+        self._ctx = None
+        self._handle = None  # the scheduled show
+        self._needs_redraw = True
+        self._drawn_pos = None  # scroll position of the last drawing
+
+    def _smooth_init_buffer(self, ctx, min_width=0):
+        """Initialise the buffer used in smooth text.
+
+        :param int min_width: minimum width of the buffer (room for text
+            changes).
+        """
         # in smooth case, we need to instanciate specific buffers
         # at first, determine the width and height we need:
         ctx.set_font_size(self.font_size)
         ctx.set_font_face(self.font_face)
         (_, _, small_text_width, _,
-         x_advance_text, _) = ctx.text_extents(self.text + "   ")
+         x_advance_text, _) = ctx.text_extents(self.text + SEPARATOR)
         self.smooth_text_width = int(x_advance_text)
         self.max_offset = self.smooth_text_width
 
@@ -112,10 +136,10 @@ class Marquee():
          width, height,
          x_advance, _) = ctx.text_extents(self.full_text)
         self.smooth_full_height = int(height)
-        self.smooth_full_width = int(max(x_advance, width))
+        self.smooth_full_width = max(int(max(x_advance, width)), min_width)
         self.smooth_pos_y = int(-y_bearing)
         stride = cairo.ImageSurface.format_stride_for_width(
-            self.display_object.cairo_format, int(x_advance))
+            self.display_object.cairo_format, self.smooth_full_width)
         textbuffer = linuxfb.memory_buffer(
             int(stride * self.smooth_full_height))
         self.smooth_textsurf = cairo.ImageSurface(
@@ -156,27 +180,38 @@ class Marquee():
         else:
             self.smooth_text_ctx.show_text(self.text)
 
-    def _shrink_text(self, ctx):
+    def _get_text_index(self):
+        """Return the advances index of full_text, for the current font."""
+        index = self._text_index
+        if (index is None or index.text is not self.full_text or
+                self._text_index_font != (self.font_face, self.font_size)):
+            self._text_index_font = (self.font_face, self.font_size)
+            index = text_metrics.TextIndex(
+                self.full_text,
+                text_metrics.get_glyph_advances(self.font_face,
+                                                self.font_size))
+            self._text_index = index
+        return index
+
+    def _shrink_text(self):
         """based on the font size, calculate the width of the text.
 
         And eventually shrink the name if too long.
+
+        The visible characters are found in the cumulative advances of the
+        text (see :class:`cairotft.text.TextIndex`): the text is not
+        measured again at each frame.
         """
-        # same font face here than the one displayed.
+        index = self._get_text_index()
         if self._pos > 0:
-            new_text = (self.full_text)[self._pos:]
+            end = index.fit(self._pos, self.width)
         else:
-            new_text = self.text[self._pos:]
-        while True:
-            (_, _, _, _, x_advance, _) = ctx.text_extents(new_text)
-            if x_advance > self.width:
-                new_text = new_text[:-1]  # + '…'
-            else:
-                break
-        self._shrinked_text = new_text
+            end = index.fit(self._pos, self.width, len(self.text))
+        self._shrinked_text = self.full_text[self._pos:end]
         if self._shrinked_text != self.text:
             self._should_scroll = True
             self._transition_time = (self.interval_time *
-                                     len(self.text + "   ") / self.step)
+                                     len(self.text + SEPARATOR) / self.step)
 
     def change_color(self, color):
         """Change the text color.
@@ -188,6 +223,7 @@ class Marquee():
         self.text_color = color
         if self.smooth and self._showing:
             self._smooth_draw_text()
+        self.request_redraw()
 
     def change_background(self, background_color):
         """Change the background color.
@@ -199,6 +235,157 @@ class Marquee():
         self.background_color = background_color
         if self.smooth and self._showing:
             self._smooth_draw_text()
+        self.request_redraw()
+
+    def set_text(self, text):
+        """Change the text, keeping the scroll position.
+
+        Only the characters that differ from the current text are
+        rendered again (see :meth:`replace_span`).
+
+        :param str text: the new text.
+        """
+        old_text = self.text
+        prefix = 0
+        max_prefix = min(len(old_text), len(text))
+        while prefix < max_prefix and old_text[prefix] == text[prefix]:
+            prefix += 1
+        suffix = 0
+        max_suffix = max_prefix - prefix
+        while (suffix < max_suffix and
+               old_text[-1 - suffix] == text[-1 - suffix]):
+            suffix += 1
+        self.replace_span(prefix, len(old_text) - suffix,
+                          text[prefix:len(text) - suffix])
+
+    def append_text(self, text):
+        """Add text at the end of the text, keeping the scroll position.
+
+        :param str text: the added text.
+        """
+        self.replace_span(len(self.text), len(self.text), text)
+
+    def replace_span(self, start, end, new_text):
+        """Replace text[start:end] by new_text, keeping the scroll position.
+
+        The metrics are updated from the cached glyph advances, and in
+        smooth mode only the changed glyphs are rendered again in the text
+        buffer (all the glyphs after the span if its width changes).
+
+        :param int start: index of the first replaced character.
+        :param int end: index after the last replaced character.
+        :param str new_text: the replacing text.
+        """
+        if self.text[start:end] == new_text:
+            return
+        index = self._get_text_index()
+        # full_text is text + SEPARATOR + text: edit the second copy first.
+        second = len(self.text) + len(SEPARATOR)
+        index.replace(second + start, second + end, new_text)
+        shift = index.replace(start, end, new_text)
+        self.text = index.text[:len(self.text) - (end - start) +
+                               len(new_text)]
+        self.full_text = index.text
+        was_scrolling = self._should_scroll
+        self._update_metrics()
+        if self.smooth and self.smooth_textsurf is not None:
+            needed_width = int(math.ceil(index.width()))
+            if needed_width > MAX_SURFACE_WIDTH:
+                self._stop_smooth(needed_width)
+            elif needed_width > self.smooth_full_width:
+                # grow with some room for the next changes.
+                self._smooth_init_buffer(
+                    self.smooth_text_ctx,
+                    min(needed_width * 5 // 4, MAX_SURFACE_WIDTH))
+            elif self._should_scroll != was_scrolling:
+                self._smooth_draw_text()
+            elif shift:
+                self._smooth_render_span(start, len(self.full_text))
+            else:
+                self._smooth_render_span(start, start + len(new_text))
+                if self._should_scroll:
+                    second = len(self.text) + len(SEPARATOR)
+                    self._smooth_render_span(second + start,
+                                             second + start + len(new_text))
+        self.request_redraw()
+
+    def _stop_smooth(self, text_width):
+        """Scroll by characters: the text is too wide for the smooth buffer.
+
+        :param int text_width: the width of the text and its copy.
+        """
+        LOGGER.warning('marquee text of %d pixels, wider than a cairo '
+                       'surface (%d pixels): scrolling by characters',
+                       text_width, MAX_SURFACE_WIDTH)
+        self.smooth = False
+        self.smooth_textsurf = None
+        self.smooth_text_ctx = None
+        self._pos = self._get_text_index().fit(0, self._pos)
+        self._drawn_pos = None
+        self._update_metrics()
+
+    def _update_metrics(self):
+        """Update the scroll metrics after a text change.
+
+        The transition keeps its progress, so the text does not jump when
+        its length does not change.
+        """
+        index = self._get_text_index()
+        old_transition_time = self._transition_time
+        self._should_scroll = index.width(0, len(self.text)) > self.width
+        if self.smooth:
+            self.smooth_text_width = int(
+                index.width(0, len(self.text) + len(SEPARATOR)))
+            self.max_offset = self.smooth_text_width
+        else:
+            self.max_offset = len(self.text) + len(SEPARATOR)
+        self._transition_time = (self.interval_time * self.max_offset /
+                                 self.step)
+        if not self._should_scroll:
+            # a static text is shown from its start.
+            self._pos = 0
+            self._first_time = None
+            return
+        self._pos = min(self._pos, self.max_offset)
+        if (self._first_time is not None and old_transition_time and
+                self._transition_time):
+            now = self.display_object.frame_time
+            progress = (now - self._first_time) / old_transition_time
+            self._first_time = now - progress * self._transition_time
+
+    def _smooth_render_span(self, first, last):
+        """Render again full_text[first:last] in the smooth text buffer.
+
+        A static text is drawn alone in the buffer: when the span reaches
+        its end, the buffer is cleared up to its end, where the glyphs of a
+        longer previous text can remain.
+        """
+        if self._should_scroll:
+            to_end = last >= len(self.full_text)
+        else:
+            last = min(last, len(self.text))
+            first = min(first, last)
+            to_end = last == len(self.text)
+        if last <= first and not to_end:
+            return
+        offsets = self._get_text_index().offsets
+        left = int(offsets[first])
+        right = (self.smooth_full_width if to_end
+                 else int(math.ceil(offsets[last])))
+        ctx = self.smooth_text_ctx
+        ctx.save()
+        ctx.rectangle(left, 0, right - left, self.smooth_full_height)
+        ctx.clip()
+        ctx.set_source_rgba(*self.background_color)
+        ctx.paint()
+        # the neighbour glyphs are drawn too, for their overhangs.
+        first = max(first - 1, 0)
+        ctx.set_source_rgba(*self.text_color)
+        ctx.move_to(offsets[first], self.smooth_pos_y)
+        if not (to_end and not self._should_scroll):
+            last += 1
+        ctx.show_text(self.full_text[first:last])
+        ctx.restore()
 
     def color_changed(self):
         """Return True is either text_color or background_color has changed.
@@ -209,30 +396,66 @@ class Marquee():
                 self._old_background_color != self.background_color):
             return True
 
+    def request_redraw(self):
+        """Draw the marquee again at the next loop iteration.
+
+        A static marquee (not scrolling) does not schedule any drawing:
+        call this method after changing its attributes directly. The
+        change methods (:meth:`change_color`, :meth:`set_text`...) call it.
+        """
+        self._needs_redraw = True
+        if (self._showing and not self._stop and self._ctx is not None and
+                self._handle is None):
+            self._handle = self.display_object.call_soon(
+                self._scheduled_show, self._ctx)
+
+    def _scheduled_show(self, ctx):
+        """Show the text (scheduled call)."""
+        self._handle = None
+        self.show(ctx)
+
+    def _schedule_next_show(self, ctx):
+        """Schedule the next frame of a scrolling text."""
+        if self._handle is not None:
+            return
+        if self.display_object.fps is not None:
+            interval_time = max(self.interval_time,
+                                1 / self.display_object.fps)
+        else:
+            interval_time = self.interval_time
+        self._handle = self.display_object.call_later(
+            interval_time, self._scheduled_show, ctx)
+
     def show(self, ctx, no_loop=False):
-        """Show the text."""
+        """Show the text.
+
+        The text is drawn only if it moved or changed since the last
+        drawing. A static text does not schedule the next show: see
+        :meth:`request_redraw`.
+        """
         if not self._stop and self._showing:
+            changed = (self._needs_redraw or self.color_changed() or
+                       self._pos != self._drawn_pos)
             # here at each frame, move the text and display it.
-            if (self.color_changed or self._should_scroll) and not self.smooth:
+            if changed and not self.smooth:
                 # erase the text box
                 ctx.set_source_rgba(*self.background_color)
                 ctx.rectangle(self.pos_x, self.pos_y, self.width, self.height)
                 ctx.fill()
 
-                # display text
-                ctx.set_source_rgba(*self.text_color)
-                ctx.set_font_size(self.font_size)
-                ctx.set_font_face(self.font_face)
-
-                self._shrink_text(ctx)
-                ctx.move_to(
-                    self.pos_x,
-                    (self.pos_y +
-                     (self.height - self.font_size) / 2 +
-                     self.font_size) - 2)
-                ctx.show_text(self._shrinked_text)
+                # display text, from the cached glyphs
+                self._shrink_text()
+                text_metrics.get_glyph_font(
+                    self.font_face, self.font_size).draw_text(
+                        ctx, self._shrinked_text, self.pos_x,
+                        (self.pos_y +
+                         (self.height - self.font_size) / 2 +
+                         self.font_size) - 2,
+                        self.text_color)
+                self.display_object.invalidate(self.pos_x, self.pos_y,
+                                               self.width, self.height)
                 self.display_object.blit()
-            elif (self.color_changed or self._should_scroll) and self.smooth:
+            elif changed and self.smooth:
                 # erase the text box
                 ctx.set_source_rgba(*self.background_color)
                 ctx.rectangle(self.pos_x, self.pos_y, self.width, self.height)
@@ -244,10 +467,14 @@ class Marquee():
                     (self.pos_y +
                      (self.height - self.smooth_full_height) / 2) + 1)
                 ctx.paint()
+                self.display_object.invalidate(self.pos_x, self.pos_y,
+                                               self.width, self.height)
                 self.display_object.blit()
+            self._needs_redraw = False
+            self._drawn_pos = self._pos
 
             if self._should_scroll:  # only cycle when text is too long.
-                now = time.time()
+                now = self.display_object.frame_time
                 if self._first_time is not None:
                     transition_offset = self.transition(
                         (now - self._first_time) /
@@ -263,14 +490,8 @@ class Marquee():
             self._old_text_color = self.text_color
             self._old_background_color = self.background_color
 
-            if not no_loop:
-                if self.display_object.fps is not None:
-                    interval_time = max(self.interval_time,
-                                        1 / self.display_object.fps)
-                else:
-                    interval_time = self.interval_time
-                self.display_object.loop.call_later(
-                    interval_time, self.show, ctx)
+            if not no_loop and self._should_scroll:
+                self._schedule_next_show(ctx)
 
     def start(self, ctx):
         """Start showing the marquee."""
@@ -278,16 +499,23 @@ class Marquee():
             self._showing = True
             self._stop = False
             self._first_time = None
+            self._ctx = ctx
+            if self.smooth:
+                text_width = int(math.ceil(self._get_text_index().width()))
+                if text_width > MAX_SURFACE_WIDTH:
+                    self._stop_smooth(text_width)
             if self.smooth:
                 self._smooth_init_buffer(ctx)
             else:
-                self._shrink_text(ctx)
+                self._shrink_text()
 
-            self.display_object.loop.call_soon(
-                self.show, ctx)
+            self.request_redraw()
 
     def stop(self):
         """stop showing the marquee."""
         self._stop = True
         self._showing = False
         self._first_time = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
@@ -0,0 +1,302 @@
+# Copyright (c) 2015, Thomas Chiroux - Link Care Services
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of cairotft nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Streaming text marquee widget, for unbounded text feeds."""
+import collections
+import math
+
+import cairocffi as cairo
+
+from cairotft import text as text_metrics
+
+from .marquee import Marquee
+
+
+class StreamingMarquee(Marquee):
+
+    """A smooth marquee rendering its text in a circular strip.
+
+    The smooth :class:`Marquee` renders the whole text in one surface: long
+    texts need a lot of memory and cannot be wider than 32767 pixels. The
+    streaming marquee renders the text in a strip a little wider than its
+    box, used as a ring buffer: the glyphs are drawn just before they
+    scroll into view, in the columns freed by the glyphs that scrolled out.
+    The memory used does not depend on the text length.
+
+    The text scrolls at a constant speed: step pixels every interval_time
+    seconds. Text can be added while scrolling with :meth:`append_text`.
+    When all the text is shown, the text given to the constructor is shown
+    again if repeat is True, otherwise the marquee scrolls blank until
+    some text is appended.
+    """
+
+    def __init__(self, display_object, text,
+                 font_face, font_size,
+                 text_color,
+                 pos_x, pos_y, width, height,
+                 background_color=(1, 1, 1, 1),
+                 step=1,
+                 interval_time=0.05,
+                 repeat=True,
+                 separator='   '):
+        """Initialisation of the streaming marquee.
+
+        see :class:`cairotft.widgets.marquee.Marquee` for the common
+        parameters.
+
+        :param bool repeat: if True, show the text again after its end.
+        :param str separator: text shown between two repetitions of the text.
+        """
+        super().__init__(display_object, text, font_face, font_size,
+                         text_color, pos_x, pos_y, width, height,
+                         background_color=background_color,
+                         step=step, interval_time=interval_time,
+                         smooth=True)
+        self.repeat = repeat
+        self.separator = separator
+        self._pending = collections.deque(text)
+        self._glyphs = collections.deque()  # (x, char) drawn in the strip
+        self._advances = None
+        self._strip = None
+        self._strip_ctx = None
+        self._strip_width = 0
+        self._strip_height = 0
+        self._baseline = 0
+        self._margin = 0
+        self._scroll = 0  # stream x of the left of the box
+        self._render_x = 0  # stream x of the next glyph
+        self._distance = 0  # pixels scrolled since start
+        self._scrolling = False
+
+    def append_text(self, text):
+        """Add text at the end of the feed (shown once).
+
+        :param str text: the added text.
+        """
+        self._pending.extend(text)
+        self.request_redraw()
+
+    def set_text(self, text):
+        """Replace the text not yet shown (and the repeated text).
+
+        :param str text: the new text.
+        """
+        self.text = text
+        self._pending = collections.deque(text)
+        self.request_redraw()
+
+    def replace_span(self, start, end, new_text):
+        """Replace text[start:end] by new_text.
+
+        The glyphs already in the strip are not rendered again: like
+        :meth:`set_text`, the new text is shown after them.
+
+        :param int start: index of the first replaced character.
+        :param int end: index after the last replaced character.
+        :param str new_text: the replacing text.
+        """
+        self.set_text(self.text[:start] + new_text + self.text[end:])
+
+    def _init_strip(self):
+        """Create the circular strip."""
+        self._advances = text_metrics.get_glyph_advances(self.font_face,
+                                                         self.font_size)
+        (ascent, descent, _,
+         max_x_advance, _) = self._advances.scaled_font.extents()
+        # room for the glyph overhangs: glyphs never touch visible columns.
+        self._margin = int(math.ceil(self.font_size / 8)) + 1
+        self._strip_width = (self.width + int(math.ceil(max_x_advance)) +
+                             2 * self._margin)
+        self._strip_height = int(math.ceil(ascent + descent))
+        self._baseline = int(math.ceil(ascent))
+        self._strip = cairo.ImageSurface(self.display_object.cairo_format,
+                                         self._strip_width,
+                                         self._strip_height)
+        self._strip_ctx = cairo.Context(self._strip)
+        self._strip_ctx.set_font_face(self.font_face)
+        self._strip_ctx.set_font_size(self.font_size)
+        self._scroll = self._render_x = self._distance = 0
+        self._glyphs.clear()
+        self._redraw_strip()
+
+    def _columns(self, start, end):
+        """Split a stream range in strip columns.
+
+        :return: list of (strip x, stream x, width).
+        """
+        strip_width = self._strip_width
+        columns = []
+        while end - start > 0:
+            column = start % strip_width
+            width = min(end - start, strip_width - column)
+            columns.append((column, start, width))
+            start += width
+        return columns
+
+    def _clear(self, start, end):
+        """Paint the background in the columns of a stream range."""
+        ctx = self._strip_ctx
+        ctx.set_source_rgba(*self.background_color)
+        for column, _, width in self._columns(start, end):
+            ctx.rectangle(column, 0, width, self._strip_height)
+        ctx.fill()
+
+    def _draw_glyph(self, pos_x, char):
+        """Draw a character at a stream x (twice when it wraps)."""
+        ctx = self._strip_ctx
+        column = pos_x % self._strip_width
+        ctx.move_to(column, self._baseline)
+        ctx.show_text(char)
+        if column + self._advances.advance(char) + self._margin > (
+                self._strip_width):
+            ctx.move_to(column - self._strip_width, self._baseline)
+            ctx.show_text(char)
+
+    def _redraw_strip(self):
+        """Draw again the whole strip (after a color change)."""
+        self._strip_ctx.set_source_rgba(*self.background_color)
+        self._strip_ctx.paint()
+        self._strip_ctx.set_source_rgba(*self.text_color)
+        for pos_x, char in self._glyphs:
+            self._draw_glyph(pos_x, char)
+
+    def _scroll_by(self, pixels):
+        """Scroll the strip and draw the glyphs coming into view."""
+        if pixels > 0:
+            # the columns scrolled out are reused for the next glyphs.
+            self._clear(self._scroll,
+                        self._scroll + min(pixels, self._strip_width))
+            self._scroll += pixels
+            while self._glyphs and (
+                    self._glyphs[0][0] +
+                    self._advances.advance(self._glyphs[0][1]) <=
+                    self._scroll):
+                self._glyphs.popleft()
+            # keep the stream coordinates small.
+            if self._scroll >= self._strip_width:
+                shift = self._scroll - self._scroll % self._strip_width
+                self._scroll -= shift
+                self._render_x -= shift
+                self._glyphs = collections.deque(
+                    (pos_x - shift, char) for pos_x, char in self._glyphs)
+        self._render_x = max(self._render_x, self._scroll)
+        limit = self._scroll + self._strip_width - self._margin
+        self._strip_ctx.set_source_rgba(*self.text_color)
+        while True:
+            if not self._pending and self.repeat and self.text:
+                self._pending.extend(self.text + self.separator)
+            if not self._pending:
+                # nothing to show: the next text enters from the right.
+                self._render_x = max(self._render_x,
+                                     self._scroll + self.width)
+                break
+            char = self._pending[0]
+            advance = self._advances.advance(char)
+            if self._render_x + advance > limit:
+                break
+            self._pending.popleft()
+            self._draw_glyph(self._render_x, char)
+            self._glyphs.append((self._render_x, char))
+            self._render_x += advance
+
+    def _paint(self, ctx):
+        """Paint the visible part of the strip in the box."""
+        ctx.set_source_rgba(*self.background_color)
+        ctx.rectangle(self.pos_x, self.pos_y, self.width, self.height)
+        ctx.fill()
+        strip_y = self.pos_y + (self.height - self._strip_height) // 2
+        for column, start, width in self._columns(self._scroll,
+                                                  self._scroll + self.width):
+            box_x = self.pos_x + start - self._scroll
+            ctx.set_source_surface(self._strip, box_x - column, strip_y)
+            ctx.rectangle(box_x, strip_y, width, self._strip_height)
+            ctx.fill()
+        self.display_object.invalidate(self.pos_x, self.pos_y,
+                                       self.width, self.height)
+        self.display_object.blit()
+
+    def change_color(self, color):
+        """Change the text color.
+
+        :param tuple color: a tuple of 4 float representing the
+            rgba value of the text color.
+        """
+        self._old_text_color = self.text_color
+        self.text_color = color
+        if self._strip is not None:
+            self._redraw_strip()
+        self.request_redraw()
+
+    def change_background(self, background_color):
+        """Change the background color.
+
+        :param tuple background_color: a tuple of 4 float representing the
+            rgba value of the background color.
+        """
+        self._old_background_color = self.background_color
+        self.background_color = background_color
+        if self._strip is not None:
+            self._redraw_strip()
+        self.request_redraw()
+
+    def show(self, ctx, no_loop=False):
+        """Scroll and show the text.
+
+        When the feed is over and the last glyphs scrolled out, the marquee
+        stops scheduling its frames until some text is appended.
+        """
+        if self._stop or not self._showing:
+            return
+        now = self.display_object.frame_time
+        if self._first_time is None or not self._scrolling:
+            # (re)start the scrolling clock from the current distance.
+            self._first_time = now - (self._distance * self.interval_time /
+                                      self.step)
+        distance = int((now - self._first_time) *
+                       self.step / self.interval_time)
+        if distance != self._distance or self._needs_redraw:
+            self._scroll_by(distance - self._distance)
+            self._distance = distance
+            self._paint(ctx)
+            self._needs_redraw = False
+        self._scrolling = bool(self._glyphs or self._pending or
+                               (self.repeat and self.text))
+        if not no_loop and self._scrolling:
+            self._schedule_next_show(ctx)
+
+    def start(self, ctx):
+        """Start showing the marquee."""
+        if not self._showing:
+            self._showing = True
+            self._stop = False
+            self._first_time = None
+            self._scrolling = False
+            self._ctx = ctx
+            if self._strip is None:
+                self._init_strip()
+            self.request_redraw()
@@ -28,7 +28,8 @@ class MyDisplay(tft.TftDisplay):
             pos_y=10,
             width=70,
             height=70,
-            svg_icon=svg_image.SVGImage('icon.svg'),
+            # parsed in a thread: the first frame is not delayed
+            svg_icon=svg_image.load_svg_image('icon.svg', loop=self.loop),
             background_color=(0.5, 0.5, 0.5, 1),
             on_time=0.2,
             off_time=0.8)